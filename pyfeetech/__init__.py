@@ -6,5 +6,23 @@ from .group_sync_write import *
 from .group_sync_read import *
 from .feetechsts import *
 from .scscl import *
+from .tracer import *
+from .model_registry import *
+from .eeprom_snapshot import *
+from .retry_policy import *
+from .register_cache import *
+from .discovery import *
+from .bus_manager import *
+from .bus_process import *
+from .trajectory import *
+from .units import *
+from .emulated_port import *
+from .capture import *
+from .parser_harness import *
+from .bus_model import *
+from .telemetry import *
+from .quarantine import *
+from .provisioning import *
+from .polling import *
 #from .sts import *
 #stservo_def.py
\ No newline at end of file
@@ -0,0 +1,8 @@
+#!/usr/bin/env python
+
+# Description: python -m pyfeetech, same as the pyfeetech command (see cli.py)
+
+import sys
+from .cli import main
+
+sys.exit(main())
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+# Description: several buses (one adapter + feetechsts each) driven in parallel.
+#
+# Motors get a global name mapped to (bus, ID). Every bus has its own I/O thread that,
+# on each cycle, sends the pending goals with one SYNC_WRITE and reads the state of its
+# motors with one SYNC_READ. Serial I/O releases the GIL, so the buses run concurrently
+# and a cycle lasts as long as the slowest bus instead of the sum of all of them.
+#
+# usage:
+#   manager = BusManager()
+#   manager.add_bus("left", PortHandler("/dev/ttyACM0"))
+#   manager.add_bus("right", PortHandler("/dev/ttyACM1"))
+#   manager.add_motor("shoulder_l", "left", 1)
+#   manager.add_motor("shoulder_r", "right", 1)
+#   manager.start()
+#   while True:
+#       manager.set_goal("shoulder_l", 2048)
+#       states = manager.cycle()        # {"shoulder_l": {...}, "shoulder_r": {...}}
+#   manager.stop()
+#
+# with a TelemetryHub attached (set_telemetry), the states of every cycle are published to
+# its subscribers (status changes, thresholds, dropped motors, ...), see telemetry.py.
+
+import time
+import threading
+from .stservo_def import *
+from .feetechsts import *
+from .telemetry import *
+
+#
+class _BusThread(threading.Thread):
+    #
+    def __init__(self, name, bus):
+        threading.Thread.__init__(self, name=f"pyfeetech-{name}", daemon=True)
+        self.bus_name = name
+        self.bus = bus
+        self.motor_ids = []
+        self.motor_ids_lock = threading.Lock()
+        self.goals = {}
+        self.goals_lock = threading.Lock()
+        self.start_event = threading.Event()
+        self.stopping = False
+
+        # every cycle carries a sequence number, echoed back with its states, so the late end
+        # of a timed-out cycle is never taken for the end of the next one
+        self.request = (0, [])  # (sequence, motor IDs) of the cycle to run
+        self.sequence = 0       # last cycle requested
+        self.completed = 0      # last cycle completed
+        self.done = threading.Condition()
+
+        self.states = {}
+        self.read_ids = []      # motor IDs of the last cycle completed
+        self.cycle_time = 0.0   # [s] duration of the last cycle on this bus
+        self.cycles = 0
+        self.exception = None
+
+    #
+    def run(self):
+        while True:
+            self.start_event.wait()
+            self.start_event.clear()
+            if self.stopping:
+                break
+
+            sequence, motor_ids = self.request
+            t_start = time.perf_counter()
+            try:
+                with self.goals_lock:
+                    goals, self.goals = self.goals, {}
+                if goals:
+                    self.bus.sync_write_goals(goals)
+                states = self.bus.sync_read_state(motor_ids) if motor_ids else {}
+            except Exception as e:
+                # keep the thread alive, the manager re-raises in the caller's thread
+                self.exception = e
+                states = {}
+            self.cycle_time = time.perf_counter() - t_start
+            self.cycles += 1
+
+            with self.done:
+                self.states, self.read_ids = states, motor_ids
+                self.completed = sequence
+                self.done.notify_all()
+
+    #
+    # a new thread (a Thread runs only once) on the same bus, motor IDs and pending goals
+    def renewed(self):
+        bus_thread = _BusThread(self.bus_name, self.bus)
+        with self.motor_ids_lock:
+            bus_thread.motor_ids = list(self.motor_ids)
+        with self.goals_lock:
+            bus_thread.goals = dict(self.goals)
+        return bus_thread
+
+    #
+    # True while the last cycle requested has not completed
+    @property
+    def busy(self):
+        return self.completed != self.sequence
+
+    #
+    # starts a cycle on a copy of the motor IDs
+    def request_cycle(self):
+        with self.motor_ids_lock:
+            motor_ids = list(self.motor_ids)
+        self.sequence += 1
+        self.request = (self.sequence, motor_ids)
+        self.start_event.set()
+
+    #
+    # waits for the end of the last cycle requested; False on timeout
+    def wait_cycle(self, timeout=None):
+        with self.done:
+            return self.done.wait_for(lambda: self.completed == self.sequence, timeout)
+
+#
+# [s] left until deadline, None if there is none
+def _remaining(deadline):
+    return max(0.0, deadline - time.perf_counter()) if deadline is not None else None
+
+#
+class BusManager(object):
+    #
+    def __init__(self):
+        self.buses = {}         # {bus name: _BusThread}
+        self.motors = {}        # {motor name: (bus name, motor ID)}
+        self.names = {}         # {(bus name, motor ID): motor name}
+        self.cycle_time = 0.0   # [s] duration of the last cycle, all buses
+        self.is_running = False
+        self.telemetry = None
+
+    #
+    # port_handler: opened (or not yet opened) PortHandler; bus: protocol handler on that port,
+    # a feetechsts is created if not given
+    def add_bus(self, name, port_handler, bus=None):
+        if name in self.buses:
+            return False
+        if bus is None:
+            bus = feetechsts(port_handler)
+
+        self.buses[name] = _BusThread(name, bus)
+        return True
+
+    #
+    # hub: TelemetryHub the states of every cycle are published to (keyed by motor name), None to stop
+    def set_telemetry(self, hub):
+        self.telemetry = hub
+
+    #
+    def get_bus(self, name):
+        return self.buses[name].bus
+
+    #
+    def add_motor(self, name, bus_name, motor_id):
+        if name in self.motors or bus_name not in self.buses or (bus_name, motor_id) in self.names:
+            return False
+
+        self.motors[name] = (bus_name, motor_id)
+        self.names[(bus_name, motor_id)] = name
+        bus_thread = self.buses[bus_name]
+        with bus_thread.motor_ids_lock:
+            bus_thread.motor_ids.append(motor_id)
+        return True
+
+    #
+    def remove_motor(self, name):
+        if name not in self.motors:
+            return
+
+        bus_name, motor_id = self.motors.pop(name)
+        del self.names[(bus_name, motor_id)]
+        bus_thread = self.buses[bus_name]
+        with bus_thread.motor_ids_lock:
+            bus_thread.motor_ids.remove(motor_id)
+
+    #
+    # the goal is sent on the next cycle of the motor's bus
+    def set_goal(self, name, position, speed=0, acceleration=0):
+        bus_name, motor_id = self.motors[name]
+        bus_thread = self.buses[bus_name]
+        with bus_thread.goals_lock:
+            bus_thread.goals[motor_id] = (position, speed, acceleration)
+
+    #
+    # can be called again after stop(): the buses get new I/O threads
+    def start(self):
+        if self.is_running:
+            return
+        for bus_name, bus_thread in self.buses.items():
+            if bus_thread.ident is not None:
+                bus_thread = self.buses[bus_name] = bus_thread.renewed()
+            bus_thread.start()
+        self.is_running = True
+
+    #
+    def stop(self):
+        if not self.is_running:
+            return
+        for bus_thread in self.buses.values():
+            bus_thread.stopping = True
+            bus_thread.start_event.set()
+        for bus_thread in self.buses.values():
+            bus_thread.join()
+        self.is_running = False
+
+    #
+    # runs one cycle on every bus in parallel and returns the merged state view:
+    # {motor name: state}, state is None if the motor did not answer.
+    # A bus whose cycle does not end within timeout [s] reports its motors as None. The next
+    # call first waits (within its own timeout) for that cycle to end, then starts a new one
+    def cycle(self, timeout=None):
+        if not self.is_running:
+            self.start()
+
+        t_start = time.perf_counter()
+        deadline = t_start + timeout if timeout is not None else None
+        started = {}
+        for bus_name, bus_thread in self.buses.items():
+            started[bus_name] = not bus_thread.busy
+            if started[bus_name]:
+                bus_thread.request_cycle()
+        for bus_name, bus_thread in self.buses.items():
+            if not started[bus_name] and bus_thread.wait_cycle(_remaining(deadline)):
+                started[bus_name] = True
+                bus_thread.request_cycle()
+
+        states = {}
+        for bus_name, bus_thread in self.buses.items():
+            if not started[bus_name] or not bus_thread.wait_cycle(_remaining(deadline)):
+                # bus still busy: report its motors as missing for this cycle
+                with bus_thread.motor_ids_lock:
+                    motor_ids = list(bus_thread.motor_ids)
+                for motor_id in motor_ids:
+                    states[self.names[(bus_name, motor_id)]] = None
+                continue
+            if bus_thread.exception is not None:
+                exception, bus_thread.exception = bus_thread.exception, None
+                raise exception
+            for motor_id in bus_thread.read_ids:
+                name = self.names.get((bus_name, motor_id))
+                if name is not None:        # not removed during the cycle
+                    states[name] = bus_thread.states.get(motor_id)
+
+        self.cycle_time = time.perf_counter() - t_start
+        if self.telemetry is not None:
+            self.telemetry.publish(states)
+        return states
+
+    #
+    # {bus name: duration [s] of its last cycle}
+    def get_cycle_times(self):
+        return {bus_name: bus_thread.cycle_time for bus_name, bus_thread in self.buses.items()}
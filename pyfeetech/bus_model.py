@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+# Description: bus-time model of a control cycle and maximum sustainable control rate.
+#
+# BusModel predicts, for a baudrate, a number of motors and the register spans read and
+# written by every motor on every cycle, the wire time of the cycle (instruction and
+# status packets, 10 bits per byte, servo return delay), the host overhead (adapter
+# latency and processing, per round trip and per instruction without status packet) and
+# the highest control rate the bus can sustain. compare() runs the same cycle through
+# every read strategy (a READ per span, one READ per motor, one SYNC_READ) and write
+# strategy (acknowledged WRITEs, tx-only WRITEs to servos at status return level 0 that the
+# host does not wait for, REG_WRITE + ACTION, one SYNC_WRITE), and flags the ones that
+# cannot meet a requested rate. The host overheads default to typical USB adapter figures;
+# calibrate() measures them from the spans of a Tracer recorded on the real setup.
+#
+# usage:
+#   model = BusModel(baudrate=1000000)
+#   model.calibrate(tracer)                                 # optional, see tracer.py
+#   for plan in model.compare(6, reads=[(56, 15)], writes=[(42, 6)], rate_hz=500):
+#       print(plan["read"], plan["write"], plan["cycle_ms"], plan["max_rate_hz"], plan["meets_rate"])
+
+import bisect
+from .stservo_def import *
+from .port_handler import *
+from .tracer import *
+
+BUS_MODEL_READ_STRATEGIES = ("read", "block_read", "sync_read")
+BUS_MODEL_WRITE_STRATEGIES = ("write", "tx_only_write", "staged_write", "sync_write")
+
+# host overhead [ms] of a transaction waiting for status packets (adapter latency, syscalls,
+# parsing), and of an instruction sent without waiting for any
+BUS_MODEL_ROUND_TRIP_OVERHEAD_MS = 0.3
+BUS_MODEL_TX_OVERHEAD_MS = 0.02
+
+#
+class BusModel(object):
+    #
+    # return_delay_us: [us] servo return delay (register 7 is in units of 2 us)
+    # inter_frame_gap_ms: [ms] idle time after tx-only writes, see setInterFrameGap
+    def __init__(self, baudrate=DEFAULT_BAUDRATE, return_delay_us=0.0,
+                 round_trip_overhead_ms=BUS_MODEL_ROUND_TRIP_OVERHEAD_MS, tx_overhead_ms=BUS_MODEL_TX_OVERHEAD_MS,
+                 inter_frame_gap_ms=0.0):
+        self.baudrate = baudrate
+        self.return_delay_us = return_delay_us
+        self.round_trip_overhead_ms = round_trip_overhead_ms
+        self.tx_overhead_ms = tx_overhead_ms
+        self.inter_frame_gap_ms = inter_frame_gap_ms
+
+    #
+    # [ms] per byte on the wire, as PortHandler.tx_time_per_byte
+    @property
+    def tx_time_per_byte(self):
+        return (1000.0 / self.baudrate) * 10.0
+
+    # ----- transactions: (wire [ms], host [ms])
+    #
+    def read_ms(self, length):
+        wire = (8 + 6 + length) * self.tx_time_per_byte + self.return_delay_us / 1000.0
+        return wire, self.round_trip_overhead_ms
+
+    #
+    def write_ms(self, length, acknowledged=True):
+        if acknowledged:
+            wire = (7 + length + 6) * self.tx_time_per_byte + self.return_delay_us / 1000.0
+            return wire, self.round_trip_overhead_ms
+        return (7 + length) * self.tx_time_per_byte + self.inter_frame_gap_ms, self.tx_overhead_ms
+
+    #
+    def sync_read_ms(self, n_motors, length):
+        wire = ((8 + n_motors) + n_motors * (6 + length)) * self.tx_time_per_byte + n_motors * self.return_delay_us / 1000.0
+        return wire, self.round_trip_overhead_ms
+
+    #
+    def sync_write_ms(self, n_motors, length):
+        return (8 + n_motors * (length + 1)) * self.tx_time_per_byte, self.tx_overhead_ms
+
+    #
+    def action_ms(self):
+        return 6 * self.tx_time_per_byte, self.tx_overhead_ms
+
+    # ----- cycles
+    #
+    # n_motors: motors on the bus; reads, writes: [(address, length)] spans of every motor per
+    # cycle; rate_hz: requested control rate (None: no requirement)
+    # returns {"read", "write", "transactions", "wire_ms", "host_ms", "cycle_ms", "max_rate_hz",
+    #          "bus_load", "meets_rate"}, bus_load: fraction of the requested cycle on the wire
+    def plan(self, n_motors, reads=(), writes=(), read_strategy="sync_read", write_strategy="sync_write", rate_hz=None):
+        if read_strategy not in BUS_MODEL_READ_STRATEGIES:
+            raise ValueError(f"unknown read strategy: {read_strategy}")
+        if write_strategy not in BUS_MODEL_WRITE_STRATEGIES:
+            raise ValueError(f"unknown write strategy: {write_strategy}")
+
+        transactions = []       # [(count, (wire [ms], host [ms]))]
+        if reads:
+            block_length = max(a + l for a, l in reads) - min(a for a, _ in reads)
+            if read_strategy == "read":
+                transactions += [(n_motors, self.read_ms(length)) for _, length in reads]
+            elif read_strategy == "block_read":
+                transactions.append((n_motors, self.read_ms(block_length)))
+            else:
+                transactions.append((1, self.sync_read_ms(n_motors, block_length)))
+
+        for _, length in writes:
+            if write_strategy == "write":
+                transactions.append((n_motors, self.write_ms(length)))
+            elif write_strategy == "tx_only_write":
+                transactions.append((n_motors, self.write_ms(length, acknowledged=False)))
+            elif write_strategy == "staged_write":
+                transactions.append((n_motors, self.write_ms(length)))      # REG_WRITE, same size
+            else:
+                transactions.append((1, self.sync_write_ms(n_motors, length)))
+        if writes and write_strategy == "staged_write":
+            transactions.append((1, self.action_ms()))
+
+        wire_ms = sum(count * wire for count, (wire, _) in transactions)
+        host_ms = sum(count * host for count, (_, host) in transactions)
+        cycle_ms = wire_ms + host_ms
+        max_rate_hz = 1000.0 / cycle_ms if cycle_ms > 0 else float("inf")
+        return {
+            "read": read_strategy if reads else None,
+            "write": write_strategy if writes else None,
+            "transactions": sum(count for count, _ in transactions),
+            "wire_ms": wire_ms,
+            "host_ms": host_ms,
+            "cycle_ms": cycle_ms,
+            "max_rate_hz": max_rate_hz,
+            "bus_load": wire_ms * rate_hz / 1000.0 if rate_hz else None,
+            "meets_rate": rate_hz is None or max_rate_hz >= rate_hz,
+        }
+
+    #
+    # plans of every combination of strategies, fastest first
+    def compare(self, n_motors, reads=(), writes=(), rate_hz=None):
+        plans = []
+        for read_strategy in (BUS_MODEL_READ_STRATEGIES if reads else ("sync_read",)):
+            for write_strategy in (BUS_MODEL_WRITE_STRATEGIES if writes else ("sync_write",)):
+                plans.append(self.plan(n_motors, reads, writes, read_strategy, write_strategy, rate_hz))
+        plans.sort(key=lambda plan: plan["cycle_ms"])
+        return plans
+
+    # ----- calibration
+    #
+    # host overheads measured from the spans of a tracer attached to the bus while it ran
+    # (any mix of reads, sync reads and sync writes, at this model's baudrate): round trip
+    # overhead = duration of a successful txrx / sync_read span - wire time of the bytes
+    # written and received inside it; tx overhead = duration of a sync_write span.
+    # Medians, so a few preempted transactions do not skew them. Updates the model and returns
+    # {"round_trip_overhead_ms", "tx_overhead_ms", "round_trips", "tx_only"}
+    def calibrate(self, tracer):
+        spans = sorted((start, end, name, tid, args) for (name, start, end, tid, args) in tracer.events if end is not None)
+        starts = [span[0] for span in spans]
+
+        round_trips, tx_only = [], []
+        for start, end, name, tid, args in spans:
+            if name in (TRACE_TXRX, TRACE_SYNC_READ) and args and args.get("result") == COMM_SUCCESS:
+                wire_bytes = 0
+                for inner_start, inner_end, inner_name, inner_tid, inner_args in spans[bisect.bisect_left(starts, start):]:
+                    if inner_start > end:
+                        break
+                    if inner_tid == tid and inner_end <= end and inner_name in (TRACE_WRITE, TRACE_RECEIVE) and inner_args:
+                        wire_bytes += inner_args.get("bytes", 0)
+                round_trips.append((end - start) * 1000.0 - wire_bytes * self.tx_time_per_byte)
+            elif name == TRACE_SYNC_WRITE:
+                tx_only.append((end - start) * 1000.0)
+
+        if round_trips:
+            self.round_trip_overhead_ms = max(0.0, _median(round_trips))
+        if tx_only:
+            self.tx_overhead_ms = max(0.0, _median(tx_only))
+        return {
+            "round_trip_overhead_ms": self.round_trip_overhead_ms,
+            "tx_overhead_ms": self.tx_overhead_ms,
+            "round_trips": len(round_trips),
+            "tx_only": len(tx_only),
+        }
+
+#
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2.0
+
+#
+def print_bus_plans(plans, rate_hz=None):
+    print(f"{'read':<11} {'write':<14} {'trans':>5} {'wire':>7} {'host':>7} {'cycle':>7} {'max [Hz]':>9}" +
+          (f" {'load':>5}  {rate_hz:g} Hz" if rate_hz else ""))
+    for plan in plans:
+        line = (f"{plan['read'] or '-':<11} {plan['write'] or '-':<14} {plan['transactions']:>5} {plan['wire_ms']:>7.3f} "
+                f"{plan['host_ms']:>7.3f} {plan['cycle_ms']:>7.3f} {plan['max_rate_hz']:>9.1f}")
+        if rate_hz:
+            line += f" {plan['bus_load']:>5.0%}  {'ok' if plan['meets_rate'] else 'TOO SLOW'}"
+        print(line)
+    print("times in ms per cycle")
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+# Description: bus I/O loop (PortHandler + feetechsts) running in a dedicated subprocess.
+#
+# Telemetry and goals are exchanged through multiprocessing.shared_memory, so GIL
+# contention and GC pauses of the application never delay the I/O loop:
+# - state: written by the I/O loop every cycle, protected by a seqlock. Readers never block
+#   the writer, they just retry if they raced with it.
+# - goals: posted by the application, protected by a second seqlock. Every motor slot
+#   carries a generation counter, so the I/O loop only sends goals posted since its last
+#   cycle. Goals posted from several processes must be serialized with a lock that the
+#   I/O loop never takes (BusProcess.goals_lock can be handed to child processes).
+#
+# usage:
+#   bus = BusProcess("/dev/ttyACM0", [1, 2, 3], rate_hz=200)
+#   bus.start()                                 # False if the port cannot be opened
+#   bus.set_goal(1, 2048, speed=1000)
+#   timestamp, cycles, states = bus.read_state()
+#   bus.stop()
+#
+#   # any other process:
+#   shared = SharedBusState.attach(bus.name, [1, 2, 3])
+#   timestamp, cycles, states = shared.read_state()
+
+import time
+import struct
+import multiprocessing
+from .stservo_def import *
+from .port_handler import *
+from .feetechsts import *
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # python < 3.8
+    shared_memory = None
+
+# per motor state fields, in shared memory order
+STATE_FIELDS = ("position", "speed", "load", "voltage", "temperature", "status", "moving", "current", "error")
+
+# layout: state seqlock | state header | state slots | goal seqlock | goal slots
+_SEQ = struct.Struct("<I")
+_STATE_HEADER = struct.Struct("<dI")                            # timestamp [s], cycles
+_STATE_SLOT = struct.Struct("<b" + "i" * len(STATE_FIELDS))     # valid, fields
+_GOAL_SLOT = struct.Struct("<Iiii")                             # generation, position, speed, acceleration
+
+SEQLOCK_SPINS = 100     # seqlock retries before a reader starts sleeping between them
+SEQLOCK_BACKOFF = 1e-4  # [s] sleep between retries after SEQLOCK_SPINS
+
+#
+class SharedBusState(object):
+    #
+    def __init__(self, shm, motor_ids, owner=False):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        self.motor_ids = list(motor_ids)
+        self.slots = {motor_id: i for i, motor_id in enumerate(self.motor_ids)}
+
+        n = len(self.motor_ids)
+        self.state_seq_offset = 0
+        self.state_header_offset = _SEQ.size
+        self.state_slots_offset = self.state_header_offset + _STATE_HEADER.size
+        self.goal_seq_offset = self.state_slots_offset + n * _STATE_SLOT.size
+        self.goal_slots_offset = self.goal_seq_offset + _SEQ.size
+
+        self.goal_generations = [0] * n     # writer side: last generation posted per slot
+
+    #
+    @staticmethod
+    def size(motor_count):
+        return 2 * _SEQ.size + _STATE_HEADER.size + motor_count * (_STATE_SLOT.size + _GOAL_SLOT.size)
+
+    #
+    @classmethod
+    def create(cls, motor_ids):
+        if shared_memory is None:
+            raise ImportError("SharedBusState requires multiprocessing.shared_memory (Python >= 3.8)")
+        shm = shared_memory.SharedMemory(create=True, size=cls.size(len(motor_ids)))
+        shm.buf[:] = bytes(shm.size)
+        return cls(shm, motor_ids, owner=True)
+
+    #
+    @classmethod
+    def attach(cls, name, motor_ids):
+        if shared_memory is None:
+            raise ImportError("SharedBusState requires multiprocessing.shared_memory (Python >= 3.8)")
+        return cls(shared_memory.SharedMemory(name=name), motor_ids)
+
+    #
+    @property
+    def name(self):
+        return self.shm.name
+
+    #
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # ----- seqlock
+    #
+    def _write_begin(self, offset):
+        seq = _SEQ.unpack_from(self.buf, offset)[0]
+        _SEQ.pack_into(self.buf, offset, (seq + 1) & 0xFFFFFFFF)    # odd: write in progress
+        return seq
+
+    #
+    def _write_end(self, offset, seq):
+        _SEQ.pack_into(self.buf, offset, (seq + 2) & 0xFFFFFFFF)
+
+    #
+    # a reader that races with the writer yields, so that the writer (maybe on the same core)
+    # can finish; after SEQLOCK_SPINS retries it sleeps
+    def _read(self, offset, read):
+        retries = 0
+        while True:
+            seq = _SEQ.unpack_from(self.buf, offset)[0]
+            if not seq & 1:
+                data = read()
+                if _SEQ.unpack_from(self.buf, offset)[0] == seq:
+                    return data
+            retries += 1
+            time.sleep(0 if retries < SEQLOCK_SPINS else SEQLOCK_BACKOFF)
+
+    # ----- state (written by the I/O loop)
+    #
+    def write_state(self, timestamp, cycles, states):
+        seq = self._write_begin(self.state_seq_offset)
+        _STATE_HEADER.pack_into(self.buf, self.state_header_offset, timestamp, cycles)
+        for motor_id, i in self.slots.items():
+            state = states.get(motor_id)
+            offset = self.state_slots_offset + i * _STATE_SLOT.size
+            if state is None or state.get("stale"):
+                self.buf[offset] = 0
+            else:
+                _STATE_SLOT.pack_into(self.buf, offset, 1, *[state.get(field, 0) for field in STATE_FIELDS])
+        self._write_end(self.state_seq_offset, seq)
+
+    #
+    # returns (timestamp [s], cycles, {motor_id: state}), state is None if the motor did not answer
+    def read_state(self):
+        header, slots = self._read(self.state_seq_offset, self._read_state_raw)
+
+        states = {}
+        for motor_id, slot in zip(self.motor_ids, slots):
+            states[motor_id] = dict(zip(STATE_FIELDS, slot[1:])) if slot[0] else None
+        return header[0], header[1], states
+
+    #
+    def _read_state_raw(self):
+        return (_STATE_HEADER.unpack_from(self.buf, self.state_header_offset),
+                list(_STATE_SLOT.iter_unpack(self.buf[self.state_slots_offset: self.goal_seq_offset])))
+
+    # ----- goals (written by the application)
+    #
+    def write_goals(self, goals):
+        seq = self._write_begin(self.goal_seq_offset)
+        for motor_id, (position, speed, acceleration) in goals.items():
+            i = self.slots[motor_id]
+            generation = self._read_goal_generation(i) + 1
+            _GOAL_SLOT.pack_into(self.buf, self.goal_slots_offset + i * _GOAL_SLOT.size,
+                                 generation & 0xFFFFFFFF, position, speed, acceleration)
+        self._write_end(self.goal_seq_offset, seq)
+
+    #
+    def _read_goal_generation(self, i):
+        return _GOAL_SLOT.unpack_from(self.buf, self.goal_slots_offset + i * _GOAL_SLOT.size)[0]
+
+    #
+    # returns {motor_id: (position, speed, acceleration)} of the goals posted since the last call
+    def read_new_goals(self):
+        slots = self._read(self.goal_seq_offset, self._read_goals_raw)
+
+        goals = {}
+        for i, (motor_id, slot) in enumerate(zip(self.motor_ids, slots)):
+            if slot[0] != self.goal_generations[i]:
+                self.goal_generations[i] = slot[0]
+                goals[motor_id] = slot[1:]
+        return goals
+
+    #
+    def _read_goals_raw(self):
+        end = self.goal_slots_offset + len(self.motor_ids) * _GOAL_SLOT.size
+        return list(_GOAL_SLOT.iter_unpack(self.buf[self.goal_slots_offset: end]))
+
+#
+# I/O loop; reports on status (a Connection) None once the port is open, or the error message
+# port_factory: port_name -> port handler
+def _bus_process_main(shm_name, port_name, baudrate, motor_ids, rate_hz, stop_event, status, quarantine=None,
+                      port_factory=PortHandler):
+    shared = SharedBusState.attach(shm_name, motor_ids)
+    try:
+        portHandler = port_factory(port_name)
+        opened = portHandler.openPort() and portHandler.setBaudRate(baudrate)
+        error = None if opened else f"Failed to open port: {port_name} at {baudrate} bps"
+    except Exception as e:
+        error = f"Failed to open port: {port_name}: {e}"
+    status.send(error)
+    status.close()
+    if error is not None:
+        shared.close()
+        return
+
+    bus = feetechsts(portHandler)
+    bus.set_quarantine(quarantine)
+
+    period = 1.0 / rate_hz
+    cycles = 0
+    t_next = time.perf_counter()
+    try:
+        while not stop_event.is_set():
+            goals = shared.read_new_goals()
+            if goals:
+                bus.sync_write_goals(goals)
+            states = bus.sync_read_state(motor_ids)
+            cycles += 1
+            shared.write_state(time.time(), cycles, states)
+
+            t_next += period
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                t_next = time.perf_counter()  # overrun: do not try to catch up
+    finally:
+        portHandler.closePort()
+        shared.close()
+
+#
+class BusProcess(object):
+    #
+    # quarantine: MotorQuarantine used by the I/O loop (see quarantine.py), None to read every motor every cycle
+    # port_factory: port_name -> port handler, called in the subprocess (e.g. EmulatedPortHandler)
+    def __init__(self, port_name, motor_ids, baudrate=DEFAULT_BAUDRATE, rate_hz=100.0, quarantine=None,
+                 port_factory=PortHandler):
+        self.port_name = port_name
+        self.motor_ids = list(motor_ids)
+        self.baudrate = baudrate
+        self.rate_hz = rate_hz
+        self.quarantine = quarantine
+        self.port_factory = port_factory
+
+        self.shared = None
+        self.process = None
+        self.goals_lock = multiprocessing.Lock()
+        self.stop_event = multiprocessing.Event()
+
+    #
+    @property
+    def name(self):
+        return self.shared.name
+
+    #
+    # returns True once the subprocess has opened the port; False, with the subprocess cleaned
+    # up, as soon as it fails to (or after timeout)
+    def start(self, timeout=5.0):
+        if self.process is not None:
+            return True
+
+        self.shared = SharedBusState.create(self.motor_ids)
+        self.stop_event.clear()
+        status_recv, status_send = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(
+            target=_bus_process_main, name="pyfeetech-bus", daemon=True,
+            args=(self.shared.name, self.port_name, self.baudrate, self.motor_ids, self.rate_hz,
+                  self.stop_event, status_send, self.quarantine, self.port_factory))
+        self.process.start()
+        status_send.close()
+
+        # EOFError: the subprocess died before reporting
+        try:
+            error = status_recv.recv() if status_recv.poll(timeout) else f"no answer from the I/O loop within {timeout} s"
+        except EOFError:
+            error = "the I/O loop exited"
+        status_recv.close()
+
+        if error is not None:
+            print(f"[BusProcess] {error}")
+            self.stop()
+            return False
+        return True
+
+    #
+    def stop(self, timeout=2.0):
+        if self.process is None:
+            return
+
+        self.stop_event.set()
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process = None
+        self.shared.close()
+        self.shared = None
+
+    #
+    def read_state(self):
+        return self.shared.read_state()
+
+    #
+    def set_goal(self, motor_id, position, speed=0, acceleration=0):
+        self.set_goals({motor_id: (position, speed, acceleration)})
+
+    #
+    # goals: {motor_id: (position, speed, acceleration)}
+    def set_goals(self, goals):
+        with self.goals_lock:
+            self.shared.write_goals(goals)
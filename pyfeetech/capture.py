@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+
+# Description: byte-level record / replay of the traffic of a port.
+#
+# RecordingPortHandler wraps any port handler (serial, emulated, ...) and appends every chunk
+# written and read, with monotonic timestamps, to a compact capture file. ReplayPortHandler
+# plays a capture back in place of a port: the bytes of every status packet become readable
+# at their original delay after the instruction that triggered them (divided by speed, or at
+# once with speed=None), so parser and decoder benchmarks run on real production traffic,
+# timeouts and corruption included, and give the same results on every run. Written
+# packets are compared with the recorded ones: a mismatch means the code under test did
+# not send what the recorded code sent, and the replay is no longer meaningful.
+#
+# capture file: CAPTURE_MAGIC, version (1 byte), port name (1 byte length + UTF-8), then
+# records of kind (1 byte), time since the previous record [us] (4 bytes), length (2 bytes)
+# and the bytes (for CAPTURE_BAUDRATE: the baudrate, 4 bytes), little endian
+#
+# usage:
+#   portHandler = RecordingPortHandler(PortHandler("/dev/ttyACM0"), "session.cap")
+#   bus = feetechsts(portHandler)
+#   portHandler.openPort()
+#   ... run the code to record ...
+#   portHandler.closePort()
+#
+#   portHandler = ReplayPortHandler("session.cap", speed=None)
+#   bus = feetechsts(portHandler)
+#   portHandler.openPort()
+#   ... run the same code, e.g. with a new decoder, and compare the results ...
+
+import time
+import struct
+from .port_handler import *
+
+CAPTURE_MAGIC = b"PFCAP"
+CAPTURE_VERSION = 1
+
+# record kinds
+CAPTURE_WRITE       = ord("W")
+CAPTURE_READ        = ord("R")
+CAPTURE_BAUDRATE    = ord("B")
+
+CAPTURE_RECORD = struct.Struct("<BIH")      # kind, time since the previous record [us], length
+CAPTURE_MAX_DELTA_US = 0xFFFFFFFF
+
+#
+class CaptureWriter(object):
+    #
+    def __init__(self, path, port_name=""):
+        self.f = open(path, "wb")
+        name = port_name.encode("utf-8")[:255]
+        self.f.write(CAPTURE_MAGIC + bytes([CAPTURE_VERSION, len(name)]) + name)
+        self.t_last = None
+        self.records = 0
+
+    #
+    # timestamp [s], any origin: only the time between records is stored
+    def add(self, kind, timestamp, data):
+        if self.t_last is None:
+            self.t_last = timestamp
+        delta_us = min(CAPTURE_MAX_DELTA_US, max(0, int(round((timestamp - self.t_last) * 1e6))))
+        self.t_last += delta_us / 1e6
+        if kind == CAPTURE_BAUDRATE:
+            data = struct.pack("<I", data)
+        self.f.write(CAPTURE_RECORD.pack(kind, delta_us, len(data)))
+        self.f.write(bytes(data))
+        self.records += 1
+
+    #
+    def flush(self):
+        self.f.flush()
+
+    #
+    def close(self):
+        if not self.f.closed:
+            self.f.close()
+
+#
+class PortCapture(object):
+    #
+    # events: [(kind, time since the first record [s], bytes, or baudrate for CAPTURE_BAUDRATE)]
+    def __init__(self, port_name="", events=None):
+        self.port_name = port_name
+        self.events = list(events) if events is not None else []
+
+    #
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            content = f.read()
+
+        if not content.startswith(CAPTURE_MAGIC) or len(content) < len(CAPTURE_MAGIC) + 2:
+            raise ValueError(f"{path} is not a capture file")
+        i = len(CAPTURE_MAGIC)
+        version, name_length = content[i], content[i + 1]
+        if version != CAPTURE_VERSION:
+            raise ValueError(f"unsupported capture version: {version}")
+        i += 2
+        port_name = content[i: i + name_length].decode("utf-8")
+        i += name_length
+
+        events, t = [], 0.0
+        while i + CAPTURE_RECORD.size <= len(content):
+            kind, delta_us, length = CAPTURE_RECORD.unpack_from(content, i)
+            i += CAPTURE_RECORD.size
+            data = content[i: i + length]
+            if len(data) < length:
+                break                   # truncated by a crash of the recording process
+            i += length
+            t += delta_us / 1e6
+            events.append((kind, t, struct.unpack("<I", data)[0] if kind == CAPTURE_BAUDRATE else data))
+        return cls(port_name, events)
+
+    #
+    def save(self, path):
+        writer = CaptureWriter(path, self.port_name)
+        for kind, t, data in self.events:
+            writer.add(kind, t, data)
+        writer.close()
+
+    #
+    # first baudrate of the capture, None if not recorded
+    def getBaudRate(self):
+        for kind, _, data in self.events:
+            if kind == CAPTURE_BAUDRATE:
+                return data
+        return None
+
+    #
+    def getStats(self):
+        written = [data for kind, _, data in self.events if kind == CAPTURE_WRITE]
+        read = [data for kind, _, data in self.events if kind == CAPTURE_READ]
+        return {
+            "port": self.port_name,
+            "duration": self.events[-1][1] if self.events else 0.0,
+            "writes": len(written),
+            "bytes_written": sum(len(data) for data in written),
+            "read_chunks": len(read),
+            "bytes_read": sum(len(data) for data in read),
+        }
+
+#
+class RecordingPortHandler(PortHandler):
+    #
+    # port_handler: the port to record; path: capture file, written from openPort to closePort
+    def __init__(self, port_handler, path):
+        PortHandler.__init__(self, port_handler.getPortName())
+        self.port = port_handler
+        self.path = path
+        self.writer = None
+        self.latency_timer = port_handler.getLatencyTimer()
+
+    #
+    def _sync(self):
+        self.is_open = self.port.is_open
+        self.baudrate = self.port.getBaudRate()
+        self.tx_time_per_byte = self.port.tx_time_per_byte
+
+    #
+    def openPort(self):
+        if self.writer is None:
+            self.writer = CaptureWriter(self.path, self.port.getPortName())
+        result = self.port.openPort()
+        self._sync()
+        if result:
+            self.writer.add(CAPTURE_BAUDRATE, time.perf_counter(), self.baudrate)
+        return result
+
+    #
+    def closePort(self):
+        self.port.closePort()
+        self._sync()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    #
+    def clearPort(self):
+        self.port.clearPort()
+
+    #
+    def setBaudRate(self, baudrate):
+        result = self.port.setBaudRate(baudrate)
+        self._sync()
+        if result and self.writer is not None:
+            self.writer.add(CAPTURE_BAUDRATE, time.perf_counter(), self.baudrate)
+        return result
+
+    #
+    def setLatencyTimer(self, msec):
+        self.latency_timer = msec
+        self.port.setLatencyTimer(msec)
+
+    #
+    def setLowLatency(self, enabled=True):
+        return self.port.setLowLatency(enabled)
+
+    #
+    def getLowLatencyReport(self):
+        return self.port.getLowLatencyReport()
+
+    #
+    def getBytesAvailable(self):
+        return self.port.getBytesAvailable()
+
+    #
+    def readPort(self, length):
+        data = self.port.readPort(length)
+        if data and self.writer is not None:
+            self.writer.add(CAPTURE_READ, time.perf_counter(), data)
+        return data
+
+    #
+    def writePort(self, packet):
+        if self.writer is not None:
+            self.writer.add(CAPTURE_WRITE, time.perf_counter(), packet)
+        return self.port.writePort(packet)
+
+#
+class ReplayPortHandler(PortHandler):
+    #
+    # capture: PortCapture or path of a capture file
+    # speed:   replay speed (1.0: original timing), None: every chunk as soon as it is read
+    def __init__(self, capture, speed=1.0):
+        if not isinstance(capture, PortCapture):
+            capture = PortCapture.load(capture)
+        PortHandler.__init__(self, capture.port_name)
+        self.capture = capture
+        self.speed = speed
+        baudrate = capture.getBaudRate()
+        if baudrate is not None:
+            self.baudrate = baudrate
+
+        self.rewind()
+
+    #
+    # back to the start of the capture, to replay it again
+    def rewind(self):
+        self.index = 0
+        self.rx_buffer = bytearray()
+        self.t_anchor = (time.perf_counter(), 0.0)     # (now, capture time) of the last write
+        self.writes = 0
+        self.mismatches = 0             # writes that differ from the recorded ones
+        self.overruns = 0               # writes past the end of the capture
+
+    #
+    def setupPort(self, cflag_baud):
+        self.is_open = True
+        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
+        return True
+
+    #
+    def closePort(self):
+        self.is_open = False
+
+    #
+    def clearPort(self):
+        pass
+
+    #
+    def isFinished(self):
+        return self.index >= len(self.capture.events)
+
+    #
+    # moves to the rx buffer the chunks read until the next write, once they are due
+    def _receive(self, all_due=False):
+        events = self.capture.events
+        t_now, t_capture = self.t_anchor
+        while self.index < len(events):
+            kind, t, data = events[self.index]
+            if kind == CAPTURE_WRITE:
+                break
+            if kind == CAPTURE_READ:
+                if not all_due and self.speed and (time.perf_counter() - t_now) * self.speed < t - t_capture:
+                    break
+                self.rx_buffer.extend(data)
+            self.index += 1
+
+    #
+    def getBytesAvailable(self):
+        self._receive()
+        return len(self.rx_buffer)
+
+    #
+    def readPort(self, length):
+        self._receive()
+        data = bytes(self.rx_buffer[:length])
+        del self.rx_buffer[:length]
+        return data
+
+    #
+    def writePort(self, packet):
+        # bytes received before this write in the recording would be in the input buffer by now
+        self._receive(all_due=True)
+
+        self.writes += 1
+        if self.isFinished():
+            self.overruns += 1
+            return len(packet)
+
+        _, t, data = self.capture.events[self.index]
+        if bytes(packet) != data:
+            self.mismatches += 1
+        self.t_anchor = (time.perf_counter(), t)
+        self.index += 1
+        return len(packet)
+
+    #
+    # timeouts run at the replay speed too; with speed=None the status packets are all there
+    # at once: time out as soon as none is left
+    def isPacketTimeout(self):
+        if self.speed is None:
+            self._receive()
+            timeout = self.isFinished() or self.capture.events[self.index][0] == CAPTURE_WRITE
+        else:
+            timeout = self.getTimeSinceStart() * self.speed > self.packet_timeout
+        if timeout:
+            self.packet_timeout = 0
+        return timeout
+
+    #
+    def getStats(self):
+        return {
+            "writes": self.writes,
+            "mismatches": self.mismatches,
+            "overruns": self.overruns,
+            "remaining": len(self.capture.events) - self.index,
+        }
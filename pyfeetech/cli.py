@@ -0,0 +1,567 @@
+#!/usr/bin/env python
+
+# Description: `pyfeetech` command line tool, to check the health of a bus without writing Python.
+#
+# Subcommands:
+#   scan     fast discovery of the servos on the bus (IDs, models, baudrates)
+#   monitor  SYNC_READ dashboard of the state of some servos, with achieved rate and errors
+#   dump     EEPROM/RAM register tables of some servos, as JSON (tables as hex strings)
+#   restore  writes back the settings of a dump
+#   bench    transaction latency and throughput (--parsers: and of the packet parsers on
+#            adversarial streams, see parser_harness.py)
+#   provision  flash the settings of a fleet spec (see provisioning.py)
+#   plan     predicted bus time and maximum control rate of a cycle, per strategy (see bus_model.py)
+#
+# --port emulated runs any subcommand against an in-memory bus (see EmulatedPortHandler)
+# of --emulated-ids servos, with real wire timings. --record saves the traffic of a run to a
+# capture file, --replay runs a subcommand against a capture instead of a port (see capture.py).
+#
+# usage:
+#   pyfeetech scan --port /dev/ttyACM0
+#   pyfeetech monitor --port /dev/ttyACM0 --ids 1-6 --rate 100
+#   pyfeetech dump --port /dev/ttyACM0 --ids 1-6 --output rig.json
+#   pyfeetech restore rig.json --port /dev/ttyACM0
+#   pyfeetech bench --port emulated --ids 1-6 --json
+#   pyfeetech provision fleet.yaml --report report.json
+#   pyfeetech plan --ids 1-12 --rate 500 --read 56:15 --write 41:7 --calibrate 200
+#   pyfeetech bench --port /dev/ttyACM0 --record bench.cap; pyfeetech bench --replay bench.cap
+#   python -m pyfeetech scan --port /dev/ttyACM0
+
+import sys
+import time
+import json
+import argparse
+from .stservo_def import *
+from .port_handler import *
+from .feetechsts import *
+from .group_sync_write import *
+from .discovery import *
+from .emulated_port import *
+from .capture import *
+from .parser_harness import *
+from .bus_model import *
+from .provisioning import *
+
+# register tables: (start address, length)
+REGISTER_TABLES = {
+    "eeprom":   (0, STS_TORQUE_ENABLE),                         # 0 .. 39
+    "ram":      (STS_TORQUE_ENABLE, STS_STATE_START + STS_STATE_LENGTH - STS_TORQUE_ENABLE),   # 40 .. 70
+}
+
+# spans (STS3215 address, length) written back by restore. ID and baudrate are left alone (the
+# servo would stop answering), as well as torque enable and goal position (the servo would move).
+# The response level (8) is restored last, with set_response_level
+RESTORE_SPANS = {
+    "eeprom":   [(STS_MIN_ANGLE_LIMIT_L, STS_PROTECTIVE_TORQUE + 1 - STS_MIN_ANGLE_LIMIT_L)],   # 9 .. 34
+    "ram":      [(STS_ACC, 1), (STS_GOAL_SPEED_L, 2), (STS_TORQUE_LIMIT_L, 2)],
+}
+
+MONITOR_REFRESH_S = 0.2
+
+#
+# "1-6,8,10-12" -> [1, 2, 3, 4, 5, 6, 8, 10, 11, 12]
+def parse_ids(text):
+    ids = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            ids.extend(range(int(first), int(last) + 1))
+        else:
+            ids.append(int(part))
+    for sts_id in ids:
+        if not 0 <= sts_id <= MAX_ID:
+            raise argparse.ArgumentTypeError(f"invalid ID: {sts_id}")
+    return sorted(set(ids))
+
+#
+def _error(message):
+    print(f"pyfeetech: error: {message}", file=sys.stderr)
+
+#
+def _open_bus(args):
+    if args.replay is not None:
+        try:
+            portHandler = ReplayPortHandler(args.replay, speed=args.replay_speed or None)
+        except (OSError, ValueError) as e:
+            _error(f"cannot replay {args.replay}: {e}")
+            return None
+    elif args.port == "emulated":
+        servos = [EmulatedServo(sts_id, baudrate=args.baudrate) for sts_id in args.emulated_ids]
+        portHandler = EmulatedPortHandler(servos, realtime=True)
+    else:
+        portHandler = PortHandler(args.port)
+    if args.record is not None:
+        portHandler = RecordingPortHandler(portHandler, args.record)
+    if args.low_latency:
+        portHandler.setLowLatency(True)
+
+    try:
+        opened = portHandler.openPort() and portHandler.setBaudRate(args.baudrate)
+    except Exception as e:
+        _error(f"cannot open {args.port}: {e}")
+        return None
+    if not opened:
+        _error(f"cannot open {args.port} at {args.baudrate} bps")
+        return None
+
+    if args.latency is not None:
+        portHandler.setLatencyTimer(args.latency)
+    for error in portHandler.getLowLatencyReport().get("errors", []):
+        _error(f"low-latency mode: {error}")
+    return feetechsts(portHandler)
+
+#
+def _print_json(content, output=None):
+    text = json.dumps(content, indent=1)
+    if output is None or output == "-":
+        print(text)
+    else:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+
+#
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# ----- scan
+#
+def cmd_scan(args):
+    bus = _open_bus(args)
+    if bus is None:
+        return 1
+
+    baudrates = args.baudrates if args.baudrates else ([args.baudrate] if not args.all_baudrates else None)
+    t_start = time.perf_counter()
+    found = scan_bus(bus, ids=args.ids, baudrates=baudrates, stop_at_first_baudrate=args.first)
+    elapsed = time.perf_counter() - t_start
+    bus.portHandler.closePort()
+
+    if args.json:
+        _print_json([servo._asdict() for servo in found])
+    else:
+        print(f"{'ID':>4} {'model':>6} {'baudrate':>9}")
+        for servo in found:
+            print(f"{servo.id:>4} {servo.model:>6} {servo.baudrate:>9}")
+        print(f"{len(found)} servo(s) found in {elapsed:.2f} s")
+    return 0 if found else 1
+
+
+# ----- monitor
+#
+def cmd_monitor(args):
+    bus = _open_bus(args)
+    if bus is None:
+        return 1
+
+    ids = args.ids
+    period = 1.0 / args.rate
+    missing = dict.fromkeys(ids, 0)
+    errors = dict.fromkeys(ids, 0)
+    cycles = 0
+    redraw = sys.stdout.isatty() and not args.plain
+
+    t_start = t_next = t_refresh = time.perf_counter()
+    refresh_cycles = 0
+    try:
+        while args.duration is None or time.perf_counter() - t_start < args.duration:
+            states = bus.sync_read_state(ids)
+            cycles += 1
+            refresh_cycles += 1
+            for sts_id, state in states.items():
+                if state is None:
+                    missing[sts_id] += 1
+                elif state["error"]:
+                    errors[sts_id] += 1
+
+            now = time.perf_counter()
+            if now - t_refresh >= MONITOR_REFRESH_S:
+                rate = refresh_cycles / (now - t_refresh)
+                _print_monitor(states, rate, cycles, missing, errors, redraw)
+                t_refresh, refresh_cycles = now, 0
+
+            t_next += period
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                t_next = time.perf_counter()  # overrun: do not try to catch up
+    except KeyboardInterrupt:
+        pass
+    finally:
+        bus.portHandler.closePort()
+
+    elapsed = time.perf_counter() - t_start
+    print(f"{cycles} cycles in {elapsed:.1f} s ({cycles / max(elapsed, 1e-9):.1f} Hz), "
+          f"missing: {sum(missing.values())}, errors: {sum(errors.values())}")
+    return 0
+
+#
+def _print_monitor(states, rate, cycles, missing, errors, redraw):
+    if not redraw:
+        answering = sum(state is not None for state in states.values())
+        print(f"{rate:7.1f} Hz, cycles: {cycles}, answering: {answering}/{len(states)}, "
+              f"missing: {sum(missing.values())}, errors: {sum(errors.values())}")
+        return
+
+    lines = ["\033[H\033[J" + f"pyfeetech monitor: {rate:.1f} Hz, {cycles} cycles",
+             f"{'ID':>4} {'position':>9} {'speed':>6} {'load':>6} {'volt':>5} {'temp':>5} {'status':>7} {'current':>8} {'missing':>8} {'errors':>7}"]
+    for sts_id, state in states.items():
+        if state is None:
+            lines.append(f"{sts_id:>4} {'-':>9} {'-':>6} {'-':>6} {'-':>5} {'-':>5} {'-':>7} {'-':>8} {missing[sts_id]:>8} {errors[sts_id]:>7}")
+        else:
+            lines.append(f"{sts_id:>4} {state['position']:>9} {state['speed']:>6} {state['load']:>6} "
+                         f"{state['voltage'] / 10.0:>5.1f} {state['temperature']:>5} {format(state['status'], '#b') if 'status' in state else '-':>7} "
+                         f"{state['current']:>8} {missing[sts_id]:>8} {errors[sts_id]:>7}")
+    print("\n".join(lines), flush=True)
+
+
+# ----- dump / restore
+#
+def cmd_dump(args):
+    bus = _open_bus(args)
+    if bus is None:
+        return 1
+
+    servos = {}
+    failed = []
+    for sts_id in args.ids:
+        model, sts_comm_result, _ = bus.ping(sts_id)
+        if sts_comm_result != COMM_SUCCESS:
+            failed.append(sts_id)
+            continue
+
+        servo = {"model": model}
+        for table in args.tables:
+            start, length = REGISTER_TABLES[table]
+            data, sts_comm_result, _ = bus.readTxRx(sts_id, start, length)
+            if sts_comm_result != COMM_SUCCESS:
+                failed.append(sts_id)
+                break
+            servo[table] = {"start": start, "data": bytes(data).hex()}
+        else:
+            servos[str(sts_id)] = servo
+    bus.portHandler.closePort()
+
+    _print_json({"port": args.port, "baudrate": args.baudrate, "servos": servos}, args.output)
+    for sts_id in failed:
+        _error(f"ID {sts_id} did not answer")
+    return 1 if failed else 0
+
+#
+def cmd_restore(args):
+    with open(args.input) as f:
+        dump = json.load(f)
+    servos = {int(sts_id): servo for sts_id, servo in dump["servos"].items()}
+    ids = [sts_id for sts_id in (args.ids if args.ids else sorted(servos)) if sts_id in servos]
+
+    bus = _open_bus(args)
+    if bus is None:
+        return 1
+
+    failed = []
+    for sts_id in ids:
+        servo = servos[sts_id]
+        _, sts_comm_result, _ = bus.ping(sts_id)
+        if sts_comm_result != COMM_SUCCESS:
+            _error(f"ID {sts_id} did not answer")
+            failed.append(sts_id)
+            continue
+        if bus.getIdModel(sts_id) != servo["model"]:
+            _error(f"ID {sts_id} is a model {bus.getIdModel(sts_id)}, the dump is of a model {servo['model']}. Skipping")
+            failed.append(sts_id)
+            continue
+
+        register_map = bus.getIdRegisterMap(sts_id)
+        level = None
+        for table in args.tables:
+            if table not in servo:
+                continue
+            start, data = servo[table]["start"], list(bytes.fromhex(servo[table]["data"]))
+            if table == "eeprom" and start <= STS_RESPONSE_LEVEL < start + len(data):
+                level = data[STS_RESPONSE_LEVEL - start]
+            for span in RESTORE_SPANS[table]:
+                for address, length in _present_runs(register_map, *span):
+                    values = data[address - start: address - start + length]
+                    print(f"ID {sts_id}: {table} [{address}..{address + length - 1}] <- {values}")
+                    if args.dry_run:
+                        continue
+                    if not _write_span(bus, sts_id, address, values, table == "eeprom"):
+                        failed.append(sts_id)
+
+        # last: at level 0 the servo stops acknowledging the writes above
+        if level is not None:
+            print(f"ID {sts_id}: response level <- {level}")
+            if not args.dry_run and bus.set_response_level([sts_id], level, persistent=True):
+                _error(f"ID {sts_id}: cannot set the response level")
+                failed.append(sts_id)
+    bus.portHandler.closePort()
+    return 1 if failed else 0
+
+#
+# runs (address, length) of the span that exist on the model of register_map
+def _present_runs(register_map, address, length):
+    runs = []
+    for a in range(address, address + length):
+        if register_map.address(a) is None:
+            continue
+        if runs and runs[-1][0] + runs[-1][1] == a:
+            runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+        else:
+            runs.append((a, 1))
+    return runs
+
+#
+def _write_span(bus, sts_id, address, values, persistent):
+    lock = bus.register(sts_id, STS_LOCK)
+    if persistent:
+        bus.write1ByteTxRx(sts_id, lock, 0)
+    sts_comm_result, sts_error = bus.writeTxRx(sts_id, address, len(values), values)
+    if persistent:
+        bus.write1ByteTxRx(sts_id, lock, 1)
+
+    if sts_comm_result != COMM_SUCCESS:
+        _error(f"ID {sts_id}: {bus.getTxRxResult(sts_comm_result)}")
+    elif sts_error != 0:
+        _error(f"ID {sts_id}: {bus.getRxPacketError(sts_error)}")
+    return sts_comm_result == COMM_SUCCESS and sts_error == 0
+
+
+# ----- bench
+#
+def cmd_bench(args):
+    bus = _open_bus(args)
+    if bus is None:
+        return 1
+    ids = args.ids
+
+    # goal positions written back as they are, so that the sync write does not move anything
+    goals = {}
+    for sts_id in ids:
+        data, sts_comm_result, _ = bus.readTxRx(sts_id, bus.register(sts_id, STS_GOAL_POSITION_L), 2)
+        if sts_comm_result == COMM_SUCCESS:
+            goals[sts_id] = data
+    groupSyncWrite = GroupSyncWrite(bus, STS_GOAL_POSITION_L, 2)
+    for sts_id, data in goals.items():
+        groupSyncWrite.addParam(sts_id, data)
+
+    def read():
+        return all(bus.readTxRx(sts_id, STS_PRESENT_POSITION_L, 2)[1] == COMM_SUCCESS for sts_id in ids)
+
+    def read_state():
+        return all(bus.readTxRx(sts_id, STS_STATE_START, STS_STATE_LENGTH)[1] == COMM_SUCCESS for sts_id in ids)
+
+    def sync_read():
+        return all(state is not None for state in bus.sync_read_state(ids).values())
+
+    def sync_write():
+        return groupSyncWrite.txPacket() == COMM_SUCCESS
+
+    tests = [("read", read), ("read_state", read_state), ("sync_read", sync_read)]
+    if goals:
+        tests.append(("sync_write", sync_write))
+
+    results = []
+    for name, test in tests:
+        latencies = []
+        failures = 0
+        t_start = time.perf_counter()
+        for _ in range(args.count):
+            t = time.perf_counter()
+            if not test():
+                failures += 1
+            latencies.append((time.perf_counter() - t) * 1000.0)
+        elapsed = time.perf_counter() - t_start
+        results.append({
+            "test": name,
+            "count": args.count,
+            "failures": failures,
+            "rate_hz": args.count / elapsed,
+            "servos_per_s": args.count * len(ids) / elapsed,
+            "mean_ms": sum(latencies) / len(latencies),
+            "p50_ms": _percentile(latencies, 0.5),
+            "p99_ms": _percentile(latencies, 0.99),
+            "max_ms": max(latencies),
+        })
+    low_latency = dict(bus.portHandler.getLowLatencyReport()) or None
+    bus.portHandler.closePort()
+
+    parsers = run_parser_harness(args.parser_packets, args.error_rate, ids=ids) if args.parsers else None
+
+    if args.json:
+        content = {"port": args.port, "baudrate": args.baudrate, "ids": ids, "results": results,
+                   "low_latency": low_latency}
+        if parsers is not None:
+            content["parsers"] = parsers
+        _print_json(content)
+    else:
+        print(f"{len(ids)} servo(s) at {args.baudrate} bps, {args.count} iterations per test "
+              f"(read, read_state: one transaction per servo)")
+        if low_latency:
+            print(f"low-latency mode: ASYNC_LOW_LATENCY: {low_latency['async_low_latency']}, "
+                  f"latency timer [ms]: {low_latency['latency_timer']}")
+        print(f"{'test':<11} {'rate [Hz]':>10} {'servo/s':>9} {'mean':>7} {'p50':>7} {'p99':>7} {'max':>7} {'fail':>5}")
+        for r in results:
+            print(f"{r['test']:<11} {r['rate_hz']:>10.1f} {r['servos_per_s']:>9.0f} {r['mean_ms']:>7.3f} "
+                  f"{r['p50_ms']:>7.3f} {r['p99_ms']:>7.3f} {r['max_ms']:>7.3f} {r['failures']:>5}")
+        print("latencies in ms")
+        if parsers is not None:
+            print()
+            print_parser_results(parsers)
+    return 1 if any(r["failures"] for r in results) else 0
+
+
+# ----- provision
+#
+def cmd_provision(args):
+    try:
+        provisioner = FleetProvisioner.from_file(args.spec, verbose=args.verbose)
+    except (ValueError, ImportError, OSError) as e:
+        _error(str(e))
+        return 1
+
+    report = provisioner.run(dry_run=args.dry_run)
+    print_provisioning_report(report)
+    if args.report:
+        _print_json(report, args.report)
+    return 0 if all(entry["status"] in (PROVISION_OK, PROVISION_UNCHANGED, PROVISION_PLANNED) for entry in report) else 1
+
+
+# ----- plan
+#
+# "56:15" -> (56, 15)
+def parse_span(text):
+    try:
+        address, length = (int(x, 0) for x in text.split(":"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid span (address:length): {text}")
+    return address, length
+
+#
+def cmd_plan(args):
+    model = BusModel(args.baudrate, return_delay_us=args.return_delay)
+    calibration = None
+    if args.calibrate:
+        bus = _open_bus(args)
+        if bus is None:
+            return 1
+        tracer = Tracer()
+        bus.setTracer(tracer)
+        for _ in range(args.calibrate):
+            bus.sync_read_state(args.ids)
+            bus.readTxRx(args.ids[0], STS_PRESENT_POSITION_L, 2)
+        bus.setTracer(None)
+        bus.portHandler.closePort()
+        calibration = model.calibrate(tracer)
+
+    plans = model.compare(len(args.ids), args.read, args.write, args.rate)
+    if args.json:
+        _print_json({"baudrate": args.baudrate, "ids": args.ids, "rate_hz": args.rate, "calibration": calibration,
+                     "round_trip_overhead_ms": model.round_trip_overhead_ms, "tx_overhead_ms": model.tx_overhead_ms,
+                     "plans": plans})
+    else:
+        print(f"{len(args.ids)} servo(s) at {args.baudrate} bps, reads: {args.read}, writes: {args.write}, "
+              f"host overhead: {model.round_trip_overhead_ms:.3f} ms per round trip, {model.tx_overhead_ms:.3f} ms tx-only"
+              + (" (calibrated)" if calibration else ""))
+        print_bus_plans(plans, args.rate)
+    return 0 if args.rate is None or any(plan["meets_rate"] for plan in plans) else 1
+
+
+# ----- main
+#
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pyfeetech", description="Feetech servo bus tool")
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-p", "--port", default="/dev/ttyACM0",
+                        help="serial port, or 'emulated' for an in-memory bus (default: /dev/ttyACM0)")
+    common.add_argument("-b", "--baudrate", type=int, default=DEFAULT_BAUDRATE,
+                        help=f"baudrate [bps] (default: {DEFAULT_BAUDRATE})")
+    common.add_argument("--latency", type=float, default=None,
+                        help="timeout slack [ms] added to every status packet")
+    common.add_argument("--emulated-ids", type=parse_ids, default=parse_ids("1-6"),
+                        help="IDs of the servos of the emulated bus (default: 1-6)")
+    common.add_argument("--low-latency", action="store_true",
+                        help="Linux: ASYNC_LOW_LATENCY and FTDI latency timer to 1 ms while the port is open")
+    common.add_argument("--record", default=None, metavar="FILE",
+                        help="save the bytes written and read to a capture file")
+    common.add_argument("--replay", default=None, metavar="FILE",
+                        help="play back a capture file instead of opening --port")
+    common.add_argument("--replay-speed", type=float, default=1.0,
+                        help="replay speed, 0: as fast as possible (default: 1, original timing)")
+
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    p = subparsers.add_parser("scan", parents=[common], help="discover the servos on the bus")
+    p.add_argument("--ids", type=parse_ids, default=None, help="IDs to probe, e.g. 1-20 (default: all)")
+    p.add_argument("--baudrates", type=int, nargs="+", default=None, help="baudrates to probe")
+    p.add_argument("--all-baudrates", action="store_true", help="probe all the supported baudrates")
+    p.add_argument("--first", action="store_true", help="stop at the first baudrate with servos")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    p.set_defaults(func=cmd_scan)
+
+    p = subparsers.add_parser("monitor", parents=[common], help="live state of some servos")
+    p.add_argument("--ids", type=parse_ids, required=True, help="IDs to monitor, e.g. 1-6")
+    p.add_argument("--rate", type=float, default=50.0, help="SYNC_READ rate [Hz] (default: 50)")
+    p.add_argument("--duration", type=float, default=None, help="[s] (default: until Ctrl+C)")
+    p.add_argument("--plain", action="store_true", help="one summary line per refresh, no dashboard")
+    p.set_defaults(func=cmd_monitor)
+
+    p = subparsers.add_parser("dump", parents=[common], help="dump register tables as JSON")
+    p.add_argument("--ids", type=parse_ids, required=True, help="IDs to dump, e.g. 1-6")
+    p.add_argument("--tables", nargs="+", choices=sorted(REGISTER_TABLES), default=["eeprom", "ram"])
+    p.add_argument("-o", "--output", default=None, help="output file (default: stdout)")
+    p.set_defaults(func=cmd_dump)
+
+    p = subparsers.add_parser("restore", parents=[common], help="write back the settings of a dump")
+    p.add_argument("input", help="dump file")
+    p.add_argument("--ids", type=parse_ids, default=None, help="IDs to restore (default: all in the dump)")
+    p.add_argument("--tables", nargs="+", choices=sorted(REGISTER_TABLES), default=["eeprom"])
+    p.add_argument("--dry-run", action="store_true", help="show what would be written")
+    p.set_defaults(func=cmd_restore)
+
+    p = subparsers.add_parser("bench", parents=[common], help="transaction latency and throughput")
+    p.add_argument("--ids", type=parse_ids, default=parse_ids("1-6"), help="IDs to use (default: 1-6)")
+    p.add_argument("-n", "--count", type=int, default=200, help="iterations per test (default: 200)")
+    p.add_argument("--parsers", action="store_true", help="also time the packet parsers on adversarial streams")
+    p.add_argument("--parser-packets", type=int, default=5000, help="packets per parser (default: 5000)")
+    p.add_argument("--error-rate", type=float, default=0.05, help="fraction of damaged packets (default: 0.05)")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    p.set_defaults(func=cmd_bench)
+
+    p = subparsers.add_parser("provision", help="flash the settings of a fleet spec (ports from the spec)")
+    p.add_argument("spec", help="fleet spec, JSON or YAML")
+    p.add_argument("--dry-run", action="store_true", help="plan only, write nothing")
+    p.add_argument("--report", default=None, help="JSON report file")
+    p.add_argument("-v", "--verbose", action="store_true")
+    p.set_defaults(func=cmd_provision)
+
+    p = subparsers.add_parser("plan", parents=[common], help="predict bus time and maximum control rate per strategy")
+    p.add_argument("--ids", type=parse_ids, default=parse_ids("1-6"), help="IDs on the bus (default: 1-6)")
+    p.add_argument("--rate", type=float, default=None, help="requested control rate [Hz]")
+    p.add_argument("--read", type=parse_span, nargs="*", default=[(STS_STATE_START, STS_STATE_LENGTH)],
+                   help="spans read per motor per cycle, address:length (default: state block)")
+    p.add_argument("--write", type=parse_span, nargs="*", default=[(STS_ACC, 7)],
+                   help="spans written per motor per cycle, address:length (default: goals)")
+    p.add_argument("--return-delay", type=float, default=0.0, help="servo return delay [us] (default: 0)")
+    p.add_argument("--calibrate", type=int, default=0, metavar="N",
+                   help="measure the host overhead with N reads on --port first")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    p.set_defaults(func=cmd_plan)
+
+    return parser
+
+#
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+
+# Description: fast discovery of the servos connected to a bus, across IDs and baudrates.
+#
+# For every baudrate, candidate IDs are probed in batches with one SYNC_READ of the
+# model number register: present servos answer back to back, missing ones cost no
+# more than the short timeout of their batch. IDs that did not answer the SYNC_READ
+# (e.g. firmwares without SYNC_READ support) are probed one by one with a single READ
+# of the model number, which doubles as a ping. All timeouts are short and calibrated
+# on the round trip time of the first servo that answers.
+#
+# usage:
+#   for servo in scan_bus(bus):
+#       print(servo.id, servo.model, servo.baudrate)
+
+from collections import namedtuple
+from .stservo_def import *
+from .group_sync_read import *
+
+# register holding the model number (2 bytes), common to STS/SMS/SCS servos
+MODEL_NUMBER_ADDRESS    = 3
+MODEL_NUMBER_LENGTH     = 2
+
+# baudrates probed by default, the most common first
+SCAN_BAUDRATES          = [1000000, 500000, 115200, 250000, 128000, 76800, 57600, 38400]
+
+# timeout slack [ms] while scanning: upper bound, and lower bound after calibration
+SCAN_LATENCY_MS         = 5.0
+SCAN_MIN_LATENCY_MS     = 1.0
+
+#
+DiscoveredServo = namedtuple("DiscoveredServo", ["id", "model", "baudrate"])
+
+#
+# ph:            protocol handler (e.g. feetechsts) whose port will be scanned
+# ids:           candidate IDs (default: all of them, 0..252)
+# baudrates:     baudrates to scan (default: SCAN_BAUDRATES)
+# batch_size:    number of IDs per SYNC_READ
+# latency_ms:    timeout slack [ms] used until a servo answers and the slack is calibrated
+# use_sync_read: probe the batches with SYNC_READ before falling back to single READs
+# probe_missing: probe with single READs the IDs that did not answer the SYNC_READ;
+#                None (default) does it only on baudrates where the SYNC_READ found servos,
+#                True on every baudrate (slower, finds servos without SYNC_READ support anywhere)
+# stop_at_first_baudrate: stop scanning as soon as one baudrate has servos on it
+#
+# returns a list of DiscoveredServo(id, model, baudrate); the port is left at its original
+# baudrate and latency timer. The models found are recorded in the handler (and its model
+# registry, if any), see setIdModel
+def scan_bus(ph, ids=None, baudrates=None, batch_size=32, latency_ms=SCAN_LATENCY_MS,
+             use_sync_read=True, probe_missing=None, stop_at_first_baudrate=False, verbose=False):
+    port = ph.portHandler
+    if ids is None:
+        ids = range(0, MAX_ID + 1)
+    if baudrates is None:
+        baudrates = SCAN_BAUDRATES
+    ids = [sts_id for sts_id in ids if 0 <= sts_id <= MAX_ID]
+
+    # retrying missing IDs would defeat the purpose of a short timeout
+    original_baudrate = port.getBaudRate()
+    original_latency = port.getLatencyTimer()
+    original_retry_policy = ph.retry_policy
+    ph.retry_policy = None
+
+    found = []
+    try:
+        for baudrate in baudrates:
+            if not port.setBaudRate(baudrate):
+                if verbose: print(f"[scan_bus] baudrate {baudrate} not supported by the port. Skipping")
+                continue
+            port.setLatencyTimer(latency_ms)
+
+            found_here = {}
+            if use_sync_read:
+                for start in range(0, len(ids), batch_size):
+                    batch = ids[start: start + batch_size]
+                    found_here.update(_sync_read_models(ph, batch))
+
+            # calibrate the timeout slack on a servo that already answered
+            if found_here:
+                _read_model(ph, min(found_here), latency_ms)
+
+            if probe_missing or (probe_missing is None and (found_here or not use_sync_read)):
+                for sts_id in ids:
+                    if sts_id in found_here:
+                        continue
+                    model = _read_model(ph, sts_id, latency_ms)
+                    if model is not None:
+                        found_here[sts_id] = model
+
+            for sts_id in sorted(found_here):
+                ph.setIdModel(sts_id, found_here[sts_id])
+                if verbose: print(f"[scan_bus] found ID: {sts_id}, model: {found_here[sts_id]}, baudrate: {baudrate}")
+                found.append(DiscoveredServo(sts_id, found_here[sts_id], baudrate))
+
+            if found_here and stop_at_first_baudrate:
+                break
+    finally:
+        ph.retry_policy = original_retry_policy
+        port.setLatencyTimer(original_latency)
+        if port.getBaudRate() != original_baudrate:
+            port.setBaudRate(original_baudrate)
+
+    return found
+
+#
+def _sync_read_models(ph, batch):
+    group = GroupSyncRead(ph, MODEL_NUMBER_ADDRESS, MODEL_NUMBER_LENGTH)
+    for sts_id in batch:
+        group.addParam(sts_id)
+
+    models = {}
+    if group.txRxPacket() == COMM_PORT_BUSY:
+        return models
+
+    for sts_id in batch:
+        available, _ = group.isAvailable(sts_id, MODEL_NUMBER_ADDRESS, MODEL_NUMBER_LENGTH)
+        if available:
+            ph.learnIdEnd(sts_id, group.data_dict[sts_id][1])
+            models[sts_id] = group.getData(sts_id, MODEL_NUMBER_ADDRESS, MODEL_NUMBER_LENGTH)
+
+    return models
+
+#
+def _read_model(ph, sts_id, latency_ms):
+    port = ph.portHandler
+
+    t_start = port.getCurrentTime()
+    data, result, _ = ph.readTxRx(sts_id, MODEL_NUMBER_ADDRESS, MODEL_NUMBER_LENGTH)
+    rtt = port.getCurrentTime() - t_start
+
+    if result != COMM_SUCCESS:
+        return None
+
+    # calibrate the timeout slack: twice the measured overhead on top of the wire time
+    wire_time = port.tx_time_per_byte * (8 + 6 + MODEL_NUMBER_LENGTH)
+    overhead = max(0.0, rtt - wire_time)
+    port.setLatencyTimer(min(latency_ms, max(SCAN_MIN_LATENCY_MS, 2.0 * overhead)))
+
+    return ph.sts_makeword(data[0], data[1], ph.learnIdEnd(sts_id, data[0]))
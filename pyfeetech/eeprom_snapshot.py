@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+# Description: snapshot of the EEPROM table of a servo, to back up, compare and clone settings.
+#
+# A snapshot holds the raw bytes of the EEPROM registers (model number to protective
+# torque, addresses 3 .. 34), read with a single READ by feetechsts.eeprom_snapshot().
+# It serializes to a small versioned dict / JSON file. feetechsts.eeprom_restore() diffs it
+# against the live table and writes only the changed spans, in one unlock/lock window.
+#
+# usage:
+#   snapshot = bus.eeprom_snapshot(1)
+#   snapshot.save("motor_1.json")
+#   bus.eeprom_restore(2, EepromSnapshot.load("motor_1.json"))     # clone 1 onto 2
+
+import json
+import time
+
+EEPROM_SNAPSHOT_VERSION = 1
+
+# EEPROM range of a snapshot: model number (3) .. protective torque (34)
+EEPROM_SNAPSHOT_START   = 3
+EEPROM_SNAPSHOT_LENGTH  = 32
+
+# registers never written back: model number (read-only), ID and baudrate (the servo would
+# stop answering at the current ID / baudrate)
+EEPROM_SNAPSHOT_PROTECTED = (3, 4, 5, 6)
+
+# gaps of up to this many unchanged bytes between two changed spans are written too (with
+# their live value): cheaper than the overhead of another WRITE and its status packet
+EEPROM_SNAPSHOT_MERGE_GAP = 8
+
+#
+class EepromSnapshot(object):
+    #
+    # data: EEPROM bytes from address start; end: byte order of the servo (STS/SMS=0, SCS=1)
+    def __init__(self, motor_id, model, data, start=EEPROM_SNAPSHOT_START, end=0, timestamp=None):
+        self.motor_id = motor_id
+        self.model = model
+        self.data = bytes(data)
+        self.start = start
+        self.end = end
+        self.timestamp = timestamp if timestamp is not None else time.time()
+
+    #
+    # raw value of the register at address (1 or 2 bytes), None if outside the snapshot
+    def get(self, address, length=1):
+        i = address - self.start
+        if i < 0 or i + length > len(self.data):
+            return None
+        if length == 1:
+            return self.data[i]
+        lo, hi = (self.data[i], self.data[i + 1]) if self.end == 0 else (self.data[i + 1], self.data[i])
+        return lo | (hi << 8)
+
+    #
+    # [(address, bytes)] to write on a servo whose table is live_data (from the same start) so
+    # that it matches this snapshot; addresses in protected are left untouched
+    def diff(self, live_data, protected=EEPROM_SNAPSHOT_PROTECTED, merge_gap=EEPROM_SNAPSHOT_MERGE_GAP):
+        live_data = bytes(live_data)
+        changed = [i for i in range(min(len(self.data), len(live_data)))
+                   if self.data[i] != live_data[i] and self.start + i not in protected]
+        changed_set = set(changed)
+
+        spans = []
+        for i in changed:
+            if spans and i - spans[-1][1] <= merge_gap:
+                spans[-1][1] = i + 1
+            else:
+                spans.append([i, i + 1])
+
+        # changed bytes from the snapshot, merged gaps from the live table
+        return [(self.start + first,
+                 bytes(self.data[i] if i in changed_set else live_data[i] for i in range(first, last)))
+                for first, last in spans]
+
+    # ----- serialization
+    #
+    def to_dict(self):
+        return {
+            "version":      EEPROM_SNAPSHOT_VERSION,
+            "motor_id":     self.motor_id,
+            "model":        self.model,
+            "end":          self.end,
+            "start":        self.start,
+            "data":         self.data.hex(),
+            "timestamp":    self.timestamp,
+        }
+
+    #
+    @classmethod
+    def from_dict(cls, content):
+        if content.get("version") != EEPROM_SNAPSHOT_VERSION:
+            raise ValueError(f"unsupported EEPROM snapshot version: {content.get('version')}")
+        return cls(content["motor_id"], content["model"], bytes.fromhex(content["data"]),
+                   content["start"], content["end"], content["timestamp"])
+
+    #
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    #
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    #
+    def __eq__(self, other):
+        return isinstance(other, EepromSnapshot) and (self.model, self.start, self.data) == (other.model, other.start, other.data)
+
+    #
+    def __repr__(self):
+        return f"EepromSnapshot(motor_id={self.motor_id}, model={self.model}, data={self.data.hex()})"
@@ -0,0 +1,170 @@
+#!/usr/bin/env python
+
+# Description: in-memory bus of emulated servos, usable in place of a PortHandler.
+#
+# Every EmulatedServo has a 256 byte memory table initialized like a factory STS3215
+# (or SCS servo with end=1) and answers PING, READ, WRITE, REG_WRITE, ACTION, SYNC_READ
+# and SYNC_WRITE like the real thing, including status return levels and baudrates.
+# Goal positions are reached instantly while torque is enabled. With realtime=True,
+# every transaction also takes its wire time, so latency and throughput figures are
+# those of a real bus at the same baudrate (minus the adapter latency).
+#
+# usage:
+#   portHandler = EmulatedPortHandler([EmulatedServo(1), EmulatedServo(2)])
+#   bus = feetechsts(portHandler)
+#   portHandler.openPort()
+
+import time
+from .stservo_def import *
+from .port_handler import *
+
+# baud rate codes of the baudrate register (address 6)
+EMULATED_BAUDRATES = [1000000, 500000, 250000, 128000, 115200, 76800, 57600, 38400]
+
+#
+class EmulatedServo(object):
+    #
+    def __init__(self, sts_id, model=777, end=0, baudrate=DEFAULT_BAUDRATE):
+        self.end = end
+        self.mem = bytearray(256)
+        self.mem[5] = sts_id
+        self.mem[6] = EMULATED_BAUDRATES.index(baudrate)
+        self.mem[8] = 1                             # status return level: answer everything
+        self.mem[55] = 1                            # EEPROM locked
+        self.mem[62] = 120                          # present voltage [0.1 V]
+        self.mem[63] = 30                           # present temperature [degC]
+        self.set_word(3, model)
+        self.set_word(11, 1023 if end else 4095)    # max angle
+        self.set_word(16, 1000)                     # max torque
+        self.set_word(56, 512 if end else 2048)     # present position
+        if not end:
+            self.set_word(48, 1000)                 # torque limit
+        self.staged = None
+        self.error = 0                              # servo error byte of the status packets
+
+    #
+    @property
+    def id(self):
+        return self.mem[5]
+
+    #
+    @property
+    def baudrate(self):
+        return EMULATED_BAUDRATES[self.mem[6]] if self.mem[6] < len(EMULATED_BAUDRATES) else None
+
+    #
+    def set_word(self, address, value):
+        lo, hi = value & 0xFF, (value >> 8) & 0xFF
+        self.mem[address: address + 2] = bytes([hi, lo] if self.end else [lo, hi])
+
+    #
+    def write(self, address, data):
+        torque_enable = self.mem[40]
+        self.mem[address: address + len(data)] = bytes(data)
+        if self.mem[40] == 128:
+            self.mem[40] = torque_enable            # calibration command: position becomes 2048
+            self.set_word(56, 2048)
+        if self.mem[40] and address <= 42 < address + len(data):
+            self.mem[56: 58] = self.mem[42: 44]     # goal reached instantly
+
+    #
+    def read(self, address, length):
+        return list(self.mem[address: address + length])
+
+#
+class EmulatedPortHandler(PortHandler):
+    #
+    def __init__(self, servos=(), port_name="emulated", realtime=False):
+        PortHandler.__init__(self, port_name)
+        self.servos = list(servos)
+        self.realtime = realtime
+        self.rx_buffer = bytearray()
+        self.packets_written = 0
+
+    #
+    def setupPort(self, cflag_baud):
+        self.is_open = True
+        self.rx_buffer = bytearray()
+        self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
+        return True
+
+    #
+    def closePort(self):
+        self.is_open = False
+
+    #
+    def clearPort(self):
+        pass
+
+    #
+    def getBytesAvailable(self):
+        return len(self.rx_buffer)
+
+    #
+    def readPort(self, length):
+        data = bytes(self.rx_buffer[:length])
+        del self.rx_buffer[:length]
+        return data
+
+    #
+    def writePort(self, packet):
+        packet = bytes(packet)
+        self.packets_written += 1
+        replied = len(self.rx_buffer)
+        self._handle(packet)
+
+        if self.realtime:
+            wire_bytes = len(packet) + len(self.rx_buffer) - replied
+            time.sleep(wire_bytes * self.tx_time_per_byte / 1000.0)
+        return len(packet)
+
+    # ----- protocol
+    #
+    def _listening(self, sts_id=None):
+        return [servo for servo in self.servos
+                if servo.baudrate == self.baudrate and (sts_id is None or servo.id == sts_id)]
+
+    #
+    def _reply(self, servo, params):
+        packet = [0xFF, 0xFF, servo.id, len(params) + 2, servo.error] + list(params)
+        packet.append(~sum(packet[2:]) & 0xFF)
+        self.rx_buffer.extend(packet)
+
+    #
+    def _handle(self, packet):
+        if len(packet) < 6 or packet[0] != 0xFF or packet[1] != 0xFF:
+            return
+        sts_id, length, instruction = packet[2], packet[3], packet[4]
+        params = list(packet[5: 3 + length])
+        if len(packet) < 4 + length or (~sum(packet[2: 3 + length]) & 0xFF) != packet[3 + length]:
+            return  # corrupt: real servos stay silent
+
+        if instruction == INST_SYNC_READ:
+            address, data_length = params[0], params[1]
+            for target_id in params[2:]:
+                for servo in self._listening(target_id):
+                    self._reply(servo, servo.read(address, data_length))
+        elif instruction == INST_SYNC_WRITE:
+            address, data_length = params[0], params[1]
+            for k in range(2, len(params), data_length + 1):
+                for servo in self._listening(params[k]):
+                    servo.write(address, params[k + 1: k + 1 + data_length])
+        elif instruction == INST_ACTION:
+            for servo in self._listening(None if sts_id == BROADCAST_ID else sts_id):
+                if servo.staged is not None:
+                    servo.write(*servo.staged)
+                    servo.staged = None
+        else:
+            for servo in self._listening(None if sts_id == BROADCAST_ID else sts_id):
+                if instruction == INST_PING:
+                    self._reply(servo, [])
+                elif instruction == INST_READ:
+                    self._reply(servo, servo.read(params[0], params[1]))
+                elif instruction == INST_WRITE:
+                    servo.write(params[0], params[1:])
+                    if servo.mem[8] and sts_id != BROADCAST_ID:
+                        self._reply(servo, [])
+                elif instruction == INST_REG_WRITE:
+                    servo.staged = (params[0], params[1:])
+                    if servo.mem[8] and sts_id != BROADCAST_ID:
+                        self._reply(servo, [])
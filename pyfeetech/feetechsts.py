@@ -13,6 +13,8 @@ from .stservo_def import *
 from .protocol_packet_handler import *
 from .group_sync_read import *
 from .group_sync_write import *
+from .discovery import *
+from .eeprom_snapshot import *
 
 # Baudrates
 STS_1M                  = 0
@@ -24,6 +26,10 @@ STS_76800               = 5
 STS_57600               = 6
 STS_38400               = 7
 
+# baudrate [bps] -> code written to STS_BAUD_RATE
+STS_BAUDRATE_CODES      = {1000000: STS_1M, 500000: STS_0_5M, 250000: STS_250K, 128000: STS_128K,
+                           115200: STS_115200, 76800: STS_76800, 57600: STS_57600, 38400: STS_38400}
+
 # Modes
 STS_MODE_POSITION       = 0
 STS_MODE_SPEED          = 1
@@ -36,6 +42,8 @@ STS_MODEL_L             = 3
 STS_MODEL_H             = 4
 STS_ID                  = 5
 STS_BAUD_RATE           = 6
+STS_RETURN_DELAY        = 7
+STS_RESPONSE_LEVEL      = 8
 STS_MIN_ANGLE_LIMIT_L   = 9
 STS_MAX_ANGLE_LIMIT_L   = 11
 STS_MAX_TORQUE_LIMIT_L  = 16
@@ -65,18 +73,34 @@ STS_STATUS              = 65
 STS_MOVING              = 66
 STS_PRESENT_CURRENT_L   = 69
 
+# - state block: present position ... present current, read in one go by sync_read_state
+STS_STATE_START         = STS_PRESENT_POSITION_L
+STS_STATE_LENGTH        = STS_PRESENT_CURRENT_L + 2 - STS_PRESENT_POSITION_L
+STS_STATE_FIELDS        = (("position", STS_PRESENT_POSITION_L), ("speed", STS_PRESENT_SPEED_L), ("load", STS_PRESENT_LOAD_L),
+                           ("voltage", STS_PRESENT_VOLTAGE), ("temperature", STS_PRESENT_TEMPERATURE), ("status", STS_STATUS),
+                           ("moving", STS_MOVING), ("current", STS_PRESENT_CURRENT_L))
+
 #
 class feetechsts(protocol_packet_handler):
     #
     def __init__(self, portHandler):
         self.verbose = False
+        self.quarantine = None
         protocol_packet_handler.__init__(self, portHandler, 0)
         self.groupSyncWrite = GroupSyncWrite(self, STS_ACC, 7)   
+        self.groupSyncWriteGoals = {STS_ACC: self.groupSyncWrite}     # {start address: GroupSyncWrite}
+        self.groupSyncReadState = GroupSyncRead(self, STS_STATE_START, STS_STATE_LENGTH)
+        self.staged_goals = {}          # {motor_id: (address, data)} staged, not fired yet
 
     #
     def set_verbose(self, verbosity):
         self.verbose = verbosity
 
+    #
+    # quarantine of the motors that stop answering sync_read_state (see quarantine.py), None to disable
+    def set_quarantine(self, quarantine):
+        self.quarantine = quarantine
+
     #
     def print_status(self, status):
         if status == 0:      print(f"[print_status]: No error")
@@ -87,6 +111,46 @@ class feetechsts(protocol_packet_handler):
         if status & 0b10000: print(f"[print_status]: ERROR: Voltage")
 
 
+    # ----- models
+    # the accessors below are written against the STS3215 memory table; the register map of
+    # each motor's model (see model_registry) relocates the registers, gives the sign bit of
+    # signed values and the range of the settings. Models are learned by ping() / scan_bus(),
+    # or come from the model registry, motors of unknown model use the map of their byte order
+    #
+    # address of the STS3215 register on the model of motor_id
+    def register(self, motor_id, address):
+        register_map = self.getIdRegisterMap(motor_id)
+        model_address = register_map.address(address)
+        if model_address is None:
+            raise ValueError(f"[feetechsts::register] register {address} does not exist on {register_map.name} (ID: {motor_id})")
+        return model_address
+
+    #
+    # value clamped to the range of a setting on the model of motor_id
+    def limit(self, motor_id, setting, value):
+        limited = self.getIdRegisterMap(motor_id).clamp(setting, value)
+        if limited != value and self.verbose:
+            print(f"[feetechsts::limit] {setting} {value} out of range for ID: {motor_id}, clamped to: {limited}")
+        return limited
+
+    #
+    # learns the model of every motor: from the model registry when cached, with a ping
+    # otherwise, then saves the registry. Returns {motor_id: model}, None if not answering
+    def identify_models(self, motor_ids):
+        models = {}
+        for motor_id in motor_ids:
+            if self.getIdModel(motor_id) is None:
+                _, sts_comm_result, _ = self.ping(motor_id)
+                if sts_comm_result != COMM_SUCCESS:
+                    if self.verbose: print(f"[feetechsts::identify_models] ID: {motor_id} not answering")
+            models[motor_id] = self.getIdModel(motor_id)
+            if self.verbose: print(f"[feetechsts::identify_models] ID: {motor_id}, model: {models[motor_id]}, map: {self.getIdRegisterMap(motor_id).name}")
+
+        if self.model_registry is not None:
+            self.model_registry.save()
+        return models
+
+
     # ----- setters, EEPROM
     # for all eeprom calls, if you want changes to be stored on the motor also after power-cycling
     # you have to: set lock to 0, then write on the register, and then set lock to 1
@@ -101,7 +165,7 @@ class feetechsts(protocol_packet_handler):
             if self.verbose: print(f"[feetechsts::eeprom_set_id] (EEPROM) Setting ID to: {new_id}...")
 
             # write
-            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, STS_ID, new_id)
+            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, self.register(motor_id, STS_ID), new_id)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -129,7 +193,7 @@ class feetechsts(protocol_packet_handler):
             if self.verbose: print(f"[feetechsts::eeprom_set_mode] (EEPROM) Setting mode to: {mode}...")
 
             # write
-            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, STS_MODE, mode)
+            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, self.register(motor_id, STS_MODE), mode)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -155,7 +219,7 @@ class feetechsts(protocol_packet_handler):
             if self.verbose: print(f"[feetechsts::eeprom_set_lock] (EEPROM) Setting lock status to: {lock_status}...")
 
             # write
-            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, STS_LOCK, lock_status)
+            sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), lock_status)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -172,6 +236,7 @@ class feetechsts(protocol_packet_handler):
     #
     # [0, 4094]
     def eeprom_set_angle_min(self, motor_id, angle):
+        angle = self.limit(motor_id, "angle", angle)
         min_angle = self.get_angle_min(motor_id)
         
         # write on EEPROM only if needed
@@ -181,8 +246,9 @@ class feetechsts(protocol_packet_handler):
             # write
             temp_angle = self.sts_toscs(angle, 15)
             #sts_comm_result, sts_error = self.write2ByteTxRx(motor_id, STS_MIN_ANGLE_LIMIT_L, temp_angle)
-            txpacket = [self.sts_lobyte(temp_angle), self.sts_hibyte(temp_angle)]
-            sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_MIN_ANGLE_LIMIT_L, len(txpacket), txpacket)
+            end = self.getIdEnd(motor_id)
+            txpacket = [self.sts_lobyte(temp_angle, end), self.sts_hibyte(temp_angle, end)]
+            sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_MIN_ANGLE_LIMIT_L), len(txpacket), txpacket)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -199,6 +265,7 @@ class feetechsts(protocol_packet_handler):
     #
     # [0, 4095]
     def eeprom_set_angle_max(self, motor_id, angle):
+        angle = self.limit(motor_id, "angle", angle)
         max_angle = self.get_angle_max(motor_id)
         
         # write on EEPROM only if needed
@@ -208,8 +275,9 @@ class feetechsts(protocol_packet_handler):
             # write
             temp_angle = self.sts_toscs(angle, 15)
             #sts_comm_result, sts_error = self.write2ByteTxRx(motor_id, STS_MAX_ANGLE_LIMIT_L, temp_angle)
-            txpacket = [self.sts_lobyte(temp_angle), self.sts_hibyte(temp_angle)]
-            sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_MAX_ANGLE_LIMIT_L, len(txpacket), txpacket)
+            end = self.getIdEnd(motor_id)
+            txpacket = [self.sts_lobyte(temp_angle, end), self.sts_hibyte(temp_angle, end)]
+            sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_MAX_ANGLE_LIMIT_L), len(txpacket), txpacket)
 
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -226,6 +294,7 @@ class feetechsts(protocol_packet_handler):
     #
     # [0, 1000]
     def eeprom_set_torque_max(self, motor_id, torque):
+        torque = self.limit(motor_id, "torque", torque)
         max_torque = self.get_torque_max(motor_id)
         
         # write on EEPROM only if needed
@@ -235,8 +304,9 @@ class feetechsts(protocol_packet_handler):
             # write
             temp_torque = self.sts_toscs(torque, 15)
             #sts_comm_result, sts_error = self.write2ByteTxRx(motor_id, STS_MAX_TORQUE_LIMIT_L, temp_torque)
-            txpacket = [self.sts_lobyte(temp_torque), self.sts_hibyte(temp_torque)]
-            sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_MAX_TORQUE_LIMIT_L, len(txpacket), txpacket)
+            end = self.getIdEnd(motor_id)
+            txpacket = [self.sts_lobyte(temp_torque, end), self.sts_hibyte(temp_torque, end)]
+            sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_MAX_TORQUE_LIMIT_L), len(txpacket), txpacket)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -262,8 +332,9 @@ class feetechsts(protocol_packet_handler):
             # write
             temp_force = self.sts_toscs(force, 15)
             #sts_comm_result, sts_error = self.write2ByteTxRx(motor_id, STS_MIN_STARTUP_FORCE_L, temp_force)
-            txpacket = [self.sts_lobyte(temp_force), self.sts_hibyte(temp_force)]
-            sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_MIN_STARTUP_FORCE_L, len(txpacket), txpacket)
+            end = self.getIdEnd(motor_id)
+            txpacket = [self.sts_lobyte(temp_force, end), self.sts_hibyte(temp_force, end)]
+            sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_MIN_STARTUP_FORCE_L), len(txpacket), txpacket)
             
             # process errors
             if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -278,6 +349,193 @@ class feetechsts(protocol_packet_handler):
             return present_force
 
 
+    # ----- status return level
+    #
+    # {0, 1}
+    # 0: the motor only answers PING and READ; writes to it are sent tx-only (no wait for a
+    #    status packet), and verifyUnackedWrites() reads them back to catch lost commands
+    # 1: the motor answers every instruction
+    # returns the list of motor IDs whose level could not be set
+    def set_response_level(self, motor_ids, level, persistent=False):
+        failed = []
+        for motor_id in motor_ids:
+            if persistent: self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), 0)
+
+            # the status packet of this write (if any) follows the old level: let it go by
+            self.write1ByteTxOnly(motor_id, self.register(motor_id, STS_RESPONSE_LEVEL), level)
+            self.waitStatusPacketSlot(motor_id)
+            self.discardRxPacket()
+
+            # READ is answered at every level
+            sts_level, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_RESPONSE_LEVEL))
+            if sts_comm_result == COMM_SUCCESS and sts_level == level:
+                self.setResponseLevel(motor_id, level)
+                if self.verbose: print(f"[feetechsts::set_response_level] ID {motor_id}: response level set to: {level}")
+            else:
+                if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
+                failed.append(motor_id)
+
+            if persistent: self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), 1)
+
+        return failed
+
+    #
+    # reads the response level of the motors, so that writes pick the right path
+    def learn_response_levels(self, motor_ids):
+        for motor_id in motor_ids:
+            sts_level, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_RESPONSE_LEVEL))
+            if sts_comm_result == COMM_SUCCESS:
+                self.setResponseLevel(motor_id, sts_level)
+            else:
+                print("%s" % self.getTxRxResult(sts_comm_result))
+
+        return {motor_id: self.getResponseLevel(motor_id) for motor_id in motor_ids}
+
+
+    # ----- bus-wide procedures
+    #
+    # moves every motor of the bus to a new baudrate, persistently:
+    # - find the motors at their current baudrate (all STS baudrates are scanned, unless given)
+    # - per motor: unlock EEPROM and write the new baudrate code, at the old baudrate
+    # - switch the host port to the new baudrate and verify every motor there
+    # - relock EEPROM
+    # if a motor cannot be verified at the new baudrate, all motors are rolled back to their
+    # original baudrate and the host port too
+    #
+    # returns (success, {motor_id: state}), state in {"unchanged", "migrated", "rolled_back", "failed", "missing"}
+    def migrate_baudrate(self, baudrate=1000000, motor_ids=None, current_baudrates=None):
+        port = self.portHandler
+        if baudrate not in STS_BAUDRATE_CODES:
+            print(f"[feetechsts::migrate_baudrate] baudrate {baudrate} not supported by STS motors")
+            return False, {}
+
+        if current_baudrates is None:
+            current_baudrates = list(STS_BAUDRATE_CODES.keys())
+        original_baudrate = port.getBaudRate()
+
+        # - find every motor at its current baudrate
+        found = scan_bus(self, ids=motor_ids, baudrates=current_baudrates)
+        origin = {servo.id: servo.baudrate for servo in found}
+        states = {motor_id: "missing" for motor_id in (motor_ids or [])}
+        if motor_ids is not None and any(motor_id not in origin for motor_id in motor_ids):
+            print(f"[feetechsts::migrate_baudrate] motors not found: {[m for m in motor_ids if m not in origin]}. Not migrating")
+            return False, states
+        if not origin:
+            print("[feetechsts::migrate_baudrate] no motors found. Not migrating")
+            return False, states
+
+        for motor_id, motor_baudrate in origin.items():
+            states[motor_id] = "unchanged" if motor_baudrate == baudrate else "failed"
+
+        # - unlock and write the new baudrate code, grouped by current baudrate
+        to_migrate = [motor_id for motor_id in origin if origin[motor_id] != baudrate]
+        for motor_baudrate in sorted(set(origin[motor_id] for motor_id in to_migrate)):
+            port.setBaudRate(motor_baudrate)
+            for motor_id in to_migrate:
+                if origin[motor_id] != motor_baudrate:
+                    continue
+                if self.verbose: print(f"[feetechsts::migrate_baudrate] ID {motor_id}: {motor_baudrate} -> {baudrate}")
+                self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), 0)
+                # the status packet may get lost while the motor switches baudrate: verified below
+                self.write1ByteTxRx(motor_id, self.register(motor_id, STS_BAUD_RATE), STS_BAUDRATE_CODES[baudrate])
+
+        # - verify every motor at the new baudrate
+        port.setBaudRate(baudrate)
+        verified = [motor_id for motor_id in origin if self._answers(motor_id)]
+        success = len(verified) == len(origin)
+
+        if success:
+            for motor_id in to_migrate:
+                self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), 1)
+                states[motor_id] = "migrated"
+            if self.verbose: print(f"[feetechsts::migrate_baudrate] {len(origin)} motors at {baudrate}")
+            return True, states
+
+        # - roll back: the motors that moved go back to their original baudrate
+        print(f"[feetechsts::migrate_baudrate] motors not answering at {baudrate}: "
+              f"{[m for m in origin if m not in verified]}. Rolling back")
+        for motor_id in to_migrate:
+            if motor_id in verified:
+                self.write1ByteTxRx(motor_id, self.register(motor_id, STS_BAUD_RATE), STS_BAUDRATE_CODES[origin[motor_id]])
+
+        for motor_baudrate in sorted(set(origin.values())):
+            port.setBaudRate(motor_baudrate)
+            for motor_id in to_migrate:
+                if origin[motor_id] == motor_baudrate and self._answers(motor_id):
+                    self.write1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK), 1)
+                    states[motor_id] = "rolled_back"
+
+        port.setBaudRate(original_baudrate)
+        return False, states
+
+    #
+    def _answers(self, motor_id):
+        _, sts_comm_result, _ = self.readTxRx(motor_id, STS_MODEL_L, 2)
+        return sts_comm_result == COMM_SUCCESS
+
+
+    # ----- EEPROM snapshots
+    #
+    # reads the EEPROM table of a motor (EEPROM_SNAPSHOT_START .. +EEPROM_SNAPSHOT_LENGTH) with one READ
+    # returns an EepromSnapshot, None if the motor did not answer (not printed with quiet, for
+    # motors that may be absent)
+    def eeprom_snapshot(self, motor_id, quiet=False):
+        data, sts_comm_result, sts_error = self.readTxRx(motor_id, EEPROM_SNAPSHOT_START, EEPROM_SNAPSHOT_LENGTH)
+
+        # process errors
+        if sts_comm_result != COMM_SUCCESS:
+            if not quiet: print("%s" % self.getTxRxResult(sts_comm_result))
+            return None
+        if sts_error != 0: print("%s" % self.getRxPacketError(sts_error))
+
+        end = self.learnIdEnd(motor_id, data[0])
+        model = self.sts_makeword(data[0], data[1], end)
+        self.setIdModel(motor_id, model, end)
+        return EepromSnapshot(motor_id, model, data, EEPROM_SNAPSHOT_START, end)
+
+    #
+    # writes the registers of a snapshot that differ from the live table of motor_id: one READ,
+    # then one WRITE per changed span, all inside a single unlock/lock window. ID and baudrate
+    # are never written (see eeprom_set_id and migrate_baudrate), so a snapshot can be cloned
+    # onto other motors.
+    # returns the [(address, bytes)] written (or to write, with dry_run), None on failure
+    def eeprom_restore(self, motor_id, snapshot, dry_run=False):
+        live = self.eeprom_snapshot(motor_id)
+        if live is None:
+            return None
+        if live.model != snapshot.model:
+            print(f"[feetechsts::eeprom_restore] ID: {motor_id} is a model {live.model}, the snapshot is of a model {snapshot.model}. Not restoring")
+            return None
+        if live.start != snapshot.start:
+            print(f"[feetechsts::eeprom_restore] snapshot range does not start at {live.start}. Not restoring")
+            return None
+
+        spans = snapshot.diff(live.data)
+        if not spans:
+            if self.verbose: print(f"[feetechsts::eeprom_restore] ID: {motor_id} already matches the snapshot. Not writing")
+            return spans
+        if dry_run:
+            return spans
+
+        if self.verbose: print(f"[feetechsts::eeprom_restore] (EEPROM) ID: {motor_id}, writing spans: {[(address, len(data)) for address, data in spans]}")
+
+        lock = self.register(motor_id, STS_LOCK)
+        success = True
+        self.write1ByteTxRx(motor_id, lock, 0)
+        for address, data in spans:
+            sts_comm_result, sts_error = self.writeTxRx(motor_id, address, len(data), list(data))
+            if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
+            if sts_error != 0:                  print("%s" % self.getRxPacketError(sts_error))
+            if sts_comm_result != COMM_SUCCESS or sts_error != 0:
+                success = False
+                break
+        sts_comm_result, _ = self.write1ByteTxRx(motor_id, lock, 1)
+        if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
+
+        if success and self.verbose: print(f"[feetechsts::eeprom_restore] (EEPROM) ID: {motor_id} correctly restored")
+        return spans if success else None
+
+
     # ----- setters, RAM
     #
     # {0, 1, 128}
@@ -288,7 +546,7 @@ class feetechsts(protocol_packet_handler):
         if self.verbose: print(f"[feetechsts::sram_set_torque_enable] Setting torque to: {torque_status}...")
 
         # write
-        sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, STS_TORQUE_ENABLE, torque_status)
+        sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, self.register(motor_id, STS_TORQUE_ENABLE), torque_status)
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -301,10 +559,11 @@ class feetechsts(protocol_packet_handler):
     #
     # [0, 254]
     def sram_set_acceleration(self, motor_id, acceleration):
+        acceleration = self.limit(motor_id, "acceleration", acceleration)
         if self.verbose: print(f"[feetechsts::sram_set_acceleration] Setting acceleration to: {acceleration}...")
 
         # write
-        sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, STS_ACC, acceleration)
+        sts_comm_result, sts_error = self.write1ByteTxRx(motor_id, self.register(motor_id, STS_ACC), acceleration)
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -321,8 +580,9 @@ class feetechsts(protocol_packet_handler):
 
         # write
         temp_position = self.sts_toscs(position, 15)
-        txpacket = [self.sts_lobyte(temp_position), self.sts_hibyte(temp_position)]
-        sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_GOAL_POSITION_L, len(txpacket), txpacket)
+        end = self.getIdEnd(motor_id)
+        txpacket = [self.sts_lobyte(temp_position, end), self.sts_hibyte(temp_position, end)]
+        sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_GOAL_POSITION_L), len(txpacket), txpacket)
 
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -339,8 +599,9 @@ class feetechsts(protocol_packet_handler):
 
         # write
         temp_speed = self.sts_toscs(speed, 15)
-        txpacket = [self.sts_lobyte(temp_speed), self.sts_hibyte(temp_speed)]
-        sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_GOAL_SPEED_L, len(txpacket), txpacket)
+        end = self.getIdEnd(motor_id)
+        txpacket = [self.sts_lobyte(temp_speed, end), self.sts_hibyte(temp_speed, end)]
+        sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_GOAL_SPEED_L), len(txpacket), txpacket)
 
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -353,12 +614,14 @@ class feetechsts(protocol_packet_handler):
     #
     # [0, 1000]    
     def sram_set_torque_limit(self, motor_id, torque):
+        torque = self.limit(motor_id, "torque", torque)
         if self.verbose: print(f"[feetechsts::sram_set_torque_limit] Setting torque limit to: {torque}...")
 
         # write
         temp_torque = self.sts_toscs(torque, 15)
-        txpacket = [self.sts_lobyte(temp_torque), self.sts_hibyte(temp_torque)]
-        sts_comm_result, sts_error = self.writeTxRx(motor_id, STS_TORQUE_LIMIT_L, len(txpacket), txpacket)
+        end = self.getIdEnd(motor_id)
+        txpacket = [self.sts_lobyte(temp_torque, end), self.sts_hibyte(temp_torque, end)]
+        sts_comm_result, sts_error = self.writeTxRx(motor_id, self.register(motor_id, STS_TORQUE_LIMIT_L), len(txpacket), txpacket)
 
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -372,7 +635,7 @@ class feetechsts(protocol_packet_handler):
     # ----- getters
     #
     def get_id(self, motor_id):
-        sts_id, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_ID)
+        sts_id, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_ID))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -383,7 +646,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_angle_min(self, motor_id):
-        sts_angle_min, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_MIN_ANGLE_LIMIT_L)
+        sts_angle_min, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_MIN_ANGLE_LIMIT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -394,7 +657,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_angle_max(self, motor_id):
-        sts_angle_max, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_MAX_ANGLE_LIMIT_L)
+        sts_angle_max, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_MAX_ANGLE_LIMIT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -405,7 +668,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_torque_max(self, motor_id):
-        sts_torque_max, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_MAX_TORQUE_LIMIT_L)
+        sts_torque_max, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_MAX_TORQUE_LIMIT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -416,7 +679,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_force_startup_min(self, motor_id):
-        sts_force_startup_min, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_MIN_STARTUP_FORCE_L)
+        sts_force_startup_min, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_MIN_STARTUP_FORCE_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -427,7 +690,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_protection_current(self, motor_id):
-        sts_protection_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_PROTECTION_CURRENT_L)
+        sts_protection_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_PROTECTION_CURRENT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -438,7 +701,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_mode(self, motor_id):
-        sts_mode, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_MODE)
+        sts_mode, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_MODE))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -449,7 +712,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_torque_enable(self, motor_id):
-        sts_torque_enable, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_TORQUE_ENABLE)
+        sts_torque_enable, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_TORQUE_ENABLE))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -460,7 +723,7 @@ class feetechsts(protocol_packet_handler):
     
     #
     def get_protective_torque(self, motor_id):
-        sts_protective_torque, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_PROTECTIVE_TORQUE)
+        sts_protective_torque, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_PROTECTIVE_TORQUE))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -471,40 +734,40 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_position(self, motor_id):
-        sts_position, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_PRESENT_POSITION_L)
+        sts_position, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_POSITION_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
         if sts_error != 0:                  print("%s" % self.getRxPacketError(sts_error))
 
         # convert to signed and return
-        return self.sts_tohost(sts_position, 15)
+        return self.sts_tohost(sts_position, self.getIdRegisterMap(motor_id).sign_bit(STS_PRESENT_POSITION_L))
 
     #
     def get_speed(self, motor_id):
-        sts_speed, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_PRESENT_SPEED_L)
+        sts_speed, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_SPEED_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
         if sts_error != 0:                  print("%s" % self.getRxPacketError(sts_error))
 
         # convert to signed and return
-        return self.sts_tohost(sts_speed, 15)
+        return self.sts_tohost(sts_speed, self.getIdRegisterMap(motor_id).sign_bit(STS_PRESENT_SPEED_L))
 
     #
     def get_load(self, motor_id):
-        sts_load, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_PRESENT_LOAD_L)
+        sts_load, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_LOAD_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
         if sts_error != 0:                  print("%s" % self.getRxPacketError(sts_error))
 
         # convert to signed and return
-        return self.sts_tohost(sts_load, 15)
+        return self.sts_tohost(sts_load, self.getIdRegisterMap(motor_id).sign_bit(STS_PRESENT_LOAD_L))
 
     #
     def get_voltage(self, motor_id):
-        sts_voltage, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_PRESENT_VOLTAGE)
+        sts_voltage, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_VOLTAGE))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -515,7 +778,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_status(self, motor_id):
-        sts_status, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_STATUS)
+        sts_status, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_STATUS))
         
         # print status if there is an error
         if (sts_status!=0): self.print_status(sts_status)
@@ -529,7 +792,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_temperature(self, motor_id):
-        sts_temperature, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_PRESENT_TEMPERATURE)
+        sts_temperature, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_TEMPERATURE))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -540,18 +803,18 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_current(self, motor_id):
-        sts_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_PRESENT_CURRENT_L)
+        sts_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_PRESENT_CURRENT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
         if sts_error != 0:                  print("%s" % self.getRxPacketError(sts_error))
 
         # convert to signed and return
-        return self.sts_tohost(sts_current, 15)
+        return self.sts_tohost(sts_current, self.getIdRegisterMap(motor_id).sign_bit(STS_PRESENT_CURRENT_L))
 
     #
     def get_torque_limit(self, motor_id):
-        sts_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, STS_TORQUE_LIMIT_L)
+        sts_current, sts_comm_result, sts_error = self.read2ByteTxRx(motor_id, self.register(motor_id, STS_TORQUE_LIMIT_L))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -562,7 +825,7 @@ class feetechsts(protocol_packet_handler):
 
     #
     def get_lock(self, motor_id):
-        sts_lock_status, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, STS_LOCK)
+        sts_lock_status, sts_comm_result, sts_error = self.read1ByteTxRx(motor_id, self.register(motor_id, STS_LOCK))
         
         # process errors
         if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
@@ -570,4 +833,181 @@ class feetechsts(protocol_packet_handler):
 
         # convert to signed and return
         return self.sts_tohost(sts_lock_status, 15)    
+
+
+    # ----- sync read/write (many motors, one packet)
+    #
+    # reads the state block of all motor_ids with one SYNC_READ
+    # returns {motor_id: state}, state is None if the motor did not answer; with a quarantine,
+    # quarantined motors are not read and their state is the last one read, with "stale": True
+    def sync_read_state(self, motor_ids):
+        quarantine = self.quarantine
+        active = quarantine.active(motor_ids) if quarantine is not None else motor_ids
+
+        group = self.groupSyncReadState
+        for motor_id in [m for m in group.data_dict if m not in active]:
+            group.removeParam(motor_id)
+        for motor_id in active:
+            group.addParam(motor_id)
+
+        if active:
+            sts_comm_result = group.txRxPacket()
+            if sts_comm_result not in (COMM_SUCCESS, COMM_RX_CORRUPT, COMM_RX_TIMEOUT):
+                print("%s" % self.getTxRxResult(sts_comm_result))
+
+        states = {}
+        for motor_id in motor_ids:
+            if quarantine is not None and quarantine.is_quarantined(motor_id):
+                states[motor_id] = quarantine.stale_state(motor_id)
+                continue
+            available, sts_error = group.isAvailable(motor_id, STS_STATE_START, STS_STATE_LENGTH)
+            states[motor_id] = self.decode_state(group.data_dict[motor_id], 1, sts_error,
+                                                 self.getIdEnd(motor_id), self.getIdRegisterMap(motor_id)) if available else None
+            if quarantine is not None:
+                quarantine.record(motor_id, states[motor_id])
+
+        if quarantine is not None:
+            quarantine.probe(self)
+        return states
+
+    #
+    # decodes a state block (STS_STATE_LENGTH bytes from STS_STATE_START) starting at data[offset]
+    # end: byte order of the motor (default: the bus one); register_map: of the motor's model,
+    # for the sign bit of the load; fields the model does not have (e.g. status on SCS) are left out
+    def decode_state(self, data, offset=0, error=0, end=None, register_map=None):
+        d = data
+        o = offset - STS_STATE_START
+        load_bit = register_map.sign_bit(STS_PRESENT_LOAD_L) if register_map is not None else 15
+        state = {
+            "position":     self.sts_tohost(self.sts_makeword(d[o + STS_PRESENT_POSITION_L], d[o + STS_PRESENT_POSITION_L + 1], end), 15),
+            "speed":        self.sts_tohost(self.sts_makeword(d[o + STS_PRESENT_SPEED_L], d[o + STS_PRESENT_SPEED_L + 1], end), 15),
+            "load":         self.sts_tohost(self.sts_makeword(d[o + STS_PRESENT_LOAD_L], d[o + STS_PRESENT_LOAD_L + 1], end), load_bit),
+            "voltage":      d[o + STS_PRESENT_VOLTAGE],
+            "temperature":  d[o + STS_PRESENT_TEMPERATURE],
+            "status":       d[o + STS_STATUS],
+            "moving":       d[o + STS_MOVING],
+            "current":      self.sts_tohost(self.sts_makeword(d[o + STS_PRESENT_CURRENT_L], d[o + STS_PRESENT_CURRENT_L + 1], end), 15),
+            "error":        error,
+        }
+        if register_map is not None and register_map.missing:
+            for name, address in STS_STATE_FIELDS:
+                if address in register_map.missing:
+                    del state[name]
+        return state
+
+    #
+    # writes acceleration, goal position and goal speed of many motors with one SYNC_WRITE
+    # goals: {motor_id: (position, speed, acceleration)}
+    def sync_write_goals(self, goals):
+        if not goals:
+            return COMM_NOT_AVAILABLE
+
+        # one SYNC_WRITE per goal block layout (models with and without acceleration)
+        groups = {}
+        for motor_id, (position, speed, acceleration) in goals.items():
+            address, txpacket = self.goal_block(motor_id, position, speed, acceleration)
+            group = groups.get(address)
+            if group is None:
+                group = self.groupSyncWriteGoals.get(address)
+                if group is None:
+                    group = self.groupSyncWriteGoals[address] = GroupSyncWrite(self, address, len(txpacket))
+                group.clearParam()
+                groups[address] = group
+            group.addParam(motor_id, txpacket)
+
+        sts_comm_result = COMM_SUCCESS
+        for group in groups.values():
+            result = group.txPacket()
+            if result != COMM_SUCCESS:
+                print("%s" % self.getTxRxResult(result))
+                sts_comm_result = result
+
+        return sts_comm_result
+
+    #
+    # (start address, bytes) of the goal block of motor_id, as encode_goal; on models without
+    # acceleration (SCS) the block starts at the goal position and the acceleration is ignored
+    def goal_block(self, motor_id, position, speed, acceleration):
+        register_map = self.getIdRegisterMap(motor_id)
+        txpacket = self.encode_goal(position, speed, acceleration, self.getIdEnd(motor_id))
+        if register_map.address(STS_ACC) is not None:
+            return STS_ACC, txpacket
+
+        if acceleration and self.verbose: print(f"[feetechsts::goal_block] no acceleration on {register_map.name} (ID: {motor_id}), ignored")
+        return self.register(motor_id, STS_GOAL_POSITION_L), txpacket[1:]
+
+    #
+    # acceleration, goal position, goal time (unused), goal speed: 7 bytes from STS_ACC
+    def encode_goal(self, position, speed, acceleration, end=None):
+        temp_position = self.sts_toscs(position, 15)
+        temp_speed = self.sts_toscs(speed, 15)
+        return [acceleration,
+                self.sts_lobyte(temp_position, end), self.sts_hibyte(temp_position, end),
+                0, 0,
+                self.sts_lobyte(temp_speed, end), self.sts_hibyte(temp_speed, end)]
+
+
+    # ----- staged motion (REG_WRITE + broadcast ACTION)
+    # goals are staged on every motor first, then all motors start together on one ACTION
+    #
+    # stages goals = {motor_id: (position, speed, acceleration)} with REG_WRITEs
+    # acknowledge=False: REG_WRITEs are not acknowledged, only transmit failures are detected;
+    #                    the goals are checked after the ACTION (see fire_staged_goals)
+    # acknowledge=True:  every REG_WRITE waits for its status packet
+    # returns {motor_id: sts_comm_result} of the motors that could not be staged
+    def stage_goals(self, goals, acknowledge=False):
+        failed = {}
+        for motor_id, (position, speed, acceleration) in goals.items():
+            address, txpacket = self.goal_block(motor_id, position, speed, acceleration)
+            if acknowledge:
+                sts_comm_result, sts_error = self.regWriteTxRx(motor_id, address, len(txpacket), txpacket)
+                if sts_error != 0: print("%s" % self.getRxPacketError(sts_error))
+            else:
+                sts_comm_result = self.regWriteTxOnly(motor_id, address, len(txpacket), txpacket)
+                # servos at level 0 send no status packet: the next REG_WRITE can follow at once
+                if self.getResponseLevel(motor_id) != RESPONSE_LEVEL_READ_ONLY:
+                    self.waitStatusPacketSlot(motor_id)
+
+            if sts_comm_result != COMM_SUCCESS:
+                failed[motor_id] = sts_comm_result
+                if self.verbose: print(f"[feetechsts::stage_goals] ID {motor_id}: {self.getTxRxResult(sts_comm_result)}")
+            elif not acknowledge:
+                self.staged_goals[motor_id] = (address, txpacket)
+
+        if not acknowledge:
+            self.discardRxPacket()
+
+        return failed
+
+    #
+    # starts the staged goals of all motors at once. Goals staged without acknowledge are
+    # then in the goal registers: they are left to verifyUnackedWrites (one SYNC_READ),
+    # which resends the ones that were lost
+    def fire_staged_goals(self):
+        sts_comm_result = self.action(BROADCAST_ID)
+        if sts_comm_result != COMM_SUCCESS: print("%s" % self.getTxRxResult(sts_comm_result))
+
+        for motor_id, (address, data) in self.staged_goals.items():
+            self.trackUnackedWrite(motor_id, address, data)
+        self.staged_goals = {}
+
+        return sts_comm_result
+
+    #
+    # stages the goals and fires them only if every motor was staged
+    # returns {motor_id: sts_comm_result} of the motors that could not be staged (empty: fired);
+    # when not fired, the goals staged so far stay on the motors until the next ACTION.
+    # Without acknowledge, the goals are read back with one SYNC_READ once fired, and the
+    # lost ones written again
+    def staged_move(self, goals, acknowledge=False):
+        failed = self.stage_goals(goals, acknowledge)
+        if failed:
+            print(f"[feetechsts::staged_move] staging failed on IDs: {sorted(failed)}. Not firing")
+            return failed
+
+        self.fire_staged_goals()
+        if not acknowledge:
+            lost = self.verifyUnackedWrites()
+            if lost and self.verbose: print(f"[feetechsts::staged_move] goals lost on IDs: {sorted(lost)}, written again")
+        return failed
 # ---------------------------------------------------------------
\ No newline at end of file
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from .stservo_def import *
+from .tracer import *
 
 class GroupSyncRead:
     def __init__(self, ph, start_address, data_length):
@@ -62,25 +63,50 @@ class GroupSyncRead:
         if len(self.data_dict.keys()) == 0:
             return COMM_NOT_AVAILABLE
 
+        # data of the previous read must not survive a missing reply
+        for sts_id in self.data_dict:
+            self.data_dict[sts_id] = []
+
         result, rxpacket = self.ph.syncReadRx(self.data_length, len(self.data_dict.keys()))
         # print(rxpacket)
+        tracer = self.ph.tracer
+        if tracer is not None:
+            t_decode = tracer.now()
+        register_cache = self.ph.register_cache
         if len(rxpacket) >= (self.data_length+6):
             for sts_id in self.data_dict:
                 self.data_dict[sts_id], result = self.readRx(rxpacket, sts_id, self.data_length)
                 if result != COMM_SUCCESS:
                     self.last_result = False
+                elif register_cache is not None:
+                    register_cache.store(sts_id, self.start_address, self.data_dict[sts_id][1:],
+                                         self.data_dict[sts_id][0], self.ph.getIdRegisterMap(sts_id))
                 # print(sts_id)
         else:
             self.last_result = False
+        if tracer is not None:
+            tracer.add_span(TRACE_DECODE, t_decode, tracer.now(), {"ids": len(self.data_dict)})
         # print(self.last_result)
         return result
 
     def txRxPacket(self):
+        tracer = self.ph.tracer
+        if tracer is not None:
+            t_start = tracer.now()
+
         result = self.txPacket()
-        if result != COMM_SUCCESS:
-            return result
+        if result == COMM_SUCCESS:
+            result = self.rxPacket()
+        else:
+            self.last_result = False
+            for sts_id in self.data_dict:
+                self.data_dict[sts_id] = []
 
-        return self.rxPacket()
+        if tracer is not None:
+            tracer.add_span(TRACE_SYNC_READ, t_start, tracer.now(),
+                            {"address": self.start_address, "length": self.data_length,
+                             "ids": len(self.data_dict), "result": result})
+        return result
 
     def readRx(self, rxpacket, sts_id, data_length):
         # print(sts_id)
@@ -137,15 +163,16 @@ class GroupSyncRead:
         return True, self.data_dict[sts_id][0]
 
     def getData(self, sts_id, address, data_length):
+        end = self.ph.getIdEnd(sts_id)
         if data_length == 1:
             return self.data_dict[sts_id][address-self.start_address+1]
         elif data_length == 2:
-            return self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
-                                self.data_dict[sts_id][address-self.start_address+2])
+            return self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
+                                self.data_dict[sts_id][address-self.start_address+2], end)
         elif data_length == 4:
-            return self.ph.scs_makedword(self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+1],
-                                              self.data_dict[sts_id][address-self.start_address+2]),
-                                 self.ph.scs_makeword(self.data_dict[sts_id][address-self.start_address+3],
-                                              self.data_dict[sts_id][address-self.start_address+4]))
+            return self.ph.sts_makedword(self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+1],
+                                              self.data_dict[sts_id][address-self.start_address+2], end),
+                                 self.ph.sts_makeword(self.data_dict[sts_id][address-self.start_address+3],
+                                              self.data_dict[sts_id][address-self.start_address+4], end))
         else:
             return 0
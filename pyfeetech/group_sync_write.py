@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
 from .stservo_def import *
+from .tracer import *
 
 class GroupSyncWrite:
     def __init__(self, ph, start_address, data_length):
@@ -66,8 +67,21 @@ class GroupSyncWrite:
         if len(self.data_dict.keys()) == 0:
             return COMM_NOT_AVAILABLE
 
+        tracer = self.ph.tracer
+        if tracer is not None:
+            t_start = tracer.now()
+
         if self.is_param_changed is True or not self.param:
             self.makeParam()
 
-        return self.ph.syncWriteTxOnly(self.start_address, self.data_length, self.param,
-                                       len(self.data_dict.keys()) * (1 + self.data_length))
+        if tracer is not None:
+            tracer.add_span(TRACE_ENCODE, t_start, tracer.now(), {"ids": len(self.data_dict)})
+
+        result = self.ph.syncWriteTxOnly(self.start_address, self.data_length, self.param,
+                                         len(self.data_dict.keys()) * (1 + self.data_length))
+
+        if tracer is not None:
+            tracer.add_span(TRACE_SYNC_WRITE, t_start, tracer.now(),
+                            {"address": self.start_address, "length": self.data_length,
+                             "ids": len(self.data_dict), "result": result})
+        return result
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+# Description: per-model register maps and limits, and a cache of the model of every servo.
+#
+# The feetechsts accessors are written against the STS3215 memory table. A RegisterMap
+# tells, for one servo model, where each of those registers actually lives (or that it
+# does not exist), the sign bit of signed values and the valid range of the settings.
+# Maps are looked up by model number, then by servo series (first byte of the model
+# number), so unknown models of a known series still get the right layout.
+#
+# The model of every servo, learned by ping() or scan_bus(), is kept per (port, ID) in a
+# ModelRegistry. With a path, the registry is saved to a small JSON file and loaded back on
+# the next run, so a known rig needs no discovery reads at startup.
+#
+# usage:
+#   registry = ModelRegistry("~/.pyfeetech_models.json")
+#   bus.setModelRegistry(registry)          # applies the models cached for this port
+#   bus.identify_models([1, 2, 3])          # pings only the IDs not cached yet, saves
+#   bus.get_position(3)                     # uses the register map of the model of ID 3
+
+import os
+import json
+from .stservo_def import *
+
+MODEL_REGISTRY_VERSION = 1
+
+#
+class RegisterMap(object):
+    #
+    # name:      model or series name
+    # end:       byte order (STS/SMS=0, SCS=1)
+    # remap:     {STS3215 address: address on this model}, for registers that moved
+    # missing:   STS3215 addresses of registers this model does not have
+    # sign_bits: {STS3215 address: sign bit}, for signed values not coded on bit 15
+    # limits:    {setting: (min, max)}
+    # ticks_per_rev: position resolution [ticks/rev]
+    def __init__(self, name, end=0, remap=None, missing=(), sign_bits=None, limits=None, ticks_per_rev=4096):
+        self.name = name
+        self.end = end
+        self.remap = dict(remap or {})
+        self.missing = frozenset(missing)
+        self.sign_bits = dict(sign_bits or {})
+        self.limits = dict(limits or {})
+        self.ticks_per_rev = ticks_per_rev
+
+    #
+    # address on this model of the STS3215 register at address, None if it does not exist
+    def address(self, address):
+        if address in self.missing:
+            return None
+        return self.remap.get(address, address)
+
+    #
+    def sign_bit(self, address):
+        return self.sign_bits.get(address, 15)
+
+    #
+    # value clamped to the range of setting, unchanged if the setting has no limits
+    def clamp(self, setting, value):
+        if setting not in self.limits:
+            return value
+        lo, hi = self.limits[setting]
+        return min(max(value, lo), hi)
+
+    #
+    def __repr__(self):
+        return f"RegisterMap({self.name!r})"
+
+# STS / SMS series: the reference memory table
+STS_REGISTER_MAP = RegisterMap("STS", end=0, limits={
+    "angle":        (0, 4095),
+    "torque":       (0, 1000),
+    "acceleration": (0, 254),
+})
+SMS_REGISTER_MAP = RegisterMap("SMS", end=0, limits=STS_REGISTER_MAP.limits)
+
+# SCS series: 10-bit positions, lock at 48, no acceleration, offset, mode, torque limit or status
+SCS_REGISTER_MAP = RegisterMap("SCS", end=1,
+    remap={55: 48},                         # lock
+    missing=(31, 33, 41, 48, 65),           # offset, mode, acceleration, torque limit, status
+    sign_bits={60: 10},                     # present load
+    limits={
+        "angle":    (0, 1023),
+        "torque":   (0, 1000),
+    },
+    ticks_per_rev=1024 * 360 / 300)         # 1024 ticks over 300 degrees
+
+# model number -> register map, for models that differ from their series
+MODEL_REGISTER_MAPS = {
+    777: RegisterMap("STS3215", end=0, limits=STS_REGISTER_MAP.limits),
+}
+
+# series (first byte of the model number, see MODEL_SERIES_END) -> register map
+SERIES_REGISTER_MAPS = {
+    9: STS_REGISTER_MAP,
+    8: SMS_REGISTER_MAP,
+    5: SCS_REGISTER_MAP,
+}
+
+#
+# register map of a model; end tells which byte of the model number is the series.
+# Servos of unknown model get the map of their byte order.
+def register_map_for(model=None, end=0):
+    if model in MODEL_REGISTER_MAPS:
+        return MODEL_REGISTER_MAPS[model]
+    if model is not None:
+        series = (model & 0xFF) if end == 0 else ((model >> 8) & 0xFF)
+        if series in SERIES_REGISTER_MAPS:
+            return SERIES_REGISTER_MAPS[series]
+    return SCS_REGISTER_MAP if end else STS_REGISTER_MAP
+
+#
+class ModelRegistry(object):
+    #
+    # path: JSON file the registry is loaded from (if it exists) and saved to; None keeps
+    # the registry in memory only
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path) if path is not None else None
+        self.models = {}        # {(port name, ID): (model, end)}
+        self.dirty = False
+        if self.path is not None and os.path.exists(self.path):
+            self.load()
+
+    #
+    # (model, end) of a servo, None if unknown
+    def get(self, port_name, sts_id):
+        return self.models.get((port_name, sts_id))
+
+    #
+    def set(self, port_name, sts_id, model, end):
+        if self.models.get((port_name, sts_id)) != (model, end):
+            self.models[(port_name, sts_id)] = (model, end)
+            self.dirty = True
+
+    #
+    def remove(self, port_name, sts_id):
+        if self.models.pop((port_name, sts_id), None) is not None:
+            self.dirty = True
+
+    #
+    # {ID: (model, end)} of the servos known on a port
+    def get_port(self, port_name):
+        return {sts_id: entry for (name, sts_id), entry in self.models.items() if name == port_name}
+
+    #
+    def load(self, path=None):
+        path = os.path.expanduser(path) if path is not None else self.path
+        with open(path) as f:
+            content = json.load(f)
+        if content.get("version") != MODEL_REGISTRY_VERSION:
+            return False
+
+        self.models = {(servo["port"], servo["id"]): (servo["model"], servo["end"])
+                       for servo in content.get("servos", [])}
+        self.dirty = False
+        return True
+
+    #
+    # writes the registry if it changed since it was loaded or saved; returns True if written
+    def save(self, path=None, force=False):
+        path = os.path.expanduser(path) if path is not None else self.path
+        if path is None or not (self.dirty or force):
+            return False
+
+        servos = [{"port": port_name, "id": sts_id, "model": model, "end": end}
+                  for (port_name, sts_id), (model, end) in sorted(self.models.items())]
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MODEL_REGISTRY_VERSION, "servos": servos}, f, indent=1)
+        os.replace(tmp_path, path)
+        self.dirty = False
+        return True
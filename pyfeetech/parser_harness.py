@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+# Description: throughput and robustness of the status packet parsers on adversarial streams.
+#
+# AdversarialStream generates status packets with random payloads, and damages a fraction
+# (error_rate) of them with one of PARSER_NOISE:
+#   bit_flip    one bit of the packet inverted (header included)
+#   truncate    the packet stops early, the rest never arrives
+#   echo        the instruction packet precedes the status packet (adapters echoing TX)
+#   ff_run      a run of stray 0xFF bytes precedes the packet
+# run_parser_harness() feeds the streams to the parsers of the library, times them, and
+# checks every result against the packets sent:
+#   rxPacket    the status packet loop of readTxRx, one transaction per packet, fed through
+#               a ReplayPortHandler
+#   sync_read   GroupSyncRead.readRx on the frames of a SYNC_READ (one packet per ID)
+# A packet is "correct" when decoded with the right data, "rejected" when not decoded and
+# "wrong" when decoded with other data (silent corruption). Echoed and 0xFF-prefixed
+# packets are intact, the parser should recover them; bit flips and truncations should be
+# rejected. Results are part of `pyfeetech bench --parsers`, so a faster parser that
+# recovers fewer packets (or a more robust one that is slower) shows up in the numbers.
+#
+# usage:
+#   results = run_parser_harness(count=5000, error_rate=0.05)
+#   print_parser_results(results)
+
+import time
+import random
+from .stservo_def import *
+from .protocol_packet_handler import *
+from .group_sync_read import *
+from .feetechsts import *
+from .capture import *
+
+PARSER_NOISE = ("bit_flip", "truncate", "echo", "ff_run")
+
+# noise after which the packet is still intact and should be decoded
+PARSER_RECOVERABLE = (None, "echo", "ff_run")
+
+#
+def make_status_packet(sts_id, params, error=0):
+    packet = [0xFF, 0xFF, sts_id, len(params) + 2, error] + list(params)
+    packet.append(~sum(packet[2:]) & 0xFF)
+    return bytes(packet)
+
+#
+def make_instruction_packet(sts_id, instruction, params):
+    packet = [0xFF, 0xFF, sts_id, len(params) + 2, instruction] + list(params)
+    packet.append(~sum(packet[2:]) & 0xFF)
+    return bytes(packet)
+
+#
+class AdversarialStream(object):
+    #
+    # ids: servos answering; address, data_length: registers read; error_rate: fraction of the
+    # packets damaged; noise: kinds of damage picked from; seed: same seed, same streams
+    def __init__(self, ids=(1, 2, 3, 4, 5, 6), address=STS_STATE_START, data_length=STS_STATE_LENGTH,
+                 error_rate=0.05, noise=PARSER_NOISE, seed=0):
+        self.ids = list(ids)
+        self.address = address
+        self.data_length = data_length
+        self.error_rate = error_rate
+        self.noise = list(noise)
+        self.random = random.Random(seed)
+
+    #
+    # (bytes on the wire, kind of damage or None)
+    def damage(self, packet, instruction):
+        rnd = self.random
+        if not self.noise or rnd.random() >= self.error_rate:
+            return packet, None
+
+        kind = rnd.choice(self.noise)
+        if kind == "bit_flip":
+            damaged = bytearray(packet)
+            damaged[rnd.randrange(len(damaged))] ^= 1 << rnd.randrange(8)
+            return bytes(damaged), kind
+        if kind == "truncate":
+            return packet[:rnd.randrange(1, len(packet))], kind
+        if kind == "echo":
+            return instruction + packet, kind
+        return b"\xff" * rnd.randint(1, 8) + packet, kind
+
+    #
+    def _payload(self):
+        return bytes(self.random.randrange(256) for _ in range(self.data_length))
+
+    #
+    # [(instruction, bytes on the wire, sts_id, data, kind)]: one READ per packet
+    def transactions(self, count):
+        result = []
+        for k in range(count):
+            sts_id = self.ids[k % len(self.ids)]
+            instruction = make_instruction_packet(sts_id, INST_READ, [self.address, self.data_length])
+            data = self._payload()
+            wire, kind = self.damage(make_status_packet(sts_id, data), instruction)
+            result.append((instruction, wire, sts_id, data, kind))
+        return result
+
+    #
+    # [(bytes on the wire, [(sts_id, data, kind)])]: one SYNC_READ of all ids per frame
+    def sync_frames(self, count):
+        instruction = make_instruction_packet(BROADCAST_ID, INST_SYNC_READ, [self.address, self.data_length] + self.ids)
+        result = []
+        for _ in range(count):
+            wire, packets = b"", []
+            for sts_id in self.ids:
+                data = self._payload()
+                damaged, kind = self.damage(make_status_packet(sts_id, data), instruction)
+                wire += damaged
+                packets.append((sts_id, data, kind))
+            result.append((wire, packets))
+        return result
+
+#
+class ParserResult(object):
+    #
+    def __init__(self, parser, error_rate):
+        self.parser = parser
+        self.error_rate = error_rate
+        self.packets = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.by_noise = {}              # {kind: {"correct": n, "rejected": n, "wrong": n}}
+
+    #
+    def add(self, kind, decoded, data, expected):
+        if not decoded:
+            outcome = "rejected"
+        elif bytes(data) == expected:
+            outcome = "correct"
+        else:
+            outcome = "wrong"
+        counts = self.by_noise.setdefault(kind or "none", {"correct": 0, "rejected": 0, "wrong": 0})
+        counts[outcome] += 1
+        self.packets += 1
+
+    #
+    def to_dict(self):
+        recoverable = [counts for kind, counts in self.by_noise.items() if kind in ("none",) + PARSER_RECOVERABLE]
+        damaged = [counts for kind, counts in self.by_noise.items() if kind not in ("none",) + PARSER_RECOVERABLE]
+        return {
+            "parser": self.parser,
+            "error_rate": self.error_rate,
+            "packets": self.packets,
+            "packets_per_s": self.packets / self.seconds if self.seconds > 0 else 0.0,
+            "bytes_per_s": self.bytes / self.seconds if self.seconds > 0 else 0.0,
+            "correct": sum(counts["correct"] for counts in self.by_noise.values()),
+            "lost": sum(counts["rejected"] for counts in recoverable),         # intact, not decoded
+            "wrong": sum(counts["wrong"] for counts in self.by_noise.values()),  # silent corruption
+            "rejected": sum(counts["rejected"] for counts in damaged),         # damaged, not decoded
+            "by_noise": self.by_noise,
+        }
+
+#
+def _run_rx_packet(stream, count):
+    transactions = stream.transactions(count)
+    events = []
+    for instruction, wire, _, _, _ in transactions:
+        events.append((CAPTURE_WRITE, 0.0, instruction))
+        events.append((CAPTURE_READ, 0.0, wire))
+
+    portHandler = ReplayPortHandler(PortCapture("parser_harness", events), speed=None)
+    portHandler.openPort()
+    ph = protocol_packet_handler(portHandler, 0)
+    result = ParserResult("rxPacket", stream.error_rate)
+
+    for instruction, wire, sts_id, expected, kind in transactions:
+        portHandler.writePort(instruction)
+
+        # the status packet loop of _txRxPacket: skip packets of other IDs
+        t_start = time.perf_counter()
+        while True:
+            rxpacket, sts_comm_result = ph.rxPacket()
+            if sts_comm_result != COMM_SUCCESS or rxpacket[PKT_ID] == sts_id:
+                break
+        result.seconds += time.perf_counter() - t_start
+        result.bytes += len(wire)
+
+        decoded = sts_comm_result == COMM_SUCCESS
+        result.add(kind, decoded, rxpacket[PKT_PARAMETER0: PKT_PARAMETER0 + stream.data_length] if decoded else b"", expected)
+    return result
+
+#
+def _run_sync_read(stream, count):
+    frames = stream.sync_frames(max(1, count // len(stream.ids)))
+    group = GroupSyncRead(None, stream.address, stream.data_length)
+    result = ParserResult("sync_read", stream.error_rate)
+
+    for wire, packets in frames:
+        rxpacket = list(wire)
+        decoded_packets = []
+        t_start = time.perf_counter()
+        for sts_id, _, _ in packets:
+            decoded_packets.append(group.readRx(rxpacket, sts_id, stream.data_length))
+        result.seconds += time.perf_counter() - t_start
+        result.bytes += len(wire)
+
+        for (sts_id, expected, kind), (data, sts_comm_result) in zip(packets, decoded_packets):
+            decoded = sts_comm_result == COMM_SUCCESS
+            result.add(kind, decoded, data[1:] if decoded else b"", expected)
+    return result
+
+#
+# runs every parser on count packets; returns [result dict], see ParserResult.to_dict
+def run_parser_harness(count=2000, error_rate=0.05, noise=PARSER_NOISE, ids=(1, 2, 3, 4, 5, 6),
+                       data_length=STS_STATE_LENGTH, seed=0):
+    results = []
+    for run in (_run_rx_packet, _run_sync_read):
+        stream = AdversarialStream(ids, STS_STATE_START, data_length, error_rate, noise, seed)
+        results.append(run(stream, count).to_dict())
+    return results
+
+#
+def print_parser_results(results):
+    print(f"{'parser':<10} {'error':>6} {'packets':>8} {'pkt/s':>9} {'MB/s':>6} {'correct':>8} {'lost':>6} {'wrong':>6} {'rejected':>9}")
+    for r in results:
+        print(f"{r['parser']:<10} {r['error_rate']:>6.3f} {r['packets']:>8} {r['packets_per_s']:>9.0f} "
+              f"{r['bytes_per_s'] / 1e6:>6.2f} {r['correct']:>8} {r['lost']:>6} {r['wrong']:>6} {r['rejected']:>9}")
+    for r in results:
+        for kind, counts in sorted(r["by_noise"].items()):
+            if kind != "none":
+                print(f"  {r['parser']:<10} {kind:<9} correct: {counts['correct']:<6} rejected: {counts['rejected']:<6} wrong: {counts['wrong']}")
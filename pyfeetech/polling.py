@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+
+# Description: multi-rate polling of register groups with SYNC_READ.
+#
+# Every poll group is a span of registers read at its own rate and priority (e.g. position
+# and speed at 500 Hz, load at 100 Hz, voltage and temperature at 1 Hz). The scheduler
+# runs at a base cycle rate; on each cycle it takes the groups that are due, highest
+# priority (then most late) first, as long as their estimated bus time fits the cycle
+# budget, and defers the rest to the next cycle. Due groups whose spans are adjacent or
+# close are merged into a single SYNC_READ. Low-rate groups get phase offsets that keep
+# them away from each other, so their reads spread across cycles instead of bursting
+# on the same one.
+#
+# usage:
+#   poller = PollingScheduler(bus, [1, 2, 3], cycle_hz=500, budget_ms=1.5)
+#   poller.add_default_groups()             # or add_group("motion", STS_PRESENT_POSITION_L, 4, 500)
+#   while True:
+#       poller.poll()                       # or poller.run()
+#       position = poller.get(1, STS_PRESENT_POSITION_L, 2, sign_bit=15)
+#
+# with a TelemetryHub attached (set_telemetry), every cycle publishes the fields of the
+# groups just read (see POLL_TELEMETRY_FIELDS) to its subscribers. With a MotorQuarantine
+# attached (set_quarantine), motors that stop answering are left out of the SYNC_READs
+# until a probe finds them again, see quarantine.py.
+
+import math
+import time
+from .stservo_def import *
+from .feetechsts import *
+from .group_sync_read import *
+from .telemetry import *
+
+# default groups: (name, start address, length, rate [Hz], priority)
+DEFAULT_POLL_GROUPS = [
+    ("motion",  STS_PRESENT_POSITION_L,     4, 500.0, 3),   # position, speed
+    ("load",    STS_PRESENT_LOAD_L,         2, 100.0, 2),
+    ("current", STS_PRESENT_CURRENT_L,      2, 100.0, 2),
+    ("status",  STS_STATUS,                 2, 10.0,  1),   # status, moving
+    ("health",  STS_PRESENT_VOLTAGE,        2, 1.0,   0),   # voltage, temperature
+]
+
+# spans of due groups closer than this [bytes] are read with one SYNC_READ: the extra bytes
+# per motor cost less than the header and the turnaround of another transaction
+POLL_MERGE_GAP = 4
+
+# fields published to the telemetry hub: (name, address, length, signed)
+POLL_TELEMETRY_FIELDS = [
+    ("position",    STS_PRESENT_POSITION_L,     2, True),
+    ("speed",       STS_PRESENT_SPEED_L,        2, True),
+    ("load",        STS_PRESENT_LOAD_L,         2, True),
+    ("voltage",     STS_PRESENT_VOLTAGE,        1, False),
+    ("temperature", STS_PRESENT_TEMPERATURE,    1, False),
+    ("status",      STS_STATUS,                 1, False),
+    ("moving",      STS_MOVING,                 1, False),
+    ("current",     STS_PRESENT_CURRENT_L,      2, True),
+]
+
+# fixed cost [ms] of a SYNC_READ on top of its wire time (adapter latency, turnarounds)
+POLL_TRANSACTION_OVERHEAD_MS = 0.3
+
+#
+class PollGroup(object):
+    #
+    def __init__(self, name, start_address, length, rate_hz, priority=0):
+        self.name = name
+        self.start_address = start_address
+        self.length = length
+        self.rate_hz = float(rate_hz)
+        self.priority = priority
+
+        self.period = 1         # [cycles]
+        self.phase = 0          # [cycles]
+        self.next_due = 0       # cycle of the next sample
+
+        self.samples = {}       # {motor_id: (timestamp [s], raw bytes)}
+        self.reads = 0
+        self.deferrals = 0      # cycles the group was due but did not fit the budget
+        self.skipped = 0        # samples dropped because the group stayed deferred for a whole period
+
+    #
+    @property
+    def end_address(self):
+        return self.start_address + self.length
+
+#
+class PollingScheduler(object):
+    #
+    # bus:       protocol handler (e.g. feetechsts)
+    # motor_ids: motors polled by every group
+    # cycle_hz:  [Hz] base cycle rate, the highest rate any group can get
+    # budget_ms: [ms] bus time per cycle (default: the whole cycle period)
+    # bus_model: BusModel (e.g. calibrated) for the cost of the reads, default: wire time + fixed overhead
+    def __init__(self, bus, motor_ids, cycle_hz=500.0, budget_ms=None, bus_model=None):
+        self.bus = bus
+        self.bus_model = bus_model
+        self.motor_ids = list(motor_ids)
+        self.cycle_hz = float(cycle_hz)
+        self.budget_ms = budget_ms if budget_ms is not None else 1000.0 / self.cycle_hz
+
+        self.groups = {}                # {name: PollGroup}
+        self.sync_reads = {}            # {(start address, length): GroupSyncRead}
+        self.cycle = 0
+        self.overruns = 0               # cycles that started late (run)
+        self.bus_time_ms = 0.0          # measured bus time of the last cycle
+        self.last_reads = []            # [(start address, length, [group names])] of the last cycle
+        self.telemetry = None
+        self.quarantine = None
+
+    #
+    def add_group(self, name, start_address, length, rate_hz, priority=0):
+        if name in self.groups:
+            return False
+
+        group = PollGroup(name, start_address, length, rate_hz, priority)
+        group.period = max(1, int(round(self.cycle_hz / group.rate_hz)))
+        group.phase = self._pick_phase(group)
+        group.next_due = self.cycle + (group.phase - self.cycle) % group.period
+        self.groups[name] = group
+        return True
+
+    #
+    def add_default_groups(self):
+        for name, start_address, length, rate_hz, priority in DEFAULT_POLL_GROUPS:
+            self.add_group(name, start_address, length, min(rate_hz, self.cycle_hz), priority)
+
+    #
+    # hub: TelemetryHub the fields read on every cycle are published to, None to stop
+    def set_telemetry(self, hub):
+        self.telemetry = hub
+
+    #
+    # quarantine: MotorQuarantine of the motors left out of the reads (see quarantine.py), None to read all
+    def set_quarantine(self, quarantine):
+        self.quarantine = quarantine
+
+    #
+    def remove_group(self, name):
+        self.groups.pop(name, None)
+
+    #
+    # two periodic groups meet on the same cycle iff their phases are equal modulo the gcd
+    # of their periods: pick the phase that meets the least estimated bus time
+    def _pick_phase(self, group):
+        if group.period == 1:
+            return 0
+
+        def collisions(phase):
+            return sum(self.estimate_ms(other.length) for other in self.groups.values()
+                       if other.period > 1 and (phase - other.phase) % math.gcd(group.period, other.period) == 0)
+
+        return min(range(group.period), key=lambda phase: (collisions(phase), phase))
+
+    #
+    # estimated bus time [ms] of one SYNC_READ of length bytes from every motor
+    def estimate_ms(self, length):
+        n = len(self.motor_ids)
+        if self.bus_model is not None:
+            wire_ms, host_ms = self.bus_model.sync_read_ms(n, length)
+            return wire_ms + host_ms
+        wire_bytes = (8 + n) + n * (6 + length)
+        return wire_bytes * self.bus.portHandler.tx_time_per_byte + POLL_TRANSACTION_OVERHEAD_MS
+
+    #
+    # groups to read on this cycle: due ones by priority, then lateness, as long as the merged
+    # reads fit the budget. Groups late by a whole period go first, so low priorities never starve
+    def _select(self):
+        due = [group for group in self.groups.values() if self.cycle >= group.next_due]
+        due.sort(key=lambda group: (self.cycle - group.next_due < group.period, -group.priority, group.next_due))
+
+        selected = []
+        for group in due:
+            if selected and self._estimate_reads_ms(self._merge(selected + [group])) > self.budget_ms:
+                group.deferrals += 1
+                continue
+            selected.append(group)
+        return selected
+
+    #
+    def _estimate_reads_ms(self, reads):
+        return sum(self.estimate_ms(length) for _, length, _ in reads)
+
+    #
+    # [(start address, length, [groups])]: spans of the selected groups, merged when close
+    @staticmethod
+    def _merge(groups):
+        reads = []
+        for group in sorted(groups, key=lambda group: group.start_address):
+            if reads and group.start_address - (reads[-1][0] + reads[-1][1]) <= POLL_MERGE_GAP:
+                start, length, members = reads[-1]
+                reads[-1] = (start, max(start + length, group.end_address) - start, members + [group])
+            else:
+                reads.append((group.start_address, group.length, [group]))
+        return reads
+
+    #
+    def _sync_read(self, start_address, length, motor_ids):
+        key = (start_address, length)
+        if key not in self.sync_reads:
+            self.sync_reads[key] = GroupSyncRead(self.bus, start_address, length)
+        group = self.sync_reads[key]
+        for motor_id in [m for m in group.data_dict if m not in motor_ids]:
+            group.removeParam(motor_id)
+        for motor_id in motor_ids:
+            group.addParam(motor_id)
+        return group
+
+    #
+    # runs one cycle; returns the names of the groups read
+    def poll(self):
+        t_start = time.perf_counter()
+        reads = self._merge(self._select())
+        fresh = {}                      # {motor_id: [groups read from it on this cycle]}
+        timestamp = None
+        quarantine = self.quarantine
+        active = quarantine.active(self.motor_ids) if quarantine is not None else self.motor_ids
+
+        for start_address, length, members in reads:
+            group_read = self._sync_read(start_address, length, active)
+            if active:
+                group_read.txRxPacket()
+            timestamp = time.time()
+
+            for motor_id in active:
+                available, _ = group_read.isAvailable(motor_id, start_address, length)
+                if not available:
+                    continue
+                data = bytes(group_read.data_dict[motor_id][1: length + 1])
+                for group in members:
+                    offset = group.start_address - start_address
+                    group.samples[motor_id] = (timestamp, data[offset: offset + group.length])
+                fresh.setdefault(motor_id, []).extend(members)
+
+            for group in members:
+                group.reads += 1
+                group.next_due += group.period
+                while group.next_due <= self.cycle:
+                    group.next_due += group.period
+                    group.skipped += 1
+
+        self.last_reads = [(start, length, [group.name for group in members]) for start, length, members in reads]
+        states = {}
+        if (self.telemetry is not None or quarantine is not None) and reads:
+            for motor_id in self.motor_ids:
+                if motor_id not in active:
+                    states[motor_id] = quarantine.stale_state(motor_id)
+                    continue
+                states[motor_id] = self._telemetry_state(motor_id, fresh[motor_id]) if motor_id in fresh else None
+                if quarantine is not None:
+                    quarantine.record(motor_id, states[motor_id])
+            if quarantine is not None:
+                quarantine.probe(self.bus)
+        self.bus_time_ms = (time.perf_counter() - t_start) * 1000.0
+        if self.telemetry is not None and reads:
+            self.telemetry.publish(states, timestamp)
+        self.cycle += 1
+        return [name for _, _, names in self.last_reads for name in names]
+
+    #
+    # polls at cycle_hz for duration [s] (default: forever)
+    def run(self, duration=None):
+        period = 1.0 / self.cycle_hz
+        t_start = t_next = time.perf_counter()
+        while duration is None or time.perf_counter() - t_start < duration:
+            self.poll()
+            t_next += period
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.overruns += 1
+                t_next = time.perf_counter()  # overrun: do not try to catch up
+
+    # ----- values
+    #
+    # latest raw value of the register(s) at address (1, 2 or 4 bytes) of motor_id, from the
+    # freshest group holding it; sign_bit: sign-magnitude bit to convert to signed.
+    # returns None if never read
+    def get(self, motor_id, address, length=1, sign_bit=None):
+        sample = self.get_sample(motor_id, address, length)
+        if sample is None:
+            return None
+
+        data = sample[1]
+        end = self.bus.getIdEnd(motor_id)
+        if length == 1:
+            value = data[0]
+        elif length == 2:
+            value = self.bus.sts_makeword(data[0], data[1], end)
+        else:
+            value = self.bus.sts_makedword(self.bus.sts_makeword(data[0], data[1], end),
+                                           self.bus.sts_makeword(data[2], data[3], end))
+        return self.bus.sts_tohost(value, sign_bit) if sign_bit is not None else value
+
+    #
+    # {field: value} of the POLL_TELEMETRY_FIELDS held by groups
+    def _telemetry_state(self, motor_id, groups):
+        register_map = self.bus.getIdRegisterMap(motor_id)
+        state = {}
+        for name, address, length, signed in POLL_TELEMETRY_FIELDS:
+            if register_map.address(address) is None:
+                continue
+            if any(group.start_address <= address and address + length <= group.end_address for group in groups):
+                state[name] = self.get(motor_id, address, length, register_map.sign_bit(address) if signed else None)
+        return state
+
+    #
+    # (timestamp [s], raw bytes) of the register(s) at address, None if never read
+    def get_sample(self, motor_id, address, length=1):
+        best = None
+        for group in self.groups.values():
+            if group.start_address <= address and address + length <= group.end_address and motor_id in group.samples:
+                timestamp, data = group.samples[motor_id]
+                if best is None or timestamp > best[0]:
+                    offset = address - group.start_address
+                    best = (timestamp, data[offset: offset + length])
+        return best
+
+    #
+    # {group name: (achieved rate [Hz], reads, deferrals, skipped)} over cycles polled so far
+    def get_stats(self):
+        elapsed = self.cycle / self.cycle_hz
+        return {name: (group.reads / elapsed if elapsed > 0 else 0.0, group.reads, group.deferrals, group.skipped)
+                for name, group in self.groups.items()}
@@ -1,13 +1,30 @@
 #!/usr/bin/env python
 
+import os
 import time
+import array
 import serial
 import sys
 import platform
 
+try:
+    import fcntl
+    import termios
+except ImportError:  # not POSIX
+    fcntl = None
+    termios = None
+
 DEFAULT_BAUDRATE = 1000000
 LATENCY_TIMER = 50 
 
+# low-latency mode (Linux, see setLowLatency)
+ASYNC_LOW_LATENCY = 0x2000          # serial_struct flag: the driver pushes received bytes at once
+TIOCGSERIAL = getattr(termios, "TIOCGSERIAL", 0x541E)
+TIOCSSERIAL = getattr(termios, "TIOCSSERIAL", 0x541F)
+SERIAL_STRUCT_FLAGS = 4             # index of flags in serial_struct, read as an array of ints
+USB_SERIAL_SYSFS = "/sys/bus/usb-serial/devices"
+LOW_LATENCY_TIMER = 1               # [ms] FTDI latency timer in low-latency mode (driver default: 16)
+
 class PortHandler(object):
     def __init__(self, port_name):
         self.is_open = False
@@ -15,15 +32,21 @@ class PortHandler(object):
         self.packet_start_time = 0.0
         self.packet_timeout = 0.0
         self.tx_time_per_byte = 0.0
+        self.latency_timer = LATENCY_TIMER
 
         self.is_using = False
         self.port_name = port_name
         self.ser = None
 
+        self.low_latency = False
+        self.low_latency_report = {}
+        self.low_latency_restore = {}   # settings changed by the low-latency mode: {setting: original value}
+
     def openPort(self):
         return self.setBaudRate(self.baudrate)
 
     def closePort(self):
+        self.restoreLowLatency()
         self.ser.close()
         self.is_open = False
 
@@ -40,13 +63,23 @@ class PortHandler(object):
         baud = self.getCFlagBaud(baudrate)
 
         if baud <= 0:
-            # self.setupPort(38400)
-            # self.baudrate = baudrate
-            return False  # TODO: setCustomBaudrate(baudrate)
+            return self.setCustomBaudrate(baudrate)
         else:
             self.baudrate = baudrate
             return self.setupPort(baud)
 
+    def setCustomBaudrate(self, baudrate):
+        # pyserial hands non-standard rates to the driver (e.g. BOTHER on Linux);
+        # if the driver refuses, go back to the previous rate
+        previous_baudrate = self.baudrate
+        self.baudrate = baudrate
+        try:
+            return self.setupPort(baudrate)
+        except (ValueError, serial.SerialException):
+            self.baudrate = previous_baudrate
+            self.setupPort(previous_baudrate)
+            return False
+
     def getBaudRate(self):
         return self.baudrate
 
@@ -62,9 +95,91 @@ class PortHandler(object):
     def writePort(self, packet):
         return self.ser.write(packet)
 
+    def setLatencyTimer(self, msec):
+        # slack added to the wire time of every status packet, see setPacketTimeout
+        self.latency_timer = msec
+
+    def getLatencyTimer(self):
+        return self.latency_timer
+
+    def setLowLatency(self, enabled=True):
+        # opt-in, Linux: ASYNC_LOW_LATENCY on the tty and latency timer of FTDI adapters to
+        # LOW_LATENCY_TIMER, applied whenever the port is opened and restored by closePort.
+        # Returns what was applied (see getLowLatencyReport)
+        self.low_latency = enabled
+        if self.is_open and self.ser is not None:
+            if enabled:
+                self.applyLowLatency()
+            else:
+                self.restoreLowLatency()
+        return self.low_latency_report
+
+    def getLowLatencyReport(self):
+        # {"async_low_latency": True if set (None: not available), "latency_timer": [original, applied] [ms]
+        #  (None: not an FTDI adapter), "errors": [what could not be applied, and why]}
+        return self.low_latency_report
+
+    def applyLowLatency(self):
+        report = {"async_low_latency": None, "latency_timer": None, "errors": []}
+        self.low_latency_report = report
+        if not sys.platform.startswith("linux") or fcntl is None:
+            report["errors"].append(f"low-latency mode not supported on {sys.platform}")
+            return report
+
+        try:
+            serial_struct = array.array("i", [0] * 32)
+            fcntl.ioctl(self.ser.fileno(), TIOCGSERIAL, serial_struct)
+            flags = serial_struct[SERIAL_STRUCT_FLAGS]
+            if not flags & ASYNC_LOW_LATENCY:
+                serial_struct[SERIAL_STRUCT_FLAGS] = flags | ASYNC_LOW_LATENCY
+                fcntl.ioctl(self.ser.fileno(), TIOCSSERIAL, serial_struct)
+                self.low_latency_restore.setdefault("flags", flags)
+            report["async_low_latency"] = True
+        except (OSError, AttributeError, ValueError) as e:
+            report["async_low_latency"] = False
+            report["errors"].append(f"ASYNC_LOW_LATENCY: {e}")
+
+        path = self.getLatencyTimerPath()
+        if path is not None:
+            try:
+                with open(path) as f:
+                    original = int(f.read().strip())
+                if original > LOW_LATENCY_TIMER:
+                    with open(path, "w") as f:
+                        f.write(str(LOW_LATENCY_TIMER))
+                    self.low_latency_restore.setdefault("latency_timer", original)
+                report["latency_timer"] = [self.low_latency_restore.get("latency_timer", original), min(original, LOW_LATENCY_TIMER)]
+            except (OSError, ValueError) as e:
+                report["errors"].append(f"{path}: {e} (udev rule or root needed)")
+
+        return report
+
+    def restoreLowLatency(self):
+        # puts back the settings changed by applyLowLatency, best effort
+        if "flags" in self.low_latency_restore and self.ser is not None:
+            try:
+                serial_struct = array.array("i", [0] * 32)
+                fcntl.ioctl(self.ser.fileno(), TIOCGSERIAL, serial_struct)
+                serial_struct[SERIAL_STRUCT_FLAGS] = self.low_latency_restore["flags"]
+                fcntl.ioctl(self.ser.fileno(), TIOCSSERIAL, serial_struct)
+            except (OSError, AttributeError, ValueError):
+                pass
+        if "latency_timer" in self.low_latency_restore:
+            try:
+                with open(self.getLatencyTimerPath(), "w") as f:
+                    f.write(str(self.low_latency_restore["latency_timer"]))
+            except (OSError, TypeError):
+                pass
+        self.low_latency_restore = {}
+
+    def getLatencyTimerPath(self):
+        # sysfs latency timer of the adapter behind the port (FTDI), None if there is none
+        path = os.path.join(USB_SERIAL_SYSFS, os.path.basename(os.path.realpath(self.port_name)), "latency_timer")
+        return path if os.path.exists(path) else None
+
     def setPacketTimeout(self, packet_length):
         self.packet_start_time = self.getCurrentTime()
-        self.packet_timeout = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + LATENCY_TIMER
+        self.packet_timeout = (self.tx_time_per_byte * packet_length) + (self.tx_time_per_byte * 3.0) + self.latency_timer
 
     def setPacketTimeoutMillis(self, msec):
         self.packet_start_time = self.getCurrentTime()
@@ -102,6 +217,9 @@ class PortHandler(object):
 
         self.is_open = True
 
+        if self.low_latency:
+            self.applyLowLatency()
+
         self.ser.reset_input_buffer()
 
         self.tx_time_per_byte = (1000.0 / self.baudrate) * 10.0
@@ -109,7 +227,7 @@ class PortHandler(object):
         return True
 
     def getCFlagBaud(self, baudrate):
-        if baudrate in [4800, 9600, 14400, 19200, 38400, 57600, 115200, 128000, 250000, 500000, 1000000]:
+        if baudrate in [4800, 9600, 14400, 19200, 38400, 57600, 76800, 115200, 128000, 250000, 500000, 1000000]:
             return baudrate
         else:
             return -1          
\ No newline at end of file
@@ -1,10 +1,33 @@
 #!/usr/bin/env python
 
 from .stservo_def import *
+from .tracer import *
+from .retry_policy import *
+from .register_cache import *
+from .group_sync_read import *
+from .model_registry import *
+from collections import OrderedDict
 
 TXPACKET_MAX_LEN = 250
 RXPACKET_MAX_LEN = 250
 
+# margin [ms] added to the wire time of a status packet when letting it go by unread
+STATUS_PACKET_GAP = 0.1
+
+# status return levels: servos at level 0 only answer PING and READ instructions
+RESPONSE_LEVEL_READ_ONLY = 0
+RESPONSE_LEVEL_ALL = 1
+
+# servo ID register, the same on every model: a write to it moves the servo to another ID
+ID_ADDRESS = 5
+
+# {address: values} of commands that do not read back as written, left out of
+# verifyUnackedWrites (torque enable 128: set the current position as 2048)
+UNVERIFIED_WRITES = {40: (128,)}
+
+# number of precompiled instruction packets kept by each handler (LRU), 0 disables the cache
+PACKET_CACHE_SIZE = 64
+
 # for Protocol Packet
 PKT_HEADER0 = 0
 PKT_HEADER1 = 1
@@ -27,6 +50,125 @@ class protocol_packet_handler(object):
         #self.sts_setend(protocol_end)# STServo bit end(STS/SMS=0, SCS=1)
         self.portHandler = portHandler
         self.sts_end = protocol_end
+        self.tracer = None
+        self.retry_policy = None
+        self.register_cache = None
+        self.cycle_deadline = None
+        self.packet_cache = OrderedDict()
+        self.packet_cache_size = PACKET_CACHE_SIZE
+        self.packet_cache_hits = 0
+        self.packet_cache_misses = 0
+        self.response_levels = {}       # {sts_id: status return level}, unknown IDs answer everything
+        self.inter_frame_gap = 0.0      # [ms] idle time after writes that get no status packet
+        self.unacked_writes = {}        # {sts_id: {address: data}} not verified yet, see verifyUnackedWrites
+        self.lost_writes = 0
+        self.id_ends = {}               # {sts_id: byte order}, learned by ping/scan_bus, default sts_end
+        self.id_models = {}             # {sts_id: model number}, learned by ping/scan_bus
+        self.model_registry = None
+
+    def setTracer(self, tracer):
+        self.tracer = tracer
+
+    def getTracer(self):
+        return self.tracer
+
+    def setRetryPolicy(self, retry_policy):
+        self.retry_policy = retry_policy
+
+    def getRetryPolicy(self):
+        return self.retry_policy
+
+    def setRegisterCache(self, register_cache):
+        self.register_cache = register_cache
+
+    def getRegisterCache(self):
+        return self.register_cache
+
+    def setCycleDeadline(self, msec):
+        # retries started from now on must end within msec
+        self.cycle_deadline = self.portHandler.getCurrentTime() + msec
+
+    def clearCycleDeadline(self):
+        self.cycle_deadline = None
+
+    def setPacketCacheSize(self, size):
+        self.packet_cache_size = size
+        while len(self.packet_cache) > max(0, size):
+            self.packet_cache.popitem(last=False)
+
+    def clearPacketCache(self):
+        self.packet_cache.clear()
+
+    def compilePacket(self, sts_id, instruction, params):
+        # complete instruction packet as immutable bytes, ready for txPacket
+        txpacket = [0xFF, 0xFF, sts_id, len(params) + 2, instruction]
+        txpacket.extend(params)
+        txpacket.append(~sum(txpacket[2:]) & 0xFF)
+        return bytes(txpacket)
+
+    def getCompiledPacket(self, key, sts_id, instruction, params):
+        # key: (instruction, ID or tuple of IDs, address, length)
+        txpacket = self.packet_cache.get(key)
+        if txpacket is not None:
+            self.packet_cache.move_to_end(key)
+            self.packet_cache_hits += 1
+            return txpacket
+
+        self.packet_cache_misses += 1
+        txpacket = self.compilePacket(sts_id, instruction, params)
+        self.packet_cache[key] = txpacket
+        if len(self.packet_cache) > self.packet_cache_size:
+            self.packet_cache.popitem(last=False)
+        return txpacket
+
+    def setResponseLevel(self, sts_id, level):
+        # only records what the servo is configured to: writes to servos at level 0 go tx-only
+        self.response_levels[sts_id] = level
+
+    def getResponseLevel(self, sts_id):
+        return self.response_levels.get(sts_id, RESPONSE_LEVEL_ALL)
+
+    def setInterFrameGap(self, msec):
+        self.inter_frame_gap = msec
+
+    def setIdEnd(self, sts_id, end):
+        # byte order of one servo (STS/SMS=0, SCS=1), for buses mixing servo families
+        self.id_ends[sts_id] = end
+
+    def getIdEnd(self, sts_id):
+        return self.id_ends.get(sts_id, self.sts_end)
+
+    def learnIdEnd(self, sts_id, model_series):
+        # model_series: first byte of the model number (address 3), see MODEL_SERIES_END
+        end = MODEL_SERIES_END.get(model_series)
+        if end is not None:
+            self.id_ends[sts_id] = end
+        return self.getIdEnd(sts_id)
+
+    def setModelRegistry(self, registry):
+        # applies the models cached for this port, and records the ones learned from now on
+        self.model_registry = registry
+        if registry is not None:
+            for sts_id, (model, end) in registry.get_port(self.portHandler.getPortName()).items():
+                self.id_models[sts_id] = model
+                self.id_ends[sts_id] = end
+
+    def getModelRegistry(self):
+        return self.model_registry
+
+    def setIdModel(self, sts_id, model, end=None):
+        if end is None:
+            end = self.getIdEnd(sts_id)
+        self.id_models[sts_id] = model
+        self.id_ends[sts_id] = end
+        if self.model_registry is not None:
+            self.model_registry.set(self.portHandler.getPortName(), sts_id, model, end)
+
+    def getIdModel(self, sts_id):
+        return self.id_models.get(sts_id)
+
+    def getIdRegisterMap(self, sts_id):
+        return register_map_for(self.id_models.get(sts_id), self.getIdEnd(sts_id))
 
     def sts_getend(self):
         return self.sts_end
@@ -46,8 +188,10 @@ class protocol_packet_handler(object):
         else:
             return a
 
-    def sts_makeword(self, a, b):
-        if self.sts_end==0:
+    def sts_makeword(self, a, b, end=None):
+        if end is None:
+            end = self.sts_end
+        if end==0:
             return (a & 0xFF) | ((b & 0xFF) << 8)
         else:
             return (b & 0xFF) | ((a & 0xFF) << 8)
@@ -61,17 +205,33 @@ class protocol_packet_handler(object):
     def sts_hiword(self, h):
         return (h >> 16) & 0xFFFF
 
-    def sts_lobyte(self, w):
-        if self.sts_end==0:
+    def sts_lobyte(self, w, end=None):
+        if end is None:
+            end = self.sts_end
+        if end==0:
             return w & 0xFF
         else:
             return (w >> 8) & 0xFF
 
-    def sts_hibyte(self, w):
-        if self.sts_end==0:
+    def sts_hibyte(self, w, end=None):
+        if end is None:
+            end = self.sts_end
+        if end==0:
             return (w >> 8) & 0xFF
         else:
             return w & 0xFF
+
+    # SCS naming of the same helpers, used by scscl and by the vendor code
+    scs_getend = sts_getend
+    scs_setend = sts_setend
+    scs_tohost = sts_tohost
+    scs_toscs = sts_toscs
+    scs_makeword = sts_makeword
+    scs_makedword = sts_makedword
+    scs_loword = sts_loword
+    scs_hiword = sts_hiword
+    scs_lobyte = sts_lobyte
+    scs_hibyte = sts_hibyte
         
     def getProtocolVersion(self):
         return 1.0
@@ -124,26 +284,44 @@ class protocol_packet_handler(object):
             return COMM_PORT_BUSY
         self.portHandler.is_using = True
 
+        tracer = self.tracer
+        if tracer is not None:
+            t_encode = tracer.now()
+
         # check max packet length
         if total_packet_length > TXPACKET_MAX_LEN:
             self.portHandler.is_using = False
             return COMM_TX_ERROR
 
-        # make packet header
-        txpacket[PKT_HEADER0] = 0xFF
-        txpacket[PKT_HEADER1] = 0xFF
+        # precompiled packets (see compilePacket) already carry header and checksum
+        if type(txpacket) is not bytes:
+            # make packet header
+            txpacket[PKT_HEADER0] = 0xFF
+            txpacket[PKT_HEADER1] = 0xFF
+
+            # add a checksum to the packet
+            for idx in range(2, total_packet_length - 1):  # except header, checksum
+                checksum += txpacket[idx]
 
-        # add a checksum to the packet
-        for idx in range(2, total_packet_length - 1):  # except header, checksum
-            checksum += txpacket[idx]
+            txpacket[total_packet_length - 1] = ~checksum & 0xFF
 
-        txpacket[total_packet_length - 1] = ~checksum & 0xFF
+            #print "[TxPacket] %r" % txpacket
 
-        #print "[TxPacket] %r" % txpacket
+            if tracer is not None:
+                tracer.add_span(TRACE_ENCODE, t_encode, tracer.now(), {"id": txpacket[PKT_ID]})
+
+        if tracer is not None:
+            t_write = tracer.now()
+
+        # registers written from now on are stale in the register cache
+        if self.register_cache is not None:
+            self.register_cache.invalidatePacket(txpacket)
 
         # tx packet
         self.portHandler.clearPort()
         written_packet_length = self.portHandler.writePort(txpacket)
+        if tracer is not None:
+            tracer.add_span(TRACE_WRITE, t_write, tracer.now(), {"bytes": total_packet_length})
         if total_packet_length != written_packet_length:
             self.portHandler.is_using = False
             return COMM_TX_FAIL
@@ -158,9 +336,17 @@ class protocol_packet_handler(object):
         rx_length = 0
         wait_length = 6  # minimum length (HEADER0 HEADER1 ID LENGTH ERROR CHKSUM)
 
+        tracer = self.tracer
+        if tracer is not None:
+            t_wait = tracer.now()
+            t_first = None
+
         while True:
             rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
             rx_length = len(rxpacket)
+            if tracer is not None and t_first is None and rx_length > 0:
+                t_first = tracer.now()
+                tracer.add_span(TRACE_WAIT_FIRST_BYTE, t_wait, t_first)
             if rx_length >= wait_length:
                 # find packet header
                 for idx in range(0, (rx_length - 1)):
@@ -192,6 +378,9 @@ class protocol_packet_handler(object):
                         else:
                             continue
 
+                    if tracer is not None:
+                        t_decode = tracer.now()
+
                     # calculate checksum
                     for i in range(2, wait_length - 1):  # except header, checksum
                         checksum += rxpacket[i]
@@ -202,6 +391,9 @@ class protocol_packet_handler(object):
                         result = COMM_SUCCESS
                     else:
                         result = COMM_RX_CORRUPT
+
+                    if tracer is not None:
+                        tracer.add_span(TRACE_DECODE, t_decode, tracer.now())
                     break
 
                 else:
@@ -218,10 +410,83 @@ class protocol_packet_handler(object):
                         result = COMM_RX_CORRUPT
                     break
 
+        if tracer is not None and t_first is not None:
+            tracer.add_span(TRACE_RECEIVE, t_first, tracer.now(), {"bytes": len(rxpacket), "result": result})
+
         self.portHandler.is_using = False
         return rxpacket, result
 
     def txRxPacket(self, txpacket):
+        # (ID == Broadcast ID) == no status packet, nothing to retry on
+        if self.retry_policy is None or txpacket[PKT_ID] == BROADCAST_ID:
+            return self._txRxPacketTraced(txpacket)
+
+        policy = self.retry_policy
+        policy.calls += 1
+
+        deadline = self.cycle_deadline
+        if policy.deadline_ms is not None:
+            call_deadline = self.portHandler.getCurrentTime() + policy.deadline_ms
+            deadline = call_deadline if deadline is None else min(deadline, call_deadline)
+
+        retryable = self.isRetryable(txpacket)
+        attempt = 1
+        while True:
+            t_attempt = self.portHandler.getCurrentTime()
+            rxpacket, result, error = self._txRxPacketTraced(txpacket)
+            if result == COMM_SUCCESS or not policy.shouldRetry(result):
+                break
+
+            if not retryable:
+                policy.not_retryable += 1
+                break
+
+            if attempt >= policy.max_attempts:
+                policy.exhausted += 1
+                break
+
+            # the failed attempt is the best estimate of how long another one can take
+            if deadline is not None:
+                now = self.portHandler.getCurrentTime()
+                if now + (now - t_attempt) > deadline:
+                    policy.deadline_aborts += 1
+                    break
+
+            attempt += 1
+            policy.countRetry(txpacket[PKT_ID], result)
+            if self.tracer is not None:
+                self.tracer.add_instant("retry", {"id": txpacket[PKT_ID], "result": result, "attempt": attempt})
+
+        if attempt > 1 and result == COMM_SUCCESS:
+            policy.recovered += 1
+
+        return rxpacket, result, error
+
+    def isRetryable(self, txpacket):
+        # instructions the retry policy allows, except writes to the ID register or of
+        # commands that do not read back (a lost status packet does not mean a lost write)
+        instruction = txpacket[PKT_INSTRUCTION]
+        if not self.retry_policy.retriesInstruction(instruction):
+            return False
+        if instruction in (INST_WRITE, INST_REG_WRITE):
+            address = txpacket[PKT_PARAMETER0]
+            for i in range(address, address + txpacket[PKT_LENGTH] - 3):
+                if i == ID_ADDRESS or i in UNVERIFIED_WRITES:
+                    return False
+        return True
+
+    def _txRxPacketTraced(self, txpacket):
+        tracer = self.tracer
+        if tracer is None:
+            return self._txRxPacket(txpacket)
+
+        t_start = tracer.now()
+        rxpacket, result, error = self._txRxPacket(txpacket)
+        tracer.add_span(TRACE_TXRX, t_start, tracer.now(),
+                        {"id": txpacket[PKT_ID], "instruction": txpacket[PKT_INSTRUCTION], "result": result})
+        return rxpacket, result, error
+
+    def _txRxPacket(self, txpacket):
         rxpacket = None
         error = 0
 
@@ -256,30 +521,36 @@ class protocol_packet_handler(object):
         model_number = 0
         error = 0
 
-        txpacket = [0] * 6
-
         if sts_id >= BROADCAST_ID:
             return model_number, COMM_NOT_AVAILABLE, error
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_PING
+        if self.packet_cache_size > 0:
+            txpacket = self.getCompiledPacket((INST_PING, sts_id, 0, 0), sts_id, INST_PING, [])
+        else:
+            txpacket = [0] * 6
+            txpacket[PKT_ID] = sts_id
+            txpacket[PKT_LENGTH] = 2
+            txpacket[PKT_INSTRUCTION] = INST_PING
 
         rxpacket, result, error = self.txRxPacket(txpacket)
 
         if result == COMM_SUCCESS:
             data_read, result, error = self.readTxRx(sts_id, 3, 2)  # Address 3 : Model Number
             if result == COMM_SUCCESS:
-                model_number = self.sts_makeword(data_read[0], data_read[1])
+                end = self.learnIdEnd(sts_id, data_read[0])
+                model_number = self.sts_makeword(data_read[0], data_read[1], end)
+                self.setIdModel(sts_id, model_number, end)
 
         return model_number, result, error
 
     def action(self, sts_id):
-        txpacket = [0] * 6
-
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 2
-        txpacket[PKT_INSTRUCTION] = INST_ACTION
+        if self.packet_cache_size > 0:
+            txpacket = self.getCompiledPacket((INST_ACTION, sts_id, 0, 0), sts_id, INST_ACTION, [])
+        else:
+            txpacket = [0] * 6
+            txpacket[PKT_ID] = sts_id
+            txpacket[PKT_LENGTH] = 2
+            txpacket[PKT_INSTRUCTION] = INST_ACTION
 
         _, result, _ = self.txRxPacket(txpacket)
 
@@ -287,16 +558,18 @@ class protocol_packet_handler(object):
 
     def readTx(self, sts_id, address, length):
 
-        txpacket = [0] * 8
-
         if sts_id >= BROADCAST_ID:
             return COMM_NOT_AVAILABLE
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
+        if self.packet_cache_size > 0:
+            txpacket = self.getCompiledPacket((INST_READ, sts_id, address, length), sts_id, INST_READ, [address, length])
+        else:
+            txpacket = [0] * 8
+            txpacket[PKT_ID] = sts_id
+            txpacket[PKT_LENGTH] = 4
+            txpacket[PKT_INSTRUCTION] = INST_READ
+            txpacket[PKT_PARAMETER0 + 0] = address
+            txpacket[PKT_PARAMETER0 + 1] = length
 
         result = self.txPacket(txpacket)
 
@@ -327,23 +600,35 @@ class protocol_packet_handler(object):
         return data, result, error
 
     def readTxRx(self, sts_id, address, length):
-        txpacket = [0] * 8
         data = []
 
         if sts_id >= BROADCAST_ID:
             return data, COMM_NOT_AVAILABLE, 0
 
-        txpacket[PKT_ID] = sts_id
-        txpacket[PKT_LENGTH] = 4
-        txpacket[PKT_INSTRUCTION] = INST_READ
-        txpacket[PKT_PARAMETER0 + 0] = address
-        txpacket[PKT_PARAMETER0 + 1] = length
+        register_cache = self.register_cache
+        if register_cache is not None:
+            register_map = self.getIdRegisterMap(sts_id)
+            cached = register_cache.lookup(sts_id, address, length, register_map)
+            if cached is not None:
+                return cached[0], COMM_SUCCESS, cached[1]
+
+        if self.packet_cache_size > 0:
+            txpacket = self.getCompiledPacket((INST_READ, sts_id, address, length), sts_id, INST_READ, [address, length])
+        else:
+            txpacket = [0] * 8
+            txpacket[PKT_ID] = sts_id
+            txpacket[PKT_LENGTH] = 4
+            txpacket[PKT_INSTRUCTION] = INST_READ
+            txpacket[PKT_PARAMETER0 + 0] = address
+            txpacket[PKT_PARAMETER0 + 1] = length
 
         rxpacket, result, error = self.txRxPacket(txpacket)
         if result == COMM_SUCCESS:
             error = rxpacket[PKT_ERROR]
 
             data.extend(rxpacket[PKT_PARAMETER0 : PKT_PARAMETER0+length])
+            if register_cache is not None:
+                register_cache.store(sts_id, address, data, error, register_map)
 
         return data, result, error
 
@@ -365,12 +650,12 @@ class protocol_packet_handler(object):
 
     def read2ByteRx(self, sts_id):
         data, result, error = self.readRx(sts_id, 2)
-        data_read = self.sts_makeword(data[0], data[1]) if (result == COMM_SUCCESS) else 0
+        data_read = self.sts_makeword(data[0], data[1], self.getIdEnd(sts_id)) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def read2ByteTxRx(self, sts_id, address):
         data, result, error = self.readTxRx(sts_id, address, 2)
-        data_read = self.sts_makeword(data[0], data[1]) if (result == COMM_SUCCESS) else 0
+        data_read = self.sts_makeword(data[0], data[1], self.getIdEnd(sts_id)) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def read4ByteTx(self, sts_id, address):
@@ -378,14 +663,16 @@ class protocol_packet_handler(object):
 
     def read4ByteRx(self, sts_id):
         data, result, error = self.readRx(sts_id, 4)
-        data_read = self.sts_makedword(self.sts_makeword(data[0], data[1]),
-                                  self.sts_makeword(data[2], data[3])) if (result == COMM_SUCCESS) else 0
+        end = self.getIdEnd(sts_id)
+        data_read = self.sts_makedword(self.sts_makeword(data[0], data[1], end),
+                                  self.sts_makeword(data[2], data[3], end)) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def read4ByteTxRx(self, sts_id, address):
         data, result, error = self.readTxRx(sts_id, address, 4)
-        data_read = self.sts_makedword(self.sts_makeword(data[0], data[1]),
-                                  self.sts_makeword(data[2], data[3])) if (result == COMM_SUCCESS) else 0
+        end = self.getIdEnd(sts_id)
+        data_read = self.sts_makedword(self.sts_makeword(data[0], data[1], end),
+                                  self.sts_makeword(data[2], data[3], end)) if (result == COMM_SUCCESS) else 0
         return data_read, result, error
 
     def writeTxOnly(self, sts_id, address, length, data):
@@ -404,6 +691,14 @@ class protocol_packet_handler(object):
         return result
 
     def writeTxRx(self, sts_id, address, length, data):
+        if self.response_levels.get(sts_id, RESPONSE_LEVEL_ALL) == RESPONSE_LEVEL_READ_ONLY:
+            # no status packet will come: send tx-only, verifyUnackedWrites catches lost writes
+            result = self.writeTxOnly(sts_id, address, length, data)
+            if result == COMM_SUCCESS:
+                self.trackUnackedWrite(sts_id, address, data[0: length])
+            self.waitStatusPacketSlot(sts_id)
+            return result, 0
+
         txpacket = [0] * (length + 7)
 
         txpacket[PKT_ID] = sts_id
@@ -416,6 +711,69 @@ class protocol_packet_handler(object):
 
         return result, error
 
+    def trackUnackedWrite(self, sts_id, address, data):
+        if address <= ID_ADDRESS < address + len(data) and data[ID_ADDRESS - address] != sts_id:
+            # the servo only answers to its new ID: its pending writes and response level follow it
+            new_id = data[ID_ADDRESS - address]
+            self.unacked_writes[new_id] = self.unacked_writes.pop(sts_id, {})
+            if sts_id in self.response_levels:
+                self.response_levels[new_id] = self.response_levels.pop(sts_id)
+            sts_id = new_id
+        writes = self.unacked_writes.setdefault(sts_id, {})
+        writes.pop(address, None)  # keep the writes in order, the latest one wins on overlaps
+        writes[address] = list(data)
+
+    def verifyUnackedWrites(self, resend=True):
+        # reads back, with one SYNC_READ, the registers written to servos that do not acknowledge
+        # writes; call it periodically (e.g. every N control cycles) to catch lost commands.
+        # returns {sts_id: [addresses whose content differs]}; servos that did not answer stay
+        # pending for the next call
+        if not self.unacked_writes:
+            return {}
+
+        expected = {}
+        for sts_id, writes in list(self.unacked_writes.items()):
+            table = {}
+            for address, data in writes.items():
+                for i, value in enumerate(data):
+                    if value not in UNVERIFIED_WRITES.get(address + i, ()):
+                        table[address + i] = value
+            if table:
+                expected[sts_id] = table
+            else:
+                del self.unacked_writes[sts_id]     # nothing that can be read back
+        if not expected:
+            return {}
+
+        start = min(min(table) for table in expected.values())
+        length = max(max(table) for table in expected.values()) + 1 - start
+
+        group = GroupSyncRead(self, start, length)
+        for sts_id in expected:
+            group.addParam(sts_id)
+        group.txRxPacket()
+
+        lost = {}
+        for sts_id, table in expected.items():
+            available, _ = group.isAvailable(sts_id, start, length)
+            if not available:
+                continue
+
+            writes = self.unacked_writes.pop(sts_id)
+            data = group.data_dict[sts_id]
+            mismatched = sorted(address for address, value in table.items() if data[address - start + 1] != value)
+            if not mismatched:
+                continue
+
+            lost[sts_id] = mismatched
+            self.lost_writes += len(mismatched)
+            if resend:
+                for address, values in writes.items():
+                    if any(address <= a < address + len(values) for a in mismatched):
+                        self.writeTxRx(sts_id, address, len(values), values)
+
+        return lost
+
     def write1ByteTxOnly(self, sts_id, address, data):
         data_write = [data]
         return self.writeTxOnly(sts_id, address, 1, data_write)
@@ -425,25 +783,29 @@ class protocol_packet_handler(object):
         return self.writeTxRx(sts_id, address, 1, data_write)
 
     def write2ByteTxOnly(self, sts_id, address, data):
-        data_write = [self.sts_lobyte(data), self.sts_hibyte(data)]
+        end = self.getIdEnd(sts_id)
+        data_write = [self.sts_lobyte(data, end), self.sts_hibyte(data, end)]
         return self.writeTxOnly(sts_id, address, 2, data_write)
 
     def write2ByteTxRx(self, sts_id, address, data):
-        data_write = [self.sts_lobyte(data), self.sts_hibyte(data)]
+        end = self.getIdEnd(sts_id)
+        data_write = [self.sts_lobyte(data, end), self.sts_hibyte(data, end)]
         return self.writeTxRx(sts_id, address, 2, data_write)
 
     def write4ByteTxOnly(self, sts_id, address, data):
-        data_write = [self.sts_lobyte(self.sts_loword(data)),
-                      self.sts_hibyte(self.sts_loword(data)),
-                      self.sts_lobyte(self.sts_hiword(data)),
-                      self.sts_hibyte(self.sts_hiword(data))]
+        end = self.getIdEnd(sts_id)
+        data_write = [self.sts_lobyte(self.sts_loword(data), end),
+                      self.sts_hibyte(self.sts_loword(data), end),
+                      self.sts_lobyte(self.sts_hiword(data), end),
+                      self.sts_hibyte(self.sts_hiword(data), end)]
         return self.writeTxOnly(sts_id, address, 4, data_write)
 
     def write4ByteTxRx(self, sts_id, address, data):
-        data_write = [self.sts_lobyte(self.sts_loword(data)),
-                      self.sts_hibyte(self.sts_loword(data)),
-                      self.sts_lobyte(self.sts_hiword(data)),
-                      self.sts_hibyte(self.sts_hiword(data))]
+        end = self.getIdEnd(sts_id)
+        data_write = [self.sts_lobyte(self.sts_loword(data), end),
+                      self.sts_hibyte(self.sts_loword(data), end),
+                      self.sts_lobyte(self.sts_hiword(data), end),
+                      self.sts_hibyte(self.sts_hiword(data), end)]
         return self.writeTxRx(sts_id, address, 4, data_write)
 
     def regWriteTxOnly(self, sts_id, address, length, data):
@@ -461,7 +823,33 @@ class protocol_packet_handler(object):
 
         return result
 
+    def waitStatusPacketSlot(self, sts_id):
+        # after a tx-only instruction, let the status packet of sts_id go by before transmitting
+        # again: on the half-duplex bus it would collide with the next instruction.
+        # Servos that do not acknowledge writes only need the inter-frame gap
+        self.portHandler.clearPort()
+        if self.response_levels.get(sts_id, RESPONSE_LEVEL_ALL) == RESPONSE_LEVEL_READ_ONLY:
+            gap = self.inter_frame_gap
+        else:
+            gap = self.portHandler.tx_time_per_byte * 6 + STATUS_PACKET_GAP
+        if gap <= 0:
+            return
+        t_end = self.portHandler.getCurrentTime() + gap
+        while self.portHandler.getCurrentTime() < t_end:
+            pass
+
+    def discardRxPacket(self):
+        # drop status packets nobody waited for (e.g. answers to tx-only instructions)
+        bytes_available = self.portHandler.getBytesAvailable()
+        if bytes_available > 0:
+            self.portHandler.readPort(bytes_available)
+
     def regWriteTxRx(self, sts_id, address, length, data):
+        if self.response_levels.get(sts_id, RESPONSE_LEVEL_ALL) == RESPONSE_LEVEL_READ_ONLY:
+            result = self.regWriteTxOnly(sts_id, address, length, data)
+            self.waitStatusPacketSlot(sts_id)
+            return result, 0
+
         txpacket = [0] * (length + 7)
 
         txpacket[PKT_ID] = sts_id
@@ -476,16 +864,21 @@ class protocol_packet_handler(object):
         return result, error
 
     def syncReadTx(self, start_address, data_length, param, param_length):
-        txpacket = [0] * (param_length + 8)
-        # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN CHKSUM
+        if self.packet_cache_size > 0:
+            ids = tuple(param[0: param_length])
+            txpacket = self.getCompiledPacket((INST_SYNC_READ, ids, start_address, data_length), BROADCAST_ID,
+                                              INST_SYNC_READ, [start_address, data_length] + list(ids))
+        else:
+            txpacket = [0] * (param_length + 8)
+            # 8: HEADER0 HEADER1 ID LEN INST START_ADDR DATA_LEN CHKSUM
 
-        txpacket[PKT_ID] = BROADCAST_ID
-        txpacket[PKT_LENGTH] = param_length + 4  # 7: INST START_ADDR DATA_LEN CHKSUM
-        txpacket[PKT_INSTRUCTION] = INST_SYNC_READ
-        txpacket[PKT_PARAMETER0 + 0] = start_address
-        txpacket[PKT_PARAMETER0 + 1] = data_length
+            txpacket[PKT_ID] = BROADCAST_ID
+            txpacket[PKT_LENGTH] = param_length + 4  # 7: INST START_ADDR DATA_LEN CHKSUM
+            txpacket[PKT_INSTRUCTION] = INST_SYNC_READ
+            txpacket[PKT_PARAMETER0 + 0] = start_address
+            txpacket[PKT_PARAMETER0 + 1] = data_length
 
-        txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
+            txpacket[PKT_PARAMETER0 + 2: PKT_PARAMETER0 + 2 + param_length] = param[0: param_length]
 
         # print(txpacket)
         result = self.txPacket(txpacket)
@@ -496,9 +889,18 @@ class protocol_packet_handler(object):
         self.portHandler.setPacketTimeout(wait_length)
         rxpacket = []
         rx_length = 0
+
+        tracer = self.tracer
+        if tracer is not None:
+            t_wait = tracer.now()
+            t_first = None
+
         while True:
             rxpacket.extend(self.portHandler.readPort(wait_length - rx_length))
             rx_length = len(rxpacket)
+            if tracer is not None and t_first is None and rx_length > 0:
+                t_first = tracer.now()
+                tracer.add_span(TRACE_WAIT_FIRST_BYTE, t_wait, t_first)
             if rx_length >= wait_length:
                 result = COMM_SUCCESS
                 break
@@ -510,6 +912,10 @@ class protocol_packet_handler(object):
                     else:
                         result = COMM_RX_CORRUPT
                     break
+
+        if tracer is not None and t_first is not None:
+            tracer.add_span(TRACE_RECEIVE, t_first, tracer.now(), {"bytes": rx_length, "result": result})
+
         self.portHandler.is_using = False
         return result, rxpacket
 
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+
+# Description: provisioning of a fleet of servos (ID, mode, limits, ...) from a declarative spec.
+#
+# The spec lists buses (one adapter each) and, per bus, the motors with the EEPROM
+# settings they must end up with. For every motor the provisioner reads the whole EEPROM
+# table with one READ, applies the settings to a copy, and writes only the spans that
+# differ, plus the new ID if any, inside a single unlock/lock window. The written tables
+# are then verified with one SYNC_READ per bus. Buses are provisioned in parallel, one
+# thread per adapter, and every motor gets a line in the report.
+#
+# Spec (JSON, or YAML with PyYAML installed: pip install pyfeetech[yaml]):
+#   {
+#     "version": 1,
+#     "defaults": {"mode": 0, "torque_max": 1000},          # applied to every motor
+#     "buses": [
+#       {"name": "left", "port": "/dev/ttyACM0", "baudrate": 1000000,
+#        "motors": [
+#          {"name": "shoulder", "id": 1, "angle_min": 500, "angle_max": 3500},
+#          {"name": "elbow", "id": 2, "current_id": 1, "model": 777}]}   # factory ID 1 -> ID 2
+#     ]
+#   }
+# Settings: see PROVISIONING_SETTINGS. A motor is addressed at current_id (default: id).
+# With "model", servos of another model are not touched. A motor missing at current_id is
+# only looked for at id if the spec says it is already there ("provisioned": true) or gives
+# its model; otherwise whatever answers at id is left alone and the motor reported missing.
+#
+# usage:
+#   provisioner = FleetProvisioner.from_file("fleet.yaml")
+#   report = provisioner.run()                  # dry_run=True: plan only, nothing written
+#   print_provisioning_report(report)
+
+import json
+import threading
+from .stservo_def import *
+from .port_handler import *
+from .feetechsts import *
+from .group_sync_read import *
+from .eeprom_snapshot import *
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+FLEET_SPEC_VERSION = 1
+
+# setting -> (STS3215 address, length, limit name for RegisterMap.clamp)
+PROVISIONING_SETTINGS = {
+    "mode":                 (STS_MODE, 1, None),
+    "return_delay":         (STS_RETURN_DELAY, 1, None),
+    "angle_min":            (STS_MIN_ANGLE_LIMIT_L, 2, "angle"),
+    "angle_max":            (STS_MAX_ANGLE_LIMIT_L, 2, "angle"),
+    "torque_max":           (STS_MAX_TORQUE_LIMIT_L, 2, "torque"),
+    "force_startup_min":    (STS_MIN_STARTUP_FORCE_L, 2, None),
+}
+
+# motor status in the report
+PROVISION_OK        = "ok"          # written and verified
+PROVISION_UNCHANGED = "unchanged"   # already as specified, verified
+PROVISION_PLANNED   = "planned"     # dry run
+PROVISION_MISSING   = "missing"     # did not answer at current_id (nor at id, when accepted there)
+PROVISION_FAILED    = "failed"
+
+#
+# loads a fleet spec from a .json, .yaml or .yml file
+def load_fleet_spec(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise ImportError("YAML fleet specs require PyYAML: pip install pyyaml")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    validate_fleet_spec(spec)
+    return spec
+
+#
+# raises ValueError if the spec is not usable
+def validate_fleet_spec(spec):
+    if not isinstance(spec, dict) or spec.get("version") != FLEET_SPEC_VERSION:
+        raise ValueError(f"fleet spec: version must be {FLEET_SPEC_VERSION}")
+
+    for setting in spec.get("defaults", {}):
+        if setting not in PROVISIONING_SETTINGS:
+            raise ValueError(f"fleet spec: unknown setting in defaults: {setting}")
+
+    bus_names = set()
+    for bus in spec.get("buses", []):
+        name = bus.get("name", bus.get("port"))
+        if "port" not in bus:
+            raise ValueError(f"fleet spec: bus {name} has no port")
+        if name in bus_names:
+            raise ValueError(f"fleet spec: duplicated bus: {name}")
+        bus_names.add(name)
+
+        final_ids, current_ids = set(), set()
+        for motor in bus.get("motors", []):
+            if "id" not in motor:
+                raise ValueError(f"fleet spec: motor without id on bus {name}")
+            for key in motor:
+                if key not in PROVISIONING_SETTINGS and key not in ("name", "id", "current_id", "model", "provisioned"):
+                    raise ValueError(f"fleet spec: unknown setting {key} for ID {motor['id']} on bus {name}")
+            final_id, current_id = motor["id"], motor.get("current_id", motor["id"])
+            if not (0 <= final_id <= MAX_ID and 0 <= current_id <= MAX_ID):
+                raise ValueError(f"fleet spec: invalid ID for motor {motor.get('name', final_id)} on bus {name}")
+            if final_id in final_ids or current_id in current_ids:
+                raise ValueError(f"fleet spec: two motors with ID {final_id} / current ID {current_id} on bus {name}")
+            final_ids.add(final_id)
+            current_ids.add(current_id)
+
+#
+class FleetProvisioner(object):
+    #
+    # spec: fleet spec (see above); port_handlers: optional {bus name: PortHandler} used
+    # instead of opening the ports of the spec (e.g. EmulatedPortHandler)
+    def __init__(self, spec, port_handlers=None, verbose=False):
+        validate_fleet_spec(spec)
+        self.spec = spec
+        self.port_handlers = dict(port_handlers or {})
+        self.verbose = verbose
+
+    #
+    @classmethod
+    def from_file(cls, path, port_handlers=None, verbose=False):
+        return cls(load_fleet_spec(path), port_handlers, verbose)
+
+    #
+    # provisions all the buses in parallel; returns the report, one dict per motor:
+    # {bus, name, id, current_id, model, status, spans, transactions, mismatch, error}
+    def run(self, dry_run=False):
+        defaults = self.spec.get("defaults", {})
+        results = {}
+        threads = []
+        for bus_spec in self.spec.get("buses", []):
+            name = bus_spec.get("name", bus_spec["port"])
+            thread = threading.Thread(target=self._run_bus, name=f"pyfeetech-provision-{name}", daemon=True,
+                                      args=(name, bus_spec, defaults, dry_run, results))
+            threads.append(thread)
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return [entry for bus_spec in self.spec.get("buses", [])
+                for entry in results[bus_spec.get("name", bus_spec["port"])]]
+
+    #
+    def _run_bus(self, name, bus_spec, defaults, dry_run, results):
+        motors = bus_spec.get("motors", [])
+        report = [self._report_entry(name, motor) for motor in motors]
+        results[name] = report
+
+        portHandler = self.port_handlers.get(name)
+        if portHandler is None:
+            portHandler = PortHandler(bus_spec["port"])
+        baudrate = bus_spec.get("baudrate", DEFAULT_BAUDRATE)
+        try:
+            if not (portHandler.openPort() and portHandler.setBaudRate(baudrate)):
+                raise IOError(f"cannot open {bus_spec['port']} at {baudrate} bps")
+            bus = feetechsts(portHandler)
+            bus.set_verbose(self.verbose)
+
+            targets = {}
+            for motor, entry in zip(motors, report):
+                settings = dict(defaults)
+                settings.update({k: v for k, v in motor.items() if k in PROVISIONING_SETTINGS})
+                target = self._provision_motor(bus, motor, entry, settings, dry_run)
+                if target is not None:
+                    targets[entry["id"]] = (target, entry)
+
+            if targets and not dry_run:
+                self._verify(bus, targets)
+        except Exception as e:
+            for entry in report:
+                if entry["status"] is None:
+                    entry["status"] = PROVISION_FAILED
+                    entry["error"] = str(e)
+        finally:
+            if portHandler.is_open:
+                portHandler.closePort()
+
+    #
+    @staticmethod
+    def _report_entry(bus_name, motor):
+        return {
+            "bus":          bus_name,
+            "name":         motor.get("name"),
+            "id":           motor["id"],
+            "current_id":   motor.get("current_id", motor["id"]),
+            "model":        None,
+            "status":       None,
+            "spans":        [],         # [(address, length)] written
+            "transactions": 0,
+            "mismatch":     [],         # addresses that did not verify
+            "error":        None,
+        }
+
+    #
+    # plans and writes the settings of one motor; returns the expected EEPROM table, None on failure
+    def _provision_motor(self, bus, motor, entry, settings, dry_run):
+        current_id, final_id = entry["current_id"], entry["id"]
+
+        # missing motors are reported, not printed
+        live = bus.eeprom_snapshot(current_id, quiet=True)
+        entry["transactions"] += 1
+        if live is None and final_id != current_id:
+            if not motor.get("provisioned") and "model" not in motor:
+                entry["status"] = PROVISION_MISSING
+                return None
+
+            # moved to its new ID by a previous run (the model is checked below)
+            live = bus.eeprom_snapshot(final_id, quiet=True)
+            entry["transactions"] += 1
+            current_id = final_id
+        if live is None:
+            entry["status"] = PROVISION_MISSING
+            return None
+        entry["model"] = live.model
+        if "model" in motor and live.model != motor["model"]:
+            entry["status"] = PROVISION_FAILED
+            entry["error"] = f"ID {current_id} is a model {live.model}, not {motor['model']}"
+            return None
+
+        # expected table: live one with the settings applied
+        register_map = bus.getIdRegisterMap(current_id)
+        target = bytearray(live.data)
+        for setting, value in settings.items():
+            address, length, limit = PROVISIONING_SETTINGS[setting]
+            address = register_map.address(address)
+            if address is None:
+                entry["status"] = PROVISION_FAILED
+                entry["error"] = f"{setting} not available on {register_map.name}"
+                return None
+            if limit is not None:
+                value = bus.limit(current_id, limit, value)
+            i = address - live.start
+            if length == 1:
+                target[i] = value & 0xFF
+            else:
+                value = bus.sts_toscs(value, 15)
+                target[i] = bus.sts_lobyte(value, live.end)
+                target[i + 1] = bus.sts_hibyte(value, live.end)
+
+        spans = EepromSnapshot(current_id, live.model, target, live.start, live.end).diff(live.data)
+        entry["spans"] = [(address, len(data)) for address, data in spans]
+        target[STS_ID - live.start] = final_id
+        change_id = final_id != current_id
+
+        if not spans and not change_id:
+            entry["status"] = PROVISION_UNCHANGED if not dry_run else PROVISION_PLANNED
+            return bytes(target)
+        if dry_run:
+            entry["status"] = PROVISION_PLANNED
+            return bytes(target)
+
+        # the new ID must be free
+        if change_id:
+            _, sts_comm_result, _ = bus.ping(final_id)
+            entry["transactions"] += 1
+            if sts_comm_result == COMM_SUCCESS:
+                entry["status"] = PROVISION_FAILED
+                entry["error"] = f"ID {final_id} already in use"
+                return None
+
+        # one unlock/lock window: changed spans, then the ID
+        lock = bus.register(current_id, STS_LOCK)
+        bus.write1ByteTxRx(current_id, lock, 0)
+        entry["transactions"] += 1
+        for address, data in spans:
+            sts_comm_result, sts_error = bus.writeTxRx(current_id, address, len(data), list(data))
+            entry["transactions"] += 1
+            if sts_comm_result != COMM_SUCCESS or sts_error != 0:
+                entry["status"] = PROVISION_FAILED
+                entry["error"] = bus.getTxRxResult(sts_comm_result) if sts_comm_result != COMM_SUCCESS else bus.getRxPacketError(sts_error)
+                bus.write1ByteTxRx(current_id, lock, 1)
+                return None
+
+        if change_id:
+            # the status packet may come from either ID: let it go by
+            bus.write1ByteTxOnly(current_id, bus.register(current_id, STS_ID), final_id)
+            bus.waitStatusPacketSlot(current_id)
+            bus.discardRxPacket()
+            bus.setIdModel(final_id, live.model, live.end)
+            entry["transactions"] += 1
+
+        bus.write1ByteTxRx(final_id, lock, 1)
+        entry["transactions"] += 1
+        return bytes(target)
+
+    #
+    # reads back the EEPROM table of all the provisioned motors with one SYNC_READ
+    def _verify(self, bus, targets):
+        group = GroupSyncRead(bus, EEPROM_SNAPSHOT_START, EEPROM_SNAPSHOT_LENGTH)
+        for final_id in targets:
+            group.addParam(final_id)
+        group.txRxPacket()
+
+        for final_id, (target, entry) in targets.items():
+            entry["transactions"] += 1
+            available, _ = group.isAvailable(final_id, EEPROM_SNAPSHOT_START, EEPROM_SNAPSHOT_LENGTH)
+            if not available:
+                entry["status"] = PROVISION_FAILED
+                entry["error"] = f"ID {final_id} did not answer the verification"
+                continue
+
+            data = group.data_dict[final_id][1: EEPROM_SNAPSHOT_LENGTH + 1]
+            entry["mismatch"] = [EEPROM_SNAPSHOT_START + i for i in range(EEPROM_SNAPSHOT_LENGTH) if data[i] != target[i]]
+            if entry["mismatch"]:
+                entry["status"] = PROVISION_FAILED
+                entry["error"] = "verification failed"
+            elif entry["status"] is None:
+                entry["status"] = PROVISION_OK
+
+#
+def print_provisioning_report(report):
+    print(f"{'bus':<10} {'name':<14} {'ID':>4} {'from':>5} {'model':>6} {'status':<10} {'txn':>4}  spans / error")
+    for entry in report:
+        details = entry["error"] if entry["error"] else " ".join(f"{a}+{n}" for a, n in entry["spans"])
+        print(f"{entry['bus']:<10} {str(entry['name'] or '-'):<14} {entry['id']:>4} {entry['current_id']:>5} "
+              f"{str(entry['model'] or '-'):>6} {entry['status']:<10} {entry['transactions']:>4}  {details}")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+# Description: quarantine of motors that stopped answering, out of the sync read groups.
+#
+# A SYNC_READ waits for the status packets of every motor in the group: with one motor
+# unplugged, every cycle ends in a timeout and the control rate of the whole bus drops.
+# With a MotorQuarantine attached, sync_read_state (and PollingScheduler) leave out the
+# motors that missed miss_limit replies in a row, and report their last known state marked
+# "stale": True. On every cycle, at most one quarantined motor whose probe is due (every
+# probe_interval) is pinged with a short timeout, in the gap after the sync read. Motors
+# that answer go back into the group on the next cycle.
+#
+# usage:
+#   bus.set_quarantine(MotorQuarantine(miss_limit=3, probe_interval=0.5))
+#   states = bus.sync_read_state([1, 2, 3])     # {1: {...}, 2: {..., "stale": True}, 3: {...}}
+#   print(bus.quarantine.get_stats())
+
+import time
+from .stservo_def import *
+from .feetechsts import *
+
+QUARANTINE_MISS_LIMIT = 3               # consecutive missed replies before quarantine
+QUARANTINE_PROBE_INTERVAL = 0.5         # [s] between two probes of the same motor
+QUARANTINE_PROBE_LATENCY_MS = 2.0       # [ms] timeout slack of a probe (see setLatencyTimer)
+
+#
+class MotorQuarantine(object):
+    #
+    def __init__(self, miss_limit=QUARANTINE_MISS_LIMIT, probe_interval=QUARANTINE_PROBE_INTERVAL,
+                 probe_latency_ms=QUARANTINE_PROBE_LATENCY_MS):
+        self.miss_limit = miss_limit
+        self.probe_interval = probe_interval
+        self.probe_latency_ms = probe_latency_ms
+
+        self.misses = {}                # {motor_id: consecutive missed replies}
+        self.quarantined = {}           # {motor_id: time of the next probe [s]}
+        self.last_states = {}           # {motor_id: last state read}
+
+        self.quarantines = 0
+        self.releases = 0
+        self.probes = 0
+
+    #
+    # motor_ids that are not quarantined, in the same order
+    def active(self, motor_ids):
+        quarantined = self.quarantined
+        return [motor_id for motor_id in motor_ids if motor_id not in quarantined]
+
+    #
+    def is_quarantined(self, motor_id):
+        return motor_id in self.quarantined
+
+    #
+    # outcome of a read of motor_id: its state, None if it did not answer.
+    # Returns True if the motor has just been quarantined
+    def record(self, motor_id, state):
+        if state is not None:
+            self.misses[motor_id] = 0
+            self.last_states[motor_id] = state
+            return False
+
+        misses = self.misses.get(motor_id, 0) + 1
+        self.misses[motor_id] = misses
+        if misses >= self.miss_limit and motor_id not in self.quarantined:
+            self.quarantined[motor_id] = time.perf_counter() + self.probe_interval
+            self.quarantines += 1
+            return True
+        return False
+
+    #
+    # last state read from motor_id, marked stale; None if never read
+    def stale_state(self, motor_id):
+        state = self.last_states.get(motor_id)
+        if state is None:
+            return None
+        state = dict(state)
+        state["stale"] = True
+        return state
+
+    #
+    # puts motor_id back in the sync groups
+    def release(self, motor_id):
+        if self.quarantined.pop(motor_id, None) is not None:
+            self.misses[motor_id] = 0
+            self.releases += 1
+
+    #
+    # pings the quarantined motor with the most overdue probe, if any is due, with a short
+    # timeout; releases it if it answers. Returns the motor_id released, None otherwise
+    def probe(self, bus):
+        if not self.quarantined:
+            return None
+        now = time.perf_counter()
+        motor_id, due = min(self.quarantined.items(), key=lambda item: item[1])
+        if due > now:
+            return None
+
+        self.probes += 1
+        port = bus.portHandler
+        original_latency = port.getLatencyTimer()
+        port.setLatencyTimer(min(original_latency, self.probe_latency_ms))
+        try:
+            _, sts_comm_result, _ = bus.readTxRx(motor_id, STS_MODEL_L, 2)
+        finally:
+            port.setLatencyTimer(original_latency)
+
+        if sts_comm_result == COMM_SUCCESS:
+            self.release(motor_id)
+            return motor_id
+        self.quarantined[motor_id] = now + self.probe_interval
+        return None
+
+    #
+    def get_stats(self):
+        return {
+            "quarantined": sorted(self.quarantined),
+            "quarantines": self.quarantines,
+            "releases": self.releases,
+            "probes": self.probes,
+        }
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+
+# Description: time-to-live cache of slow-changing registers for protocol_packet_handler.readTxRx
+#
+# Getters of settings and slow measurements (mode, lock, angle limits, voltage, temperature, ...)
+# are often called at high rate from UI, safety and logging code, and each call costs a bus
+# round trip. With a cache attached, readTxRx serves a register from memory while its last
+# value is younger than the register's TTL. The cache is filled by every read that returns the
+# register: READs (getters, EEPROM snapshots) and SYNC_READs (sync_read_state, polling, ...).
+# Every WRITE, REG_WRITE and SYNC_WRITE sent drops the registers it touches, so a getter
+# never returns a value older than the last write. Registers without a TTL (present position,
+# status, model number, ...) are always read from the bus. TTLs are set on the STS memory
+# table and applied through the register map of every ID (e.g. lock at 48 on SCS), and a hit
+# returns the servo error byte of the read that filled it.
+#
+# usage:
+#   bus.setRegisterCache(RegisterCache())                   # DEFAULT_REGISTER_TTLS
+#   bus.getRegisterCache().setTtl(STS_PRESENT_LOAD_L, 0.05, 2)
+#   ... bus.get_temperature(1) ...                          # at most one READ per second
+#   print(bus.getRegisterCache().getStats())
+
+import time
+from .stservo_def import *
+
+# default TTLs [s] by address, on the STS memory table. Model number, ID and baudrate (3 .. 6)
+# are not cached: reads of them are used to probe whether a servo answers
+DEFAULT_REGISTER_TTLS = {}
+DEFAULT_REGISTER_TTLS.update({address: 10.0 for address in range(7, 35)})   # EEPROM settings
+DEFAULT_REGISTER_TTLS.update({
+    40: 0.5,        # torque enable
+    48: 0.5,        # torque limit (lowered by the overload protection)
+    49: 0.5,
+    55: 10.0,       # lock
+    62: 1.0,        # present voltage
+    63: 1.0,        # present temperature
+})
+
+# writes to these registers (ID, baudrate) move the servo away: all of its entries are dropped
+REGISTER_CACHE_CLEAR_ON_WRITE = (5, 6)
+
+#
+class RegisterCache(object):
+    #
+    # ttls: {address: time to live [s]}, addresses not in it are never cached
+    def __init__(self, ttls=None):
+        self.ttls = dict(DEFAULT_REGISTER_TTLS if ttls is None else ttls)
+        self.model_ttls = {}            # {RegisterMap: {address on the model: ttl [s]}}
+        self.entries = {}               # {sts_id: {address: (timestamp [s], value, servo error)}}
+
+        self.resetStats()
+
+    #
+    def resetStats(self):
+        self.hits = 0                   # reads served from the cache
+        self.misses = 0                 # reads of cached registers that went to the bus
+        self.fills = 0                  # bytes stored
+        self.invalidations = 0          # bytes dropped by writes
+
+    #
+    # ttl [s] of the registers address .. address + length - 1 (STS table); 0 or None: never cached
+    def setTtl(self, address, ttl, length=1):
+        self.model_ttls.clear()
+        for a in range(address, address + length):
+            if ttl:
+                self.ttls[a] = ttl
+            else:
+                self.ttls.pop(a, None)
+                for entries in self.entries.values():
+                    entries.pop(a, None)
+
+    #
+    def getTtl(self, address):
+        return self.ttls.get(address)
+
+    #
+    # {address on the model: ttl [s]} of register_map (None: the STS table)
+    def getModelTtls(self, register_map=None):
+        if register_map is None:
+            return self.ttls
+        ttls = self.model_ttls.get(register_map)
+        if ttls is None:
+            ttls = {}
+            for address, ttl in self.ttls.items():
+                model_address = register_map.address(address)
+                if model_address is not None:
+                    ttls[model_address] = ttl
+            self.model_ttls[register_map] = ttls
+        return ttls
+
+    #
+    # (cached bytes of address .. address + length - 1, servo error byte of the latest read
+    # among them), None if any of them is not cached or expired.
+    # address: on the model; register_map: of the model of sts_id (None: STS)
+    def lookup(self, sts_id, address, length, register_map=None):
+        ttls = self.getModelTtls(register_map)
+        for a in range(address, address + length):
+            if a not in ttls:
+                return None         # not a cached register: not a miss either
+
+        entries = self.entries.get(sts_id)
+        now = time.monotonic()
+        data = []
+        latest = None
+        for a in range(address, address + length):
+            entry = entries.get(a) if entries is not None else None
+            if entry is None or now - entry[0] > ttls[a]:
+                self.misses += 1
+                return None
+            data.append(entry[1])
+            if latest is None or entry[0] > latest[0]:
+                latest = entry
+
+        self.hits += 1
+        return data, latest[2]
+
+    #
+    # records the bytes read from address on sts_id, and the servo error byte of the read
+    def store(self, sts_id, address, data, error=0, register_map=None):
+        ttls = self.getModelTtls(register_map)
+        now = None
+        for i, value in enumerate(data):
+            if address + i in ttls:
+                if now is None:
+                    now = time.monotonic()
+                    entries = self.entries.setdefault(sts_id, {})
+                entries[address + i] = (now, value, error)
+                self.fills += 1
+
+    #
+    # drops the entries of sts_id (all IDs if None), at address .. address + length - 1 (all if None)
+    def invalidate(self, sts_id=None, address=None, length=1):
+        for entries_id in ([sts_id] if sts_id is not None else list(self.entries)):
+            entries = self.entries.get(entries_id)
+            if not entries:
+                continue
+            if address is None:
+                self.invalidations += len(entries)
+                del self.entries[entries_id]
+                continue
+            for a in range(address, address + length):
+                if entries.pop(a, None) is not None:
+                    self.invalidations += 1
+
+    #
+    # drops the registers written by an instruction packet (WRITE, REG_WRITE, SYNC_WRITE)
+    # packet: 0xFF 0xFF ID LENGTH INSTRUCTION PARAMETERS... CHECKSUM
+    def invalidatePacket(self, txpacket):
+        instruction = txpacket[4]
+        if instruction in (INST_WRITE, INST_REG_WRITE):
+            sts_id = txpacket[2]
+            targets = [(None if sts_id == BROADCAST_ID else sts_id, txpacket[5], txpacket[3] - 3)]
+        elif instruction == INST_SYNC_WRITE:
+            # parameters: START_ADDRESS DATA_LENGTH, then ID DATA... per servo
+            address, length = txpacket[5], txpacket[6]
+            targets = [(txpacket[i], address, length) for i in range(7, 3 + txpacket[3], length + 1)]
+        else:
+            return
+
+        for sts_id, address, length in targets:
+            if any(address <= a < address + length for a in REGISTER_CACHE_CLEAR_ON_WRITE):
+                self.invalidate(sts_id)
+            else:
+                self.invalidate(sts_id, address, length)
+
+    #
+    def clear(self):
+        self.entries.clear()
+
+    #
+    def getStats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "fills": self.fills,
+            "invalidations": self.invalidations,
+            "entries": sum(len(entries) for entries in self.entries.values()),
+        }
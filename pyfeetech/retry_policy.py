@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+# Description: bounded, deadline-aware retry policy for protocol_packet_handler.txRxPacket
+#
+# usage:
+#   bus.setRetryPolicy(RetryPolicy(max_attempts=3, deadline_ms=4.0))
+#   # optionally, bound all retries of a control cycle to its time slot:
+#   bus.setCycleDeadline(5.0)   # [ms] from now
+#   ... reads/writes of the cycle ...
+#   bus.clearCycleDeadline()
+#   print(bus.getRetryPolicy().getStats())
+#
+# Only instructions that are safe to send twice are retried (PING, READ, SYNC_READ by
+# default): a WRITE whose status packet was lost has most likely been executed already.
+# Writes can be added with retry_instructions; writes to the ID register or of commands
+# in UNVERIFIED_WRITES are never retried.
+
+from .stservo_def import *
+
+RETRY_INSTRUCTIONS = (INST_PING, INST_READ, INST_SYNC_READ)     # idempotent instructions
+
+#
+class RetryPolicy(object):
+    #
+    # max_attempts: total number of attempts per call (1 = no retries)
+    # retry_on:     communication results that trigger a retry
+    # deadline_ms:  time budget of a single call, including its retries (None = no budget)
+    # retry_instructions: instructions that may be sent again
+    def __init__(self, max_attempts=3, retry_on=(COMM_RX_TIMEOUT, COMM_RX_CORRUPT), deadline_ms=None,
+                 retry_instructions=RETRY_INSTRUCTIONS):
+        self.max_attempts = max(1, int(max_attempts))
+        self.retry_on = set(retry_on)
+        self.retry_instructions = set(retry_instructions)
+        self.deadline_ms = deadline_ms
+
+        self.resetStats()
+
+    #
+    def resetStats(self):
+        self.calls = 0                  # calls to txRxPacket
+        self.retries = 0                # extra attempts made
+        self.recovered = 0              # calls that succeeded after at least one retry
+        self.exhausted = 0              # calls that failed after max_attempts
+        self.deadline_aborts = 0        # retries skipped since they would miss the deadline
+        self.not_retryable = 0          # failed calls of instructions that are not retried
+        self.retries_by_result = {}     # {result that triggered the retry: count}
+        self.retries_by_id = {}         # {servo id: count}
+
+    #
+    def shouldRetry(self, result):
+        return result in self.retry_on
+
+    #
+    def retriesInstruction(self, instruction):
+        return instruction in self.retry_instructions
+
+    #
+    def countRetry(self, sts_id, result):
+        self.retries += 1
+        self.retries_by_result[result] = self.retries_by_result.get(result, 0) + 1
+        self.retries_by_id[sts_id] = self.retries_by_id.get(sts_id, 0) + 1
+
+    #
+    def getStats(self):
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "exhausted": self.exhausted,
+            "deadline_aborts": self.deadline_aborts,
+            "not_retryable": self.not_retryable,
+            "retries_by_result": dict(self.retries_by_result),
+            "retries_by_id": dict(self.retries_by_id),
+        }
@@ -3,6 +3,7 @@
 from .stservo_def import *
 from .protocol_packet_handler import *
 from .group_sync_write import *
+from .group_sync_read import *
 
 #波特率定义
 SCSCL_1M = 0
@@ -21,6 +22,7 @@ SCSCL_MODEL_H = 4
 
 #-------EPROM(读写)--------
 scs_id = 5
+SCSCL_ID = 5
 SCSCL_BAUD_RATE = 6
 SCSCL_MIN_ANGLE_LIMIT_L = 9
 SCSCL_MIN_ANGLE_LIMIT_H = 10
@@ -52,13 +54,19 @@ SCSCL_MOVING = 66
 SCSCL_PRESENT_CURRENT_L = 69
 SCSCL_PRESENT_CURRENT_H = 70
 
+#-------state block: present position ... present current, one READ / SYNC_READ--------
+SCSCL_STATE_START = SCSCL_PRESENT_POSITION_L
+SCSCL_STATE_LENGTH = SCSCL_PRESENT_CURRENT_H + 1 - SCSCL_PRESENT_POSITION_L
+
 class scscl(protocol_packet_handler):
     def __init__(self, portHandler):
         protocol_packet_handler.__init__(self, portHandler, 1)
         self.groupSyncWrite = GroupSyncWrite(self, SCSCL_GOAL_POSITION_L, 6)
+        self.groupSyncReadState = GroupSyncRead(self, SCSCL_STATE_START, SCSCL_STATE_LENGTH)
 
     def WritePos(self, scs_id, position, time, speed):
-        txpacket = [self.scs_lobyte(position), self.scs_hibyte(position), self.scs_lobyte(time), self.scs_hibyte(time), self.scs_lobyte(speed), self.scs_hibyte(speed)]
+        end = self.getIdEnd(scs_id)
+        txpacket = [self.scs_lobyte(position, end), self.scs_hibyte(position, end), self.scs_lobyte(time, end), self.scs_hibyte(time, end), self.scs_lobyte(speed, end), self.scs_hibyte(speed, end)]
         return self.writeTxRx(scs_id, SCSCL_GOAL_POSITION_L, len(txpacket), txpacket)
 
     def ReadPos(self, scs_id):
@@ -80,11 +88,13 @@ class scscl(protocol_packet_handler):
         return moving, scs_comm_result, scs_error
 
     def SyncWritePos(self, scs_id, position, time, speed):
-        txpacket = [self.scs_lobyte(position), self.scs_hibyte(position), self.scs_lobyte(time), self.scs_hibyte(time), self.scs_lobyte(speed), self.scs_hibyte(speed)]
+        end = self.getIdEnd(scs_id)
+        txpacket = [self.scs_lobyte(position, end), self.scs_hibyte(position, end), self.scs_lobyte(time, end), self.scs_hibyte(time, end), self.scs_lobyte(speed, end), self.scs_hibyte(speed, end)]
         return self.groupSyncWrite.addParam(scs_id, txpacket)
 
     def RegWritePos(self, scs_id, position, time, speed):
-        txpacket = [self.scs_lobyte(position), self.scs_hibyte(position), self.scs_lobyte(time), self.scs_hibyte(time), self.scs_lobyte(speed), self.scs_hibyte(speed)]
+        end = self.getIdEnd(scs_id)
+        txpacket = [self.scs_lobyte(position, end), self.scs_hibyte(position, end), self.scs_lobyte(time, end), self.scs_hibyte(time, end), self.scs_lobyte(speed, end), self.scs_hibyte(speed, end)]
         return self.regWriteTxRx(scs_id, SCSCL_GOAL_POSITION_L, len(txpacket), txpacket)
 
     def RegAction(self):
@@ -102,3 +112,62 @@ class scscl(protocol_packet_handler):
 
     def unLockEprom(self, scs_id):
         return self.write1ByteTxRx(scs_id, SCSCL_LOCK, 0)
+
+    def ReadState(self, scs_id):
+        data, scs_comm_result, scs_error = self.readTxRx(scs_id, SCSCL_STATE_START, SCSCL_STATE_LENGTH)
+        state = self.DecodeState(data, 0, self.getIdEnd(scs_id)) if scs_comm_result == COMM_SUCCESS else None
+        return state, scs_comm_result, scs_error
+
+    def DecodeState(self, data, offset=0, end=None):
+        o = offset - SCSCL_STATE_START
+        return {
+            "position": self.scs_makeword(data[o + SCSCL_PRESENT_POSITION_L], data[o + SCSCL_PRESENT_POSITION_H], end),
+            "speed": self.scs_tohost(self.scs_makeword(data[o + SCSCL_PRESENT_SPEED_L], data[o + SCSCL_PRESENT_SPEED_H], end), 15),
+            "load": self.scs_tohost(self.scs_makeword(data[o + SCSCL_PRESENT_LOAD_L], data[o + SCSCL_PRESENT_LOAD_H], end), 10),
+            "voltage": data[o + SCSCL_PRESENT_VOLTAGE],
+            "temperature": data[o + SCSCL_PRESENT_TEMPERATURE],
+            "moving": data[o + SCSCL_MOVING],
+            "current": self.scs_tohost(self.scs_makeword(data[o + SCSCL_PRESENT_CURRENT_L], data[o + SCSCL_PRESENT_CURRENT_H], end), 15),
+        }
+
+    def SyncReadState(self, scs_ids):
+        # {scs_id: state}, state is None if the servo did not answer
+        group = self.groupSyncReadState
+        for scs_id in [i for i in group.data_dict if i not in scs_ids]:
+            group.removeParam(scs_id)
+        for scs_id in scs_ids:
+            group.addParam(scs_id)
+
+        scs_comm_result = group.txRxPacket()
+
+        states = {}
+        for scs_id in scs_ids:
+            available, _ = group.isAvailable(scs_id, SCSCL_STATE_START, SCSCL_STATE_LENGTH)
+            states[scs_id] = self.DecodeState(group.data_dict[scs_id], 1, self.getIdEnd(scs_id)) if available else None
+        return states, scs_comm_result
+
+    def SyncWriteGoals(self, goals):
+        # goals: {scs_id: (position, time, speed)}, sent with one SYNC_WRITE
+        self.groupSyncWrite.clearParam()
+        for scs_id, (position, time, speed) in goals.items():
+            self.SyncWritePos(scs_id, position, time, speed)
+        return self.groupSyncWrite.txPacket()
+
+    def StageGoals(self, goals, acknowledge=False):
+        # goals: {scs_id: (position, time, speed)}, staged with REG_WRITE, started by RegAction()
+        # returns {scs_id: scs_comm_result} of the servos that could not be staged
+        failed = {}
+        for scs_id, (position, time, speed) in goals.items():
+            end = self.getIdEnd(scs_id)
+            txpacket = [self.scs_lobyte(position, end), self.scs_hibyte(position, end), self.scs_lobyte(time, end), self.scs_hibyte(time, end), self.scs_lobyte(speed, end), self.scs_hibyte(speed, end)]
+            if acknowledge:
+                scs_comm_result, _ = self.regWriteTxRx(scs_id, SCSCL_GOAL_POSITION_L, len(txpacket), txpacket)
+            else:
+                scs_comm_result = self.regWriteTxOnly(scs_id, SCSCL_GOAL_POSITION_L, len(txpacket), txpacket)
+                self.waitStatusPacketSlot(scs_id)
+            if scs_comm_result != COMM_SUCCESS:
+                failed[scs_id] = scs_comm_result
+
+        if not acknowledge:
+            self.discardRxPacket()
+        return failed
@@ -4,6 +4,13 @@ BROADCAST_ID = 0xFE  # 254
 MAX_ID = 0xFC  # 252
 STS_END = 0
 
+# servo series (first byte of the model number, address 3) -> byte order (STS/SMS=0, SCS=1)
+MODEL_SERIES_END = {
+    9: 0,   # STS
+    8: 0,   # SMS
+    5: 1,   # SCS
+}
+
 # Instruction for STS Protocol
 INST_PING = 1
 INST_READ = 2
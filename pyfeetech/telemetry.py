@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+
+# Description: publish/subscribe telemetry of the states read by a polling loop.
+#
+# The loop that already reads the motors (BusManager.cycle, PollingScheduler.poll, or any
+# loop calling publish() with the states it read) hands them to a TelemetryHub, which
+# derives events without any extra bus read:
+#   state       every state update (only built when someone subscribed to it)
+#   status      a status bit set or cleared (overload, angle, current, temperature, voltage)
+#   threshold   a field (temperature, current, ...) went above a limit, or back below it
+#   dropped     a motor missed drop_after reads in a row (a "stale" state, as reported for
+#               quarantined motors, counts as a missed read)
+#   recovered   a dropped motor answered again
+# Subscribers get events through a bounded queue (TelemetrySubscription) or a callback.
+# Publishing never blocks: a full queue drops its oldest event and counts it, and callbacks
+# run in the publishing thread, so they must be short (exceptions are caught and counted).
+#
+# usage:
+#   hub = TelemetryHub()
+#   hub.add_threshold("temperature", 60, hysteresis=5)
+#   alarms = hub.subscribe(kinds=(TELEMETRY_STATUS, TELEMETRY_THRESHOLD, TELEMETRY_DROPPED))
+#   manager.set_telemetry(hub)                  # or poller.set_telemetry(hub)
+#   ...
+#   for event in alarms.get_all(): print(event)
+
+import time
+import queue
+import threading
+from collections import namedtuple
+
+TELEMETRY_STATE     = "state"
+TELEMETRY_STATUS    = "status"
+TELEMETRY_THRESHOLD = "threshold"
+TELEMETRY_DROPPED   = "dropped"
+TELEMETRY_RECOVERED = "recovered"
+
+# status register bits, as feetechsts.print_status
+TELEMETRY_STATUS_BITS = {0: "overload", 1: "angle", 2: "current", 3: "temperature", 4: "voltage"}
+
+TELEMETRY_QUEUE_SIZE = 1000
+TELEMETRY_DROP_AFTER = 3
+
+# motor: ID, or name for BusManager; timestamp [s] (time.time()); data: state for state
+# events, {"bit", "name", "set"} for status, {"field", "value", "limit", "above"} for
+# threshold, {"missed"} for dropped, None for recovered
+TelemetryEvent = namedtuple("TelemetryEvent", "kind motor timestamp data")
+
+#
+class TelemetrySubscription(object):
+    #
+    def __init__(self, kinds=None, motors=None, maxsize=TELEMETRY_QUEUE_SIZE, callback=None):
+        self.kinds = frozenset(kinds) if kinds is not None else None
+        self.motors = frozenset(motors) if motors is not None else None
+        self.callback = callback
+        self.queue = queue.Queue(maxsize) if callback is None else None
+        self.delivered = 0
+        self.dropped = 0                # events lost to a full queue
+        self.errors = 0                 # exceptions raised by the callback
+
+    #
+    def wants(self, kind, motor):
+        return (self.kinds is None or kind in self.kinds) and (self.motors is None or motor in self.motors)
+
+    #
+    # called by the publisher: never blocks
+    def deliver(self, event):
+        if self.callback is not None:
+            try:
+                self.callback(event)
+            except Exception:
+                self.errors += 1
+                return
+            self.delivered += 1
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                self.delivered += 1
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()     # keep the freshest events
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    #
+    # next event, None if there is none within timeout [s] (None: wait forever, 0: do not wait)
+    def get(self, timeout=None):
+        try:
+            return self.queue.get(timeout != 0, timeout if timeout else None)
+        except queue.Empty:
+            return None
+
+    #
+    # all the queued events, without waiting
+    def get_all(self):
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except queue.Empty:
+                return events
+
+#
+class TelemetryHub(object):
+    #
+    # drop_after: consecutive missed reads before a motor is reported as dropped
+    def __init__(self, drop_after=TELEMETRY_DROP_AFTER):
+        self.drop_after = drop_after
+        self.subscriptions = ()         # replaced, never modified: publish() iterates without lock
+        self.lock = threading.Lock()
+        self.thresholds = []            # [[field, limit, hysteresis]]
+
+        self.last_status = {}           # {motor: status byte}
+        self.above = {}                 # {(motor, field, limit): bool}
+        self.missed = {}                # {motor: consecutive missed reads}
+        self.dropped_motors = set()
+        self.published = 0              # states published
+
+    # ----- subscriptions
+    #
+    # kinds, motors: events delivered (None: all); maxsize: queue length
+    def subscribe(self, kinds=None, motors=None, maxsize=TELEMETRY_QUEUE_SIZE):
+        return self._add(TelemetrySubscription(kinds, motors, maxsize))
+
+    #
+    # callback(event) runs in the publishing (I/O) thread: it must return quickly
+    def subscribe_callback(self, callback, kinds=None, motors=None):
+        return self._add(TelemetrySubscription(kinds, motors, callback=callback))
+
+    #
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+
+    #
+    def _add(self, subscription):
+        with self.lock:
+            self.subscriptions = self.subscriptions + (subscription,)
+        return subscription
+
+    #
+    # event when field goes above limit, and when it goes back to limit - hysteresis or below
+    def add_threshold(self, field, limit, hysteresis=0):
+        with self.lock:
+            self.thresholds = self.thresholds + [(field, limit, hysteresis)]
+
+    # ----- publishing
+    #
+    # states: {motor: state dict (as feetechsts.decode_state, any subset of its fields) or
+    # None if the motor did not answer}, states with "stale": True were not read (see
+    # quarantine.py); timestamp [s] of the read (default: now)
+    def publish(self, states, timestamp=None):
+        subscriptions = self.subscriptions
+        if timestamp is None:
+            timestamp = time.time()
+        wants_state = any(s.kinds is None or TELEMETRY_STATE in s.kinds for s in subscriptions)
+
+        for motor, state in states.items():
+            events = []
+            if state is None or state.get("stale"):
+                missed = self.missed.get(motor, 0) + 1
+                self.missed[motor] = missed
+                if missed >= self.drop_after and motor not in self.dropped_motors:
+                    self.dropped_motors.add(motor)
+                    events.append(TelemetryEvent(TELEMETRY_DROPPED, motor, timestamp, {"missed": missed}))
+            else:
+                self.published += 1
+                self.missed[motor] = 0
+                if motor in self.dropped_motors:
+                    self.dropped_motors.discard(motor)
+                    events.append(TelemetryEvent(TELEMETRY_RECOVERED, motor, timestamp, None))
+                if wants_state:
+                    events.append(TelemetryEvent(TELEMETRY_STATE, motor, timestamp, state))
+                self._derive(motor, state, timestamp, events)
+
+            for event in events:
+                for subscription in subscriptions:
+                    if subscription.wants(event.kind, motor):
+                        subscription.deliver(event)
+
+    #
+    def _derive(self, motor, state, timestamp, events):
+        status = state.get("status")
+        if status is not None:
+            previous = self.last_status.get(motor, 0)
+            self.last_status[motor] = status
+            changed = status ^ previous
+            if changed:
+                for bit, name in TELEMETRY_STATUS_BITS.items():
+                    if changed & (1 << bit):
+                        events.append(TelemetryEvent(TELEMETRY_STATUS, motor, timestamp,
+                                                     {"bit": bit, "name": name, "set": bool(status & (1 << bit))}))
+
+        for field, limit, hysteresis in self.thresholds:
+            value = state.get(field)
+            if value is None:
+                continue
+            key = (motor, field, limit)
+            above = self.above.get(key, False)
+            if not above and value > limit:
+                self.above[key] = True
+            elif above and value <= limit - hysteresis:
+                self.above[key] = False
+            else:
+                continue
+            events.append(TelemetryEvent(TELEMETRY_THRESHOLD, motor, timestamp,
+                                         {"field": field, "value": value, "limit": limit, "above": self.above[key]}))
+
+    #
+    def get_stats(self):
+        return {
+            "published": self.published,
+            "dropped_motors": sorted(self.dropped_motors, key=str),
+            "subscriptions": [{"kinds": sorted(s.kinds) if s.kinds is not None else None,
+                               "delivered": s.delivered, "dropped": s.dropped, "errors": s.errors}
+                              for s in self.subscriptions],
+        }
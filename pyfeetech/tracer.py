@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+# Description: timestamped spans for bus transactions, exportable as
+# Chrome trace JSON (open it in https://ui.perfetto.dev or chrome://tracing).
+#
+# usage:
+#   tracer = Tracer()
+#   bus.setTracer(tracer)          # protocol handler (feetechsts, scscl, ...)
+#   ... run some cycles ...
+#   tracer.export_chrome_trace("cycle.json")
+#
+# when no tracer is attached, the hooks in the packet handler and in the group
+# classes reduce to a single "is not None" check.
+
+import os
+import json
+import time
+import threading
+from collections import deque
+
+# span names used by the packet handler and by the group classes
+TRACE_ENCODE            = "encode"
+TRACE_WRITE             = "write"
+TRACE_WAIT_FIRST_BYTE   = "wait_first_byte"
+TRACE_RECEIVE           = "receive"
+TRACE_DECODE            = "decode"
+TRACE_TXRX              = "txrx"
+TRACE_SYNC_READ         = "sync_read"
+TRACE_SYNC_WRITE        = "sync_write"
+
+#
+class Tracer(object):
+    #
+    def __init__(self, max_events=100000, category="pyfeetech"):
+        self.enabled = True
+        self.category = category
+        self.events = deque(maxlen=max_events)
+        self.pid = os.getpid()
+        self.t0 = time.perf_counter()
+
+    #
+    def now(self):
+        return time.perf_counter()
+
+    #
+    def add_span(self, name, start, end, args=None):
+        if not self.enabled:
+            return
+        self.events.append((name, start, end, threading.get_ident(), args))
+
+    #
+    def add_instant(self, name, args=None):
+        t = self.now()
+        self.add_span(name, t, None, args)
+
+    #
+    def clear(self):
+        self.events.clear()
+        self.t0 = time.perf_counter()
+
+    #
+    def get_spans(self, name=None):
+        # list of (name, start [s], duration [s], args); instants are skipped
+        return [(n, s, e - s, a) for (n, s, e, _, a) in self.events
+                if e is not None and (name is None or n == name)]
+
+    #
+    def summary(self):
+        # {span name: (count, total [ms], mean [ms], max [ms])}
+        acc = {}
+        for (name, _, duration, _) in self.get_spans():
+            count, total, longest = acc.get(name, (0, 0.0, 0.0))
+            acc[name] = (count + 1, total + duration, max(longest, duration))
+
+        return {name: (count, total * 1000.0, total * 1000.0 / count, longest * 1000.0)
+                for name, (count, total, longest) in acc.items()}
+
+    #
+    def to_chrome_trace(self):
+        trace_events = []
+        for (name, start, end, tid, args) in self.events:
+            event = {
+                "name": name,
+                "cat": self.category,
+                "pid": self.pid,
+                "tid": tid,
+                "ts": (start - self.t0) * 1e6,  # [us]
+            }
+            if end is None:
+                event["ph"] = "i"
+                event["s"] = "t"
+            else:
+                event["ph"] = "X"
+                event["dur"] = (end - start) * 1e6
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    #
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+# Description: streaming of multi-joint trajectories over SYNC_WRITE.
+#
+# A trajectory is a time-indexed table of goal positions, shape (T, N) for N motors,
+# sampled at sample_rate [Hz], with optional goal speeds of the same shape. It can be a
+# list of rows or a NumPy array. The player streams it at rate_hz (default: sample_rate),
+# interpolating linearly between samples when the two rates differ. The SYNC_WRITE
+# parameters of the next cycles are encoded ahead of time in a small lookahead buffer,
+# so sending a cycle is a single packet. Present positions are read back with one
+# SYNC_READ per cycle to report the tracking error.
+#
+# usage:
+#   player = TrajectoryPlayer(bus, [1, 2, 3], positions, sample_rate=50.0, rate_hz=100.0)
+#   player.play()
+#   print(player.tracking_error())
+
+import math
+import time
+from collections import deque
+from .stservo_def import *
+from .group_sync_read import *
+from .feetechsts import *
+
+#
+class TrajectoryPlayer(object):
+    #
+    # bus:            feetechsts
+    # motor_ids:      N motor IDs, one per trajectory column
+    # positions:      (T, N) goal positions
+    # sample_rate:    [Hz] rate of the trajectory samples
+    # speeds:         optional (T, N) goal speeds
+    # rate_hz:        [Hz] streaming rate (default: sample_rate)
+    # lookahead:      number of cycles encoded ahead of time
+    # feedback_every: read present positions every n cycles (0: never)
+    def __init__(self, bus, motor_ids, positions, sample_rate, speeds=None, rate_hz=None, lookahead=4, feedback_every=1):
+        self.bus = bus
+        self.motor_ids = list(motor_ids)
+        self.positions = self._rows(positions)
+        self.speeds = self._rows(speeds) if speeds is not None else None
+        self.sample_rate = float(sample_rate)
+        self.rate_hz = float(rate_hz) if rate_hz is not None else self.sample_rate
+        self.lookahead = max(1, lookahead)
+        self.feedback_every = feedback_every
+
+        if any(len(row) != len(self.motor_ids) for row in self.positions):
+            raise ValueError("every trajectory sample needs one position per motor")
+        if self.speeds is not None and len(self.speeds) != len(self.positions):
+            raise ValueError("positions and speeds need the same number of samples")
+
+        # goal position (2 bytes), or goal position + goal time (unused) + goal speed (6 bytes)
+        self.data_length = 2 if self.speeds is None else 6
+        self.duration = (len(self.positions) - 1) / self.sample_rate
+        self.cycles = int(math.floor(self.duration * self.rate_hz + 1e-9)) + 1
+
+        self.groupSyncRead = GroupSyncRead(bus, STS_PRESENT_POSITION_L, 2)
+        for motor_id in self.motor_ids:
+            self.groupSyncRead.addParam(motor_id)
+
+        self.reset()
+
+    #
+    @staticmethod
+    def _rows(table):
+        if hasattr(table, "tolist"):  # numpy array
+            table = table.tolist()
+        return [list(row) for row in table]
+
+    #
+    def reset(self):
+        self.cycle = 0
+        self.buffer = deque()
+        self.errors = []        # [(t [s], [commanded - present, or None per motor])]
+        self.overruns = 0       # cycles that started late
+
+    #
+    # interpolated (positions, speeds) at time t [s]; speeds is None without a speed table
+    def sample(self, t):
+        x = min(max(t * self.sample_rate, 0.0), len(self.positions) - 1)
+        i = int(x)
+        j = min(i + 1, len(self.positions) - 1)
+        a = x - i
+
+        positions = [round(p0 + (p1 - p0) * a) for p0, p1 in zip(self.positions[i], self.positions[j])]
+        speeds = None
+        if self.speeds is not None:
+            speeds = [round(v0 + (v1 - v0) * a) for v0, v1 in zip(self.speeds[i], self.speeds[j])]
+        return positions, speeds
+
+    #
+    # SYNC_WRITE parameters of a cycle: [ID, data...] for every motor
+    def encode(self, positions, speeds):
+        bus = self.bus
+        param = []
+        for k, motor_id in enumerate(self.motor_ids):
+            end = bus.getIdEnd(motor_id)
+            temp_position = bus.sts_toscs(positions[k], bus.getIdRegisterMap(motor_id).sign_bit(STS_GOAL_POSITION_L))
+            param.append(motor_id)
+            param.append(bus.sts_lobyte(temp_position, end))
+            param.append(bus.sts_hibyte(temp_position, end))
+            if speeds is not None:
+                temp_speed = bus.sts_toscs(speeds[k], 15)
+                param.extend([0, 0, bus.sts_lobyte(temp_speed, end), bus.sts_hibyte(temp_speed, end)])
+        return param
+
+    #
+    def _fill_buffer(self):
+        next_cycle = self.cycle + len(self.buffer)
+        while len(self.buffer) < self.lookahead and next_cycle < self.cycles:
+            positions, speeds = self.sample(next_cycle / self.rate_hz)
+            self.buffer.append((positions, self.encode(positions, speeds)))
+            next_cycle += 1
+
+    #
+    # sends the next cycle (and reads the feedback); returns False once the trajectory is over
+    def step(self):
+        if self.cycle >= self.cycles:
+            return False
+
+        self._fill_buffer()
+        positions, param = self.buffer.popleft()
+        self.bus.syncWriteTxOnly(STS_GOAL_POSITION_L, self.data_length, param, len(param))
+
+        if self.feedback_every and self.cycle % self.feedback_every == 0:
+            self._read_feedback(positions)
+
+        self.cycle += 1
+        self._fill_buffer()
+        return True
+
+    #
+    # present positions in the byte order and with the sign bit of every motor's register map
+    def _read_feedback(self, positions):
+        bus = self.bus
+        group = self.groupSyncRead
+        group.txRxPacket()
+
+        errors = []
+        for k, motor_id in enumerate(self.motor_ids):
+            available, _ = group.isAvailable(motor_id, STS_PRESENT_POSITION_L, 2)
+            if available:
+                sign_bit = bus.getIdRegisterMap(motor_id).sign_bit(STS_PRESENT_POSITION_L)
+                present = bus.sts_tohost(group.getData(motor_id, STS_PRESENT_POSITION_L, 2), sign_bit)
+                errors.append(positions[k] - present)
+            else:
+                errors.append(None)
+        self.errors.append((self.cycle / self.rate_hz, errors))
+
+    #
+    # streams the whole trajectory at rate_hz
+    def play(self):
+        self.reset()
+        period = 1.0 / self.rate_hz
+        t_start = time.perf_counter()
+        while self.cycle < self.cycles:
+            delay = t_start + self.cycle * period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                self.overruns += 1
+            self.step()
+
+    #
+    # {motor_id: (rms error, max absolute error, samples)} over the feedback read so far
+    def tracking_error(self):
+        stats = {}
+        for k, motor_id in enumerate(self.motor_ids):
+            samples = [errors[k] for _, errors in self.errors if errors[k] is not None]
+            if not samples:
+                stats[motor_id] = (None, None, 0)
+                continue
+            rms = math.sqrt(sum(e * e for e in samples) / len(samples))
+            stats[motor_id] = (rms, max(abs(e) for e in samples), len(samples))
+        return stats
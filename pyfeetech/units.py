@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Description: vectorized conversions between raw register values and physical units.
+#
+# Sign-magnitude coding (sts_tohost / sts_toscs) and unit scaling are applied to whole
+# arrays at once, with a per-motor calibration (offset, direction, gear ratio): a state
+# frame of N motors converts in one call instead of one Python call per value.
+#
+# Requires NumPy (pip install numpy, or pip install pyfeetech[numpy]).
+#
+# usage:
+#   units = UnitConverter(3, offset=[2048, 2048, 1024], direction=[1, -1, 1])
+#   frame, valid = state_frame(bus.groupSyncReadState, [1, 2, 3])
+#   state = units.decode_state_frame(frame)     # {"position": rad, "speed": rad/s, ...}
+#
+# For a mixed STS/SCS fleet, give the model of every motor (or use from_bus): byte order,
+# sign bits, position resolution and fields then follow each row's register map. Fields
+# that only some rows have come back as masked arrays, fields no row has are left out.
+#
+#   units = UnitConverter.from_bus(bus, [1, 2, 3], offset=[2048, 2048, 512])
+
+import math
+from .feetechsts import *
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# STS3215 units
+STS_TICKS_PER_REV       = 4096      # position and speed resolution [ticks/rev]
+STS_LOAD_UNIT           = 0.001     # load [fraction of max torque / unit]
+STS_VOLTAGE_UNIT        = 0.1       # [V / unit]
+STS_CURRENT_UNIT        = 0.0065    # [A / unit]
+
+#
+def _numpy():
+    if np is None:
+        raise ImportError("pyfeetech.units requires NumPy: pip install numpy")
+    return np
+
+#
+# sign-magnitude (bit b = sign) -> signed, element-wise
+def sts_tohost_array(a, b=15):
+    a = _numpy().asarray(a, dtype=np.int32)
+    magnitude = a & ~(1 << b)
+    return np.where(a & (1 << b), -magnitude, magnitude)
+
+#
+# signed -> sign-magnitude (bit b = sign), element-wise
+def sts_toscs_array(a, b=15):
+    a = _numpy().asarray(a, dtype=np.int32)
+    return np.where(a < 0, (-a) | (1 << b), a)
+
+#
+# little-endian (end=0, STS/SMS) or big-endian (end=1, SCS) 16-bit words from byte columns;
+# end is a scalar or one value per row (mixed fleets)
+def makeword_array(lo, hi, end=0):
+    lo = _numpy().asarray(lo, dtype=np.int32)
+    hi = np.asarray(hi, dtype=np.int32)
+    if np.ndim(end) == 0:
+        if end == 0:
+            return (lo & 0xFF) | ((hi & 0xFF) << 8)
+        else:
+            return (hi & 0xFF) | ((lo & 0xFF) << 8)
+    return np.where(np.asarray(end) == 0, (lo & 0xFF) | ((hi & 0xFF) << 8), (hi & 0xFF) | ((lo & 0xFF) << 8))
+
+#
+# state blocks of a GroupSyncRead as a (N, data_length) uint8 frame, plus the (N,) mask of
+# motors that answered (their rows are zero otherwise)
+def state_frame(group, motor_ids):
+    _numpy()
+    frame = np.zeros((len(motor_ids), group.data_length), dtype=np.uint8)
+    valid = np.zeros(len(motor_ids), dtype=bool)
+    for k, motor_id in enumerate(motor_ids):
+        available, _ = group.isAvailable(motor_id, group.start_address, group.data_length)
+        if available:
+            frame[k] = group.data_dict[motor_id][1: group.data_length + 1]
+            valid[k] = True
+    return frame, valid
+
+#
+class UnitConverter(object):
+    #
+    # motor_count: number of motors (columns); offset [ticks], direction (+1/-1) and
+    # gear_ratio (motor turns per joint turn) are scalars or one value per motor; end (byte
+    # order) too, e.g. [bus.getIdEnd(i) for i in motor_ids] for a mixed STS/SCS fleet.
+    # models: model number of every motor (None: unknown), picks the register map of each
+    # row (see model_registry.py); ticks_per_rev overrides the resolution of the maps
+    def __init__(self, motor_count, offset=0, direction=1, gear_ratio=1.0,
+                 ticks_per_rev=None, end=0, models=None):
+        _numpy()
+        self.motor_count = motor_count
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=np.float64), (motor_count,)).copy()
+        self.direction = np.broadcast_to(np.asarray(direction, dtype=np.float64), (motor_count,)).copy()
+        self.gear_ratio = np.broadcast_to(np.asarray(gear_ratio, dtype=np.float64), (motor_count,)).copy()
+        self.end = end if np.ndim(end) == 0 else np.asarray(end, dtype=np.int32)
+
+        ends = np.broadcast_to(np.asarray(end, dtype=np.int32), (motor_count,))
+        models = models if models is not None else [None] * motor_count
+        self.register_maps = [register_map_for(model, int(e)) for model, e in zip(models, ends)]
+
+        if ticks_per_rev is None:
+            ticks_per_rev = np.array([m.ticks_per_rev for m in self.register_maps], dtype=np.float64)
+        self.ticks_per_rev = ticks_per_rev
+
+        # per field: sign bit of every row, and rows that have the register (None: all of them)
+        self.sign_bits = {}
+        self.has_field = {}
+        for name, address in STS_STATE_FIELDS:
+            self.sign_bits[name] = np.array([m.sign_bit(address) for m in self.register_maps], dtype=np.int32)
+            has = np.array([m.address(address) is not None for m in self.register_maps], dtype=bool)
+            self.has_field[name] = None if has.all() else has
+
+        # [rad / tick] at the joint, per motor
+        self.scale = self.direction * (2.0 * math.pi / np.asarray(ticks_per_rev, dtype=np.float64)) / self.gear_ratio
+
+    #
+    # converter for motor_ids on bus, with the byte order and model it learned for each of them
+    @classmethod
+    def from_bus(cls, bus, motor_ids, **kwargs):
+        return cls(len(motor_ids), end=[bus.getIdEnd(i) for i in motor_ids],
+                   models=[bus.getIdModel(i) for i in motor_ids], **kwargs)
+
+    # ----- positions and speeds
+    #
+    def ticks_to_rad(self, ticks):
+        return (np.asarray(ticks, dtype=np.float64) - self.offset) * self.scale
+
+    #
+    def rad_to_ticks(self, rad):
+        return np.rint(np.asarray(rad, dtype=np.float64) / self.scale + self.offset).astype(np.int32)
+
+    #
+    def speed_to_rad_s(self, steps_per_s):
+        return np.asarray(steps_per_s, dtype=np.float64) * self.scale
+
+    #
+    def rad_s_to_speed(self, rad_s):
+        return np.rint(np.asarray(rad_s, dtype=np.float64) / self.scale).astype(np.int32)
+
+    # ----- load, voltage, current (no calibration)
+    #
+    def load_to_ratio(self, load):
+        return np.asarray(load, dtype=np.float64) * STS_LOAD_UNIT
+
+    #
+    def voltage_to_volts(self, voltage):
+        return np.asarray(voltage, dtype=np.float64) * STS_VOLTAGE_UNIT
+
+    #
+    def current_to_amps(self, current):
+        return np.asarray(current, dtype=np.float64) * STS_CURRENT_UNIT
+
+    # ----- whole frames
+    #
+    # raw register values of a (N, STS_STATE_LENGTH) frame of state blocks (see feetechsts.sync_read_state)
+    def decode_state_frame_raw(self, frame):
+        f = np.asarray(frame, dtype=np.int32)
+        o = -STS_STATE_START
+        sign_bits = self.sign_bits
+
+        def word(address):
+            return makeword_array(f[:, o + address], f[:, o + address + 1], self.end)
+
+        raw = {
+            "position":     sts_tohost_array(word(STS_PRESENT_POSITION_L), sign_bits["position"]),
+            "speed":        sts_tohost_array(word(STS_PRESENT_SPEED_L), sign_bits["speed"]),
+            "load":         sts_tohost_array(word(STS_PRESENT_LOAD_L), sign_bits["load"]),
+            "voltage":      f[:, o + STS_PRESENT_VOLTAGE],
+            "temperature":  f[:, o + STS_PRESENT_TEMPERATURE],
+            "status":       f[:, o + STS_STATUS],
+            "moving":       f[:, o + STS_MOVING],
+            "current":      sts_tohost_array(word(STS_PRESENT_CURRENT_L), sign_bits["current"]),
+        }
+        return self._mask(raw)
+
+    #
+    # fields some rows do not have: masked on those rows; fields no row has: left out
+    def _mask(self, fields):
+        for name, has in self.has_field.items():
+            if has is None or name not in fields:
+                continue
+            if not has.any():
+                del fields[name]
+            else:
+                fields[name] = np.ma.masked_array(fields[name], mask=~has)
+        return fields
+
+    #
+    # same as decode_state_frame_raw, in physical units: position [rad], speed [rad/s],
+    # load [fraction of max torque], voltage [V], temperature [degC], current [A]
+    def decode_state_frame(self, frame):
+        raw = self.decode_state_frame_raw(frame)
+        state = {
+            "position":     self.ticks_to_rad(raw["position"]),
+            "speed":        self.speed_to_rad_s(raw["speed"]),
+            "load":         self.load_to_ratio(raw["load"]),
+            "voltage":      self.voltage_to_volts(raw["voltage"]),
+            "temperature":  raw["temperature"].astype(np.float64),
+            "moving":       raw["moving"],
+            "current":      self.current_to_amps(raw["current"]),
+        }
+        if "status" in raw:
+            state["status"] = raw["status"]
+        return self._mask(state)
+
+    #
+    # (N, 2) uint8 columns [lo, hi] of goal positions given in [rad], ready for a SYNC_WRITE
+    def encode_positions(self, rad):
+        raw = sts_toscs_array(self.rad_to_ticks(rad), 15)
+        lo, hi = raw & 0xFF, (raw >> 8) & 0xFF
+        swap = np.asarray(self.end) != 0
+        lo, hi = np.where(swap, hi, lo), np.where(swap, lo, hi)
+        return np.stack([lo, hi], axis=1).astype(np.uint8)
@@ -20,4 +20,15 @@ setup(
         # List your library's dependencies here
         "pyserial>=3.0",
     ],
+    extras_require={
+        # vectorized unit conversions (pyfeetech.units)
+        "numpy": ["numpy"],
+        # YAML fleet specs (pyfeetech.provisioning)
+        "yaml": ["pyyaml"],
+    },
+    entry_points={
+        "console_scripts": [
+            "pyfeetech=pyfeetech.cli:main",
+        ],
+    },
 )
\ No newline at end of file
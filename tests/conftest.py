@@ -0,0 +1,13 @@
+import pytest
+from pyfeetech import *
+
+
+@pytest.fixture
+def make_bus():
+    # make_bus(servos, bus_class=feetechsts) -> (portHandler, bus) on an open emulated port
+    def make(servos, bus_class=feetechsts):
+        portHandler = EmulatedPortHandler(servos)
+        bus = bus_class(portHandler)
+        assert portHandler.openPort()
+        return portHandler, bus
+    return make
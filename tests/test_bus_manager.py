@@ -0,0 +1,111 @@
+import time
+import threading
+from pyfeetech import *
+
+
+class GatedBus(feetechsts):
+    # sync_read_state blocks until the gate opens; states carry the number of the call
+    def __init__(self, portHandler):
+        feetechsts.__init__(self, portHandler)
+        self.gate = threading.Event()
+        self.gate.set()
+        self.calls = 0
+        self.motor_ids = []         # motor_ids lists received, one per call
+
+    def sync_read_state(self, motor_ids):
+        self.calls += 1
+        self.motor_ids.append(motor_ids)
+        call = self.calls
+        self.gate.wait()
+        time.sleep(0.01)            # bus time
+        return {motor_id: {"call": call} for motor_id in motor_ids}
+
+
+def make_manager(make_bus, ids=(1, 2)):
+    portHandler, bus = make_bus([EmulatedServo(i) for i in ids], GatedBus)
+    manager = BusManager()
+    manager.add_bus("a", portHandler, bus)
+    for i in ids:
+        manager.add_motor(f"m{i}", "a", i)
+    return manager, bus
+
+
+def test_cycle_merges_buses(make_bus):
+    manager = BusManager()
+    for name, ids in (("a", (1, 2)), ("b", (1,))):
+        portHandler, bus = make_bus([EmulatedServo(i) for i in ids])
+        manager.add_bus(name, portHandler, bus)
+        for i in ids:
+            manager.add_motor(f"{name}{i}", name, i)
+    try:
+        states = manager.cycle()
+        assert sorted(states) == ["a1", "a2", "b1"]
+        assert all(state["position"] == 2048 for state in states.values())
+    finally:
+        manager.stop()
+
+
+def test_late_cycle_is_not_returned_as_fresh(make_bus):
+    manager, bus = make_manager(make_bus)
+    try:
+        assert manager.cycle()["m1"]["call"] == 1
+        bus.gate.clear()
+        assert manager.cycle(timeout=0.05) == {"m1": None, "m2": None}     # call 2 stuck
+
+        threading.Timer(0.05, bus.gate.set).start()     # call 2 ends during the next cycle
+        assert manager.cycle(timeout=1.0)["m1"]["call"] == 3
+        assert manager.cycle(timeout=1.0)["m1"]["call"] == 4
+    finally:
+        bus.gate.set()
+        manager.stop()
+
+
+def test_busy_bus_does_not_start_another_cycle(make_bus):
+    manager, bus = make_manager(make_bus)
+    try:
+        bus.gate.clear()
+        manager.cycle(timeout=0.01)
+        manager.cycle(timeout=0.01)
+        manager.cycle(timeout=0.01)
+        assert bus.calls == 1
+    finally:
+        bus.gate.set()
+        manager.stop()
+
+
+def test_motors_removed_during_a_cycle(make_bus):
+    manager, bus = make_manager(make_bus)
+    try:
+        bus.gate.clear()
+        manager.cycle(timeout=0.01)             # running on [1, 2]
+        manager.remove_motor("m2")
+        manager.add_motor("m3", "a", 3)
+        bus.gate.set()
+        states = manager.cycle(timeout=1.0)
+        assert sorted(states) == ["m1", "m3"]
+        assert bus.motor_ids == [[1, 2], [1, 3]]    # the running cycle kept its own list
+    finally:
+        bus.gate.set()
+        manager.stop()
+
+
+def test_restart_after_stop(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1), EmulatedServo(2)])
+    manager = BusManager()
+    manager.add_bus("a", portHandler, bus)
+    manager.add_motor("m1", "a", 1)
+    manager.start()
+    assert manager.cycle(timeout=1.0)["m1"] is not None
+    manager.stop()
+
+    manager.add_motor("m2", "a", 2)
+    manager.set_goal("m2", 3000)                # kept for the next start
+    manager.start()
+    try:
+        states = manager.cycle(timeout=1.0)
+        assert states["m1"] is not None and states["m2"] is not None
+        assert portHandler.servos[1].mem[STS_GOAL_POSITION_L] == 3000 & 0xFF
+    finally:
+        manager.stop()
+    manager.start()                             # and again
+    manager.stop()
@@ -0,0 +1,89 @@
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+from pyfeetech import *
+from pyfeetech.bus_process import _bus_process_main, shared_memory
+
+if shared_memory is None:
+    pytest.skip("requires multiprocessing.shared_memory", allow_module_level=True)
+
+
+def test_state_and_goals_round_trip():
+    shared = SharedBusState.create([1, 2])
+    try:
+        shared.write_state(12.5, 3, {1: {"position": 1000, "load": -30}, 2: None})
+        timestamp, cycles, states = shared.read_state()
+        assert (timestamp, cycles) == (12.5, 3)
+        assert states[1]["position"] == 1000 and states[1]["load"] == -30 and states[1]["status"] == 0
+        assert states[2] is None
+
+        reader = SharedBusState.attach(shared.name, [1, 2])
+        shared.write_goals({1: (2048, 100, 10)})
+        assert reader.read_new_goals() == {1: (2048, 100, 10)}
+        assert reader.read_new_goals() == {}            # same generation: not sent again
+        shared.write_goals({1: (2048, 100, 10), 2: (500, 0, 0)})
+        assert reader.read_new_goals() == {1: (2048, 100, 10), 2: (500, 0, 0)}
+        reader.close()
+    finally:
+        shared.close()
+
+
+def test_reader_waits_for_the_writer_to_finish():
+    shared = SharedBusState.create([1])
+    try:
+        seq = shared._write_begin(shared.state_seq_offset)
+        result = []
+        reader = threading.Thread(target=lambda: result.append(shared.read_state()))
+        reader.start()
+        time.sleep(0.05)
+        assert not result                               # the reader yields while the write is in progress
+        shared._write_end(shared.state_seq_offset, seq)
+        reader.join(1.0)
+        assert result and result[0][1] == 0
+    finally:
+        shared.close()
+
+
+def test_io_loop_against_an_emulated_bus():
+    servos = [EmulatedServo(1), EmulatedServo(2)]
+    for servo in servos:
+        servo.set_word(STS_PRESENT_POSITION_L, 1000 + servo.id)
+    shared = SharedBusState.create([1, 2])
+    stop_event = threading.Event()
+    status_recv, status_send = multiprocessing.Pipe(duplex=False)
+    loop = threading.Thread(target=_bus_process_main, kwargs=dict(
+        shm_name=shared.name, port_name="emulated", baudrate=DEFAULT_BAUDRATE, motor_ids=[1, 2], rate_hz=500.0,
+        stop_event=stop_event, status=status_send, port_factory=lambda name: EmulatedPortHandler(servos)))
+    loop.start()
+    try:
+        assert status_recv.poll(1.0) and status_recv.recv() is None
+
+        shared.write_goals({2: (3000, 100, 0)})
+        deadline = time.perf_counter() + 1.0
+        while servos[1].mem[STS_GOAL_POSITION_L] != 3000 & 0xFF and time.perf_counter() < deadline:
+            time.sleep(0.005)
+        assert servos[1].mem[STS_GOAL_POSITION_L: STS_GOAL_POSITION_L + 2] == bytes([3000 & 0xFF, 3000 >> 8])
+
+        servos[1].set_word(STS_GOAL_POSITION_L, 0)      # the goal is not sent again
+        _, cycles, states = shared.read_state()
+        time.sleep(0.02)
+        _, later, states = shared.read_state()
+        assert later > cycles
+        assert servos[1].mem[STS_GOAL_POSITION_L] == 0
+        assert states[1]["position"] == 1001 and states[2]["position"] == 1002
+    finally:
+        stop_event.set()
+        loop.join(1.0)
+        shared.close()
+
+
+def test_start_fails_fast_when_the_port_cannot_be_opened(capsys):
+    bus = BusProcess("/dev/pyfeetech-no-such-port", [1])
+    t_start = time.perf_counter()
+    assert not bus.start(timeout=5.0)
+    assert time.perf_counter() - t_start < 4.0
+    assert bus.process is None and bus.shared is None
+    assert "Failed to open port" in capsys.readouterr().out
@@ -0,0 +1,23 @@
+import json
+
+from pyfeetech import *
+from pyfeetech.cli import main, _present_runs
+
+
+def test_restore_leaves_id_baudrate_and_response_level_out_of_the_eeprom_span(tmp_path, capsys):
+    dump = tmp_path / "rig.json"
+    assert main(["dump", "--port", "emulated", "--emulated-ids", "1", "--ids", "1", "-o", str(dump)]) == 0
+    content = json.loads(dump.read_text())
+    assert content["servos"]["1"]["eeprom"]["start"] == 0
+    capsys.readouterr()
+
+    assert main(["restore", str(dump), "--port", "emulated", "--emulated-ids", "1", "--dry-run"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith(f"ID 1: eeprom [{STS_MIN_ANGLE_LIMIT_L}..{STS_PROTECTIVE_TORQUE}] <- ")
+    assert lines[-1] == "ID 1: response level <- 1"
+    assert not any("eeprom [7.." in line for line in lines)
+
+
+def test_restore_splits_spans_around_registers_the_model_lacks():
+    assert _present_runs(STS_REGISTER_MAP, 9, 26) == [(9, 26)]
+    assert _present_runs(SCS_REGISTER_MAP, 9, 26) == [(9, 22), (32, 1), (34, 1)]    # no offset (31), mode (33)
@@ -0,0 +1,45 @@
+from pyfeetech import *
+
+
+def mixed_bus(make_bus):
+    sts, scs = EmulatedServo(1), EmulatedServo(2, model=0x0504, end=1)
+    for servo in (sts, scs):
+        servo.mem[STS_TORQUE_ENABLE] = 1
+    portHandler, bus = make_bus([sts, scs])
+    bus.setIdModel(1, 777, 0)
+    bus.setIdModel(2, 0x0504, 1)
+    return portHandler, bus, sts, scs
+
+
+def test_sync_write_goals_follows_register_maps(make_bus):
+    _, bus, sts, scs = mixed_bus(make_bus)
+    assert bus.sync_write_goals({1: (1000, 500, 50), 2: (700, 300, 50)}) == COMM_SUCCESS
+
+    assert sts.mem[STS_ACC: STS_ACC + 7] == bytes([50, 0xE8, 0x03, 0, 0, 0xF4, 0x01])
+    assert scs.mem[STS_ACC] == 0                    # SCS has no acceleration
+    assert scs.mem[STS_GOAL_POSITION_L: STS_GOAL_POSITION_L + 6] == bytes([0x02, 0xBC, 0, 0, 0x01, 0x2C])
+
+
+def test_sync_read_state_leaves_out_missing_fields(make_bus):
+    _, bus, sts, scs = mixed_bus(make_bus)
+    sts.mem[STS_STATUS] = 0b1000
+    scs.mem[STS_STATUS] = 0xFF                      # not a register on SCS
+    scs.set_word(STS_PRESENT_LOAD_L, (1 << 10) | 30)
+    sts.set_word(STS_PRESENT_LOAD_L, (1 << 15) | 30)
+
+    states = bus.sync_read_state([1, 2])
+    assert states[1]["status"] == 0b1000
+    assert "status" not in states[2]
+    assert states[1]["load"] == -30 and states[2]["load"] == -30
+    assert states[2]["position"] == 512
+
+
+def test_stage_goals_follows_register_maps(make_bus):
+    portHandler, bus, sts, scs = mixed_bus(make_bus)
+    assert bus.staged_move({1: (1000, 500, 50), 2: (700, 300, 50)}) == {}
+    assert portHandler.getBytesAvailable() == 0
+
+    assert sts.mem[STS_ACC] == 50
+    assert scs.mem[STS_ACC] == 0
+    states = bus.sync_read_state([1, 2])
+    assert states[1]["position"] == 1000 and states[2]["position"] == 700
@@ -0,0 +1,39 @@
+from pyfeetech import *
+
+
+def test_sync_read_state_reads_every_motor(make_bus):
+    _, bus = make_bus([EmulatedServo(1), EmulatedServo(2)])
+    states = bus.sync_read_state([1, 2])
+    assert states[1]["position"] == 2048
+    assert states[2]["voltage"] == 120
+
+
+def test_silent_bus_is_not_reported_with_previous_data(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    assert bus.sync_read_state([1])[1] is not None
+
+    portHandler.servos = []
+    assert bus.sync_read_state([1]) == {1: None}
+    assert bus.sync_read_state([1]) == {1: None}
+
+
+def test_missing_motor_is_unavailable(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1), EmulatedServo(2)])
+    bus.sync_read_state([1, 2])
+
+    portHandler.servos = portHandler.servos[:1]
+    states = bus.sync_read_state([1, 2])
+    assert states[1] is not None
+    assert states[2] is None
+
+
+def test_failed_transmission_clears_data(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    group = GroupSyncRead(bus, STS_STATE_START, STS_STATE_LENGTH)
+    group.addParam(1)
+    assert group.txRxPacket() == COMM_SUCCESS
+    assert group.isAvailable(1, STS_STATE_START, STS_STATE_LENGTH)[0]
+
+    portHandler.is_using = True         # port busy: the instruction is never sent
+    assert group.txRxPacket() != COMM_SUCCESS
+    assert not group.isAvailable(1, STS_STATE_START, STS_STATE_LENGTH)[0]
@@ -0,0 +1,39 @@
+from pyfeetech import *
+
+
+def provision(servos, motor):
+    portHandler = EmulatedPortHandler(servos)
+    spec = {"version": 1, "buses": [{"name": "bus", "port": "emulated", "motors": [motor]}]}
+    report = FleetProvisioner(spec, port_handlers={"bus": portHandler}).run()
+    return portHandler, report[0]
+
+
+def test_moves_the_motor_to_its_new_id():
+    portHandler, entry = provision([EmulatedServo(1)], {"id": 2, "current_id": 1, "mode": 1})
+    assert entry["status"] == PROVISION_OK
+    assert portHandler.servos[0].id == 2 and portHandler.servos[0].mem[STS_MODE] == 1
+
+
+def test_missing_motor_is_not_taken_for_the_servo_at_its_new_id(capsys):
+    other = EmulatedServo(2)
+    portHandler, entry = provision([other], {"id": 2, "current_id": 1, "mode": 1})
+    assert entry["status"] == PROVISION_MISSING
+    assert other.mem[STS_MODE] == 0
+    assert "There is no status packet" not in capsys.readouterr().out
+
+
+def test_provisioned_motor_is_accepted_at_its_new_id(capsys):
+    servo = EmulatedServo(2)
+    servo.mem[STS_MODE] = 1
+    _, entry = provision([servo], {"id": 2, "current_id": 1, "mode": 1, "provisioned": True})
+    assert entry["status"] == PROVISION_UNCHANGED
+    assert capsys.readouterr().out == ""
+
+
+def test_servo_at_the_new_id_must_have_the_planned_model():
+    other = EmulatedServo(2, model=0x0504, end=1)
+    _, entry = provision([other], {"id": 2, "current_id": 1, "mode": 1, "model": 777})
+    assert entry["status"] == PROVISION_FAILED and entry["model"] == 0x0504
+
+    _, entry = provision([EmulatedServo(2)], {"id": 2, "current_id": 1, "mode": 1, "model": 777})
+    assert entry["status"] == PROVISION_OK
@@ -0,0 +1,79 @@
+import time
+from pyfeetech import *
+
+
+def test_all_silent_motors_are_quarantined_and_stale(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    quarantine = MotorQuarantine(miss_limit=3, probe_interval=10.0)
+    bus.set_quarantine(quarantine)
+    bus.sync_read_state([1])
+
+    portHandler.servos = []
+    for _ in range(3):
+        assert bus.sync_read_state([1]) == {1: None}
+    assert quarantine.get_stats()["quarantined"] == [1]
+
+    written = portHandler.packets_written
+    state = bus.sync_read_state([1])[1]
+    assert state["stale"] is True
+    assert state["position"] == 2048
+    assert portHandler.packets_written == written   # not read, probe not due
+
+
+def test_missing_motor_leaves_the_sync_read(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1), EmulatedServo(2)])
+    quarantine = MotorQuarantine(miss_limit=2, probe_interval=10.0)
+    bus.set_quarantine(quarantine)
+    portHandler.servos.pop()
+    for _ in range(2):
+        bus.sync_read_state([1, 2])
+
+    assert quarantine.is_quarantined(2)
+    states = bus.sync_read_state([1, 2])
+    assert list(bus.groupSyncReadState.data_dict) == [1]
+    assert "stale" not in states[1]
+    assert states[2] is None                        # never read
+
+
+def test_probe_releases_a_motor_that_answers_again(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    quarantine = MotorQuarantine(miss_limit=1, probe_interval=0.0)
+    bus.set_quarantine(quarantine)
+    servo = portHandler.servos.pop()
+    bus.sync_read_state([1])                        # quarantined, probed: still silent
+    assert quarantine.is_quarantined(1)
+
+    portHandler.servos.append(servo)
+    bus.sync_read_state([1])                        # probed: answers
+    assert not quarantine.is_quarantined(1)
+    assert bus.sync_read_state([1])[1]["position"] == 2048
+    stats = quarantine.get_stats()
+    assert stats["quarantines"] == 1 and stats["releases"] == 1
+
+
+def test_probe_restores_the_latency_timer(make_bus):
+    portHandler, bus = make_bus([])
+    latency = portHandler.getLatencyTimer()
+    quarantine = MotorQuarantine(miss_limit=1, probe_interval=0.0, probe_latency_ms=1.0)
+    bus.set_quarantine(quarantine)
+    bus.sync_read_state([1])
+    assert quarantine.get_stats()["probes"] == 1
+    assert portHandler.getLatencyTimer() == latency
+
+
+def test_polling_quarantines_a_silent_bus(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    quarantine = MotorQuarantine(miss_limit=3, probe_interval=10.0)
+    poller = PollingScheduler(bus, [1], cycle_hz=100.0)
+    poller.add_group("motion", STS_PRESENT_POSITION_L, 4, 100.0)
+    poller.set_quarantine(quarantine)
+    poller.poll()
+
+    portHandler.servos = []
+    for _ in range(3):
+        poller.poll()
+    assert quarantine.is_quarantined(1)
+
+    written = portHandler.packets_written
+    poller.poll()
+    assert portHandler.packets_written == written
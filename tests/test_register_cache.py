@@ -0,0 +1,70 @@
+from pyfeetech import *
+
+
+def cached_bus(make_bus, servos):
+    portHandler, bus = make_bus(servos)
+    cache = RegisterCache()
+    bus.setRegisterCache(cache)
+    return portHandler, bus, cache
+
+
+def test_getter_is_served_from_the_cache(make_bus):
+    portHandler, bus, cache = cached_bus(make_bus, [EmulatedServo(1)])
+    assert bus.read1ByteTxRx(1, STS_PRESENT_TEMPERATURE) == (30, COMM_SUCCESS, 0)
+    written = portHandler.packets_written
+    assert bus.read1ByteTxRx(1, STS_PRESENT_TEMPERATURE) == (30, COMM_SUCCESS, 0)
+    assert portHandler.packets_written == written
+    assert cache.getStats()["hits"] == 1
+
+
+def test_uncached_registers_go_to_the_bus(make_bus):
+    portHandler, bus, cache = cached_bus(make_bus, [EmulatedServo(1)])
+    for _ in range(2):
+        bus.read2ByteTxRx(1, STS_PRESENT_POSITION_L)
+    bus.read2ByteTxRx(1, STS_MODEL_L)
+    assert portHandler.packets_written == 3
+    assert cache.getStats()["hits"] == 0
+
+
+def test_hit_returns_the_servo_error(make_bus):
+    servo = EmulatedServo(1)
+    portHandler, bus, cache = cached_bus(make_bus, [servo])
+    servo.error = ERRBIT_OVERHEAT
+    assert bus.read1ByteTxRx(1, STS_PRESENT_TEMPERATURE)[2] == ERRBIT_OVERHEAT
+    written = portHandler.packets_written
+    assert bus.read1ByteTxRx(1, STS_PRESENT_TEMPERATURE) == (30, COMM_SUCCESS, ERRBIT_OVERHEAT)
+    assert portHandler.packets_written == written
+
+
+def test_sync_read_fills_the_cache(make_bus):
+    portHandler, bus, cache = cached_bus(make_bus, [EmulatedServo(1), EmulatedServo(2)])
+    bus.sync_read_state([1, 2])
+    written = portHandler.packets_written
+    assert bus.read1ByteTxRx(2, STS_PRESENT_VOLTAGE)[0] == 120
+    assert portHandler.packets_written == written
+
+
+def test_write_invalidates(make_bus):
+    servo = EmulatedServo(1)
+    portHandler, bus, cache = cached_bus(make_bus, [servo])
+    bus.read1ByteTxRx(1, STS_LOCK)
+    bus.write1ByteTxRx(1, STS_LOCK, 0)
+    written = portHandler.packets_written
+    assert bus.read1ByteTxRx(1, STS_LOCK)[0] == 0
+    assert portHandler.packets_written == written + 1
+
+
+def test_ttls_follow_the_register_map(make_bus):
+    scs = EmulatedServo(2, model=0x0504, end=1)
+    portHandler, bus, cache = cached_bus(make_bus, [EmulatedServo(1), scs])
+    bus.setIdModel(1, 777, 0)
+    bus.setIdModel(2, 0x0504, 1)
+
+    # SCS lock lives at 48, where STS has the (uncached on SCS) torque limit
+    for _ in range(2):
+        bus.read1ByteTxRx(2, 48)
+        bus.read1ByteTxRx(2, STS_LOCK)              # 55: not a register on SCS
+    assert cache.getStats()["hits"] == 1
+    for _ in range(2):
+        bus.read1ByteTxRx(1, STS_LOCK)
+    assert cache.getStats()["hits"] == 2
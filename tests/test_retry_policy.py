@@ -0,0 +1,61 @@
+from pyfeetech import *
+
+
+class DroppingPort(EmulatedPortHandler):
+    # loses the status packets of the next `drops` instructions
+    drops = 0
+
+    def _reply(self, servo, params):
+        if self.drops:
+            self.drops -= 1
+            return
+        EmulatedPortHandler._reply(self, servo, params)
+
+
+def dropping_bus(policy):
+    portHandler = DroppingPort([EmulatedServo(1)])
+    bus = feetechsts(portHandler)
+    assert portHandler.openPort()
+    portHandler.setLatencyTimer(1)
+    bus.setRetryPolicy(policy)
+    return portHandler, bus
+
+
+def test_read_with_dropped_status_packet_is_retried():
+    portHandler, bus = dropping_bus(RetryPolicy(max_attempts=3))
+    portHandler.drops = 1
+    _, sts_comm_result, _ = bus.read2ByteTxRx(1, STS_PRESENT_POSITION_L)
+    assert sts_comm_result == COMM_SUCCESS
+    assert bus.getRetryPolicy().getStats()["recovered"] == 1
+
+
+def test_write_with_dropped_status_packet_is_sent_once():
+    portHandler, bus = dropping_bus(RetryPolicy(max_attempts=3))
+    portHandler.drops = 1
+    written = portHandler.packets_written
+    sts_comm_result, _ = bus.write2ByteTxRx(1, STS_GOAL_POSITION_L, 1000)
+    assert sts_comm_result == COMM_RX_TIMEOUT
+    assert portHandler.packets_written == written + 1
+    assert portHandler.servos[0].mem[STS_GOAL_POSITION_L] == 1000 & 0xFF   # executed all the same
+    stats = bus.getRetryPolicy().getStats()
+    assert stats["retries"] == 0 and stats["not_retryable"] == 1
+
+
+def test_explicit_write_retries_skip_id_and_commands():
+    policy = RetryPolicy(max_attempts=3, retry_instructions=RETRY_INSTRUCTIONS + (INST_WRITE,))
+    portHandler, bus = dropping_bus(policy)
+
+    portHandler.drops = 1
+    assert bus.write2ByteTxRx(1, STS_GOAL_POSITION_L, 1000)[0] == COMM_SUCCESS
+    assert policy.retries == 1
+
+    portHandler.drops = 1
+    written = portHandler.packets_written
+    assert bus.write1ByteTxRx(1, STS_TORQUE_ENABLE, 128)[0] == COMM_RX_TIMEOUT
+    assert portHandler.packets_written == written + 1
+
+    portHandler.drops = 1
+    written = portHandler.packets_written
+    assert bus.write1ByteTxRx(1, STS_ID, 7)[0] == COMM_RX_TIMEOUT
+    assert portHandler.packets_written == written + 1
+    assert portHandler.servos[0].id == 7
@@ -0,0 +1,58 @@
+from pyfeetech import *
+
+
+def scs_servo(scs_id, position=512, speed=0, load=0):
+    servo = EmulatedServo(scs_id, model=1284, end=1)
+    servo.set_word(SCSCL_PRESENT_POSITION_L, position)
+    servo.set_word(SCSCL_PRESENT_SPEED_L, speed)
+    servo.set_word(SCSCL_PRESENT_LOAD_L, load)
+    servo.mem[SCSCL_TORQUE_ENABLE] = 1
+    return servo
+
+
+def test_read_state_big_endian_and_sign_magnitude(make_bus):
+    servo = scs_servo(1, position=700, speed=(1 << 15) | 100, load=(1 << 10) | 50)
+    assert servo.mem[SCSCL_PRESENT_POSITION_L: SCSCL_PRESENT_POSITION_L + 2] == bytes([0x02, 0xBC])
+    _, bus = make_bus([servo], scscl)
+
+    state, scs_comm_result, scs_error = bus.ReadState(1)
+    assert scs_comm_result == COMM_SUCCESS and scs_error == 0
+    assert state["position"] == 700
+    assert state["speed"] == -100
+    assert state["load"] == -50
+    assert state["voltage"] == 120
+    assert state["temperature"] == 30
+
+
+def test_sync_read_state(make_bus):
+    _, bus = make_bus([scs_servo(1, position=100, speed=20), scs_servo(2, position=900, speed=(1 << 15) | 20)], scscl)
+    states, scs_comm_result = bus.SyncReadState([1, 2, 3])
+    assert scs_comm_result != COMM_SUCCESS          # 3 does not answer
+    assert (states[1]["position"], states[1]["speed"]) == (100, 20)
+    assert (states[2]["position"], states[2]["speed"]) == (900, -20)
+    assert states[3] is None
+
+
+def test_sync_write_goals_big_endian(make_bus):
+    servos = [scs_servo(1), scs_servo(2)]
+    _, bus = make_bus(servos, scscl)
+    assert bus.SyncWriteGoals({1: (700, 0, 1000), 2: (300, 10, 500)}) == COMM_SUCCESS
+
+    assert servos[0].mem[SCSCL_GOAL_POSITION_L: SCSCL_GOAL_SPEED_H + 1] == bytes([0x02, 0xBC, 0, 0, 0x03, 0xE8])
+    assert servos[1].mem[SCSCL_GOAL_POSITION_L: SCSCL_GOAL_SPEED_H + 1] == bytes([0x01, 0x2C, 0, 10, 0x01, 0xF4])
+    states, _ = bus.SyncReadState([1, 2])
+    assert states[1]["position"] == 700 and states[2]["position"] == 300
+
+
+def test_stage_goals_and_reg_action(make_bus):
+    for acknowledge in (False, True):
+        servos = [scs_servo(1), scs_servo(2)]
+        portHandler, bus = make_bus(servos, scscl)
+        assert bus.StageGoals({1: (600, 0, 100), 2: (400, 0, 100)}, acknowledge=acknowledge) == {}
+        assert bus.ReadPos(1)[0] == 512                 # staged, not moving yet
+        assert portHandler.getBytesAvailable() == 0     # no status packet left behind
+
+        assert bus.RegAction() == COMM_SUCCESS
+        assert bus.ReadPos(1)[0] == 600
+        assert bus.ReadPos(2)[0] == 400
+        assert bus.ReadState(2)[0]["position"] == 400
@@ -0,0 +1,59 @@
+from pyfeetech import *
+
+
+def test_unplugged_bus_is_dropped_and_recovered_with_bus_manager(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1), EmulatedServo(2)])
+    hub = TelemetryHub(drop_after=3)
+    events = hub.subscribe(kinds=(TELEMETRY_DROPPED, TELEMETRY_RECOVERED))
+    manager = BusManager()
+    manager.add_bus("a", portHandler, bus)
+    manager.add_motor("x", "a", 1)
+    manager.add_motor("y", "a", 2)
+    manager.set_telemetry(hub)
+    try:
+        manager.cycle()
+        servos, portHandler.servos = portHandler.servos, []
+        for _ in range(3):
+            assert manager.cycle() == {"x": None, "y": None}
+        dropped = events.get_all()
+        assert sorted((e.kind, e.motor) for e in dropped) == [(TELEMETRY_DROPPED, "x"), (TELEMETRY_DROPPED, "y")]
+
+        portHandler.servos = servos
+        manager.cycle()
+        assert sorted(e.motor for e in events.get_all() if e.kind == TELEMETRY_RECOVERED) == ["x", "y"]
+    finally:
+        manager.stop()
+
+
+def test_single_motor_group_is_dropped_with_polling(make_bus):
+    portHandler, bus = make_bus([EmulatedServo(1)])
+    hub = TelemetryHub(drop_after=2)
+    events = hub.subscribe(kinds=(TELEMETRY_DROPPED,))
+    poller = PollingScheduler(bus, [1], cycle_hz=100.0)
+    poller.add_group("motion", STS_PRESENT_POSITION_L, 4, 100.0)
+    poller.set_telemetry(hub)
+    poller.poll()
+
+    portHandler.servos = []
+    poller.poll()
+    poller.poll()
+    assert [(e.kind, e.motor) for e in events.get_all()] == [(TELEMETRY_DROPPED, 1)]
+
+
+def test_stale_state_counts_as_missed():
+    hub = TelemetryHub(drop_after=1)
+    events = hub.subscribe()
+    hub.publish({1: {"position": 2048, "stale": True}})
+    assert [e.kind for e in events.get_all()] == [TELEMETRY_DROPPED]
+
+
+def test_status_and_threshold_events():
+    hub = TelemetryHub()
+    hub.add_threshold("temperature", 60, hysteresis=5)
+    events = hub.subscribe(kinds=(TELEMETRY_STATUS, TELEMETRY_THRESHOLD))
+    hub.publish({1: {"temperature": 70, "status": 0b1000}})
+    hub.publish({1: {"temperature": 58, "status": 0b1000}})     # within hysteresis
+    hub.publish({1: {"temperature": 55, "status": 0}})
+    kinds = [(e.kind, e.data.get("name") or e.data.get("above")) for e in events.get_all()]
+    assert kinds == [(TELEMETRY_STATUS, "temperature"), (TELEMETRY_THRESHOLD, True),
+                     (TELEMETRY_STATUS, "temperature"), (TELEMETRY_THRESHOLD, False)]
@@ -0,0 +1,21 @@
+from pyfeetech import *
+
+
+def test_feedback_follows_byte_order_and_register_maps(make_bus, monkeypatch):
+    # a model whose positions are signed on bit 11
+    monkeypatch.setitem(MODEL_REGISTER_MAPS, 778, RegisterMap("signed", sign_bits={STS_PRESENT_POSITION_L: 11}))
+    sts = EmulatedServo(1)
+    scs = EmulatedServo(2, model=0x0504, end=1)
+    signed = EmulatedServo(3, model=778)
+    sts.set_word(STS_PRESENT_POSITION_L, 1000)
+    scs.set_word(STS_PRESENT_POSITION_L, 300)
+    signed.set_word(STS_PRESENT_POSITION_L, (1 << 11) | 20)
+    _, bus = make_bus([sts, scs, signed])
+    bus.setIdModel(1, 777, 0)
+    bus.setIdModel(2, 0x0504, 1)
+    bus.setIdModel(3, 778, 0)
+
+    player = TrajectoryPlayer(bus, [1, 2, 3], [[1000, 300, -20]], sample_rate=50.0)
+    player.reset()
+    player._read_feedback([1010, 310, -10])
+    assert player.errors[0][1] == [10, 10, 10]
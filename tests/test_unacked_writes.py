@@ -0,0 +1,77 @@
+import time
+
+from pyfeetech import *
+
+
+def silent_bus(make_bus):
+    servo = EmulatedServo(1)
+    servo.mem[STS_RESPONSE_LEVEL] = 0
+    portHandler, bus = make_bus([servo])
+    bus.setResponseLevel(1, RESPONSE_LEVEL_READ_ONLY)
+    return portHandler, bus, servo
+
+
+def test_writes_are_tx_only_and_verified(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    assert bus.write2ByteTxRx(1, STS_GOAL_POSITION_L, 1000) == (COMM_SUCCESS, 0)
+    assert bus.unacked_writes == {1: {STS_GOAL_POSITION_L: [0xE8, 0x03]}}
+    assert bus.verifyUnackedWrites() == {}
+    assert bus.unacked_writes == {}
+
+
+def test_lost_write_is_resent(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    portHandler.servos = []                         # the write is lost
+    bus.write2ByteTxRx(1, STS_GOAL_POSITION_L, 1000)
+    portHandler.servos = [servo]
+
+    assert bus.verifyUnackedWrites() == {1: [STS_GOAL_POSITION_L, STS_GOAL_POSITION_L + 1]}
+    assert servo.mem[STS_GOAL_POSITION_L: STS_GOAL_POSITION_L + 2] == bytes([0xE8, 0x03])
+    assert bus.lost_writes == 2
+
+
+def test_id_change_moves_pending_writes(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    bus.write2ByteTxRx(1, STS_GOAL_POSITION_L, 1000)
+    bus.write1ByteTxRx(1, STS_ID, 7)
+
+    assert servo.id == 7
+    assert bus.getResponseLevel(7) == RESPONSE_LEVEL_READ_ONLY
+    assert sorted(bus.unacked_writes) == [7]
+    assert bus.verifyUnackedWrites() == {}
+    assert bus.unacked_writes == {}
+
+
+def test_calibration_command_is_not_verified(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    servo.set_word(STS_PRESENT_POSITION_L, 1000)
+    bus.write1ByteTxRx(1, STS_TORQUE_ENABLE, 128)
+    assert bus.sts_makeword(servo.mem[STS_PRESENT_POSITION_L], servo.mem[STS_PRESENT_POSITION_L + 1]) == 2048
+
+    written = portHandler.packets_written
+    assert bus.verifyUnackedWrites() == {}
+    assert portHandler.packets_written == written   # nothing to read back, nothing re-sent
+    assert bus.unacked_writes == {}
+
+
+def test_lost_staged_goal_is_written_again_after_the_action(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    portHandler.servos = []                         # the REG_WRITE is lost
+    assert bus.stage_goals({1: (1000, 500, 50)}) == {}
+    portHandler.servos = [servo]
+
+    assert bus.staged_move({}) == {}
+    assert servo.mem[STS_GOAL_POSITION_L: STS_GOAL_POSITION_L + 2] == bytes([0xE8, 0x03])
+    assert servo.mem[STS_ACC] == 50
+    assert bus.lost_writes > 0
+    assert bus.verifyUnackedWrites() == {}          # the rewrite is tracked in turn
+
+
+def test_staged_goals_of_silent_servos_skip_the_status_slot(make_bus):
+    portHandler, bus, servo = silent_bus(make_bus)
+    bus.setInterFrameGap(100.0)
+    t_start = time.perf_counter()
+    assert bus.staged_move({1: (1000, 500, 50)}) == {}
+    assert time.perf_counter() - t_start < 0.1
+    assert servo.mem[STS_GOAL_POSITION_L: STS_GOAL_POSITION_L + 2] == bytes([0xE8, 0x03])
+    assert bus.lost_writes == 0
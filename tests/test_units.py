@@ -0,0 +1,57 @@
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pyfeetech import *
+
+
+def mixed_fleet(make_bus):
+    sts = EmulatedServo(1)
+    sts.set_word(STS_PRESENT_POSITION_L, 2048)
+    sts.set_word(STS_PRESENT_LOAD_L, (1 << 15) | 40)
+    sts.mem[STS_STATUS] = 0x20
+    scs = EmulatedServo(2, model=0x0504, end=1)
+    scs.set_word(STS_PRESENT_POSITION_L, 512)
+    scs.set_word(STS_PRESENT_LOAD_L, (1 << 10) | 30)
+    scs.mem[STS_STATUS] = 0x7F                      # not a register on SCS
+    _, bus = make_bus([sts, scs])
+    bus.setIdModel(1, 777, 0)
+    bus.setIdModel(2, 0x0504, 1)
+    return bus
+
+
+def test_decode_mixed_fleet_per_row_register_map(make_bus):
+    bus = mixed_fleet(make_bus)
+    bus.sync_read_state([1, 2])
+    frame, valid = state_frame(bus.groupSyncReadState, [1, 2])
+    assert valid.all()
+
+    units = UnitConverter.from_bus(bus, [1, 2], offset=[2048, 512])
+    raw = units.decode_state_frame_raw(frame)
+    assert list(raw["position"]) == [2048, 512]
+    assert list(raw["load"]) == [-40, -30]          # sign bit 15 on STS, 10 on SCS
+    assert raw["status"][0] == 0x20
+    assert raw["status"].mask.tolist() == [False, True]
+
+    state = units.decode_state_frame(frame)
+    assert state["position"].tolist() == [0.0, 0.0]
+    assert units.ticks_to_rad([2048 + 1024, 512 + 256]).tolist() == pytest.approx(
+        [math.pi / 2, math.radians(300) / 4])
+    assert state["status"].mask.tolist() == [False, True]
+
+
+def test_decode_scs_only_fleet_leaves_out_status(make_bus):
+    scs = EmulatedServo(2, model=0x0504, end=1)
+    scs.set_word(STS_PRESENT_LOAD_L, (1 << 10) | 30)
+    _, bus = make_bus([scs])
+    bus.setIdModel(2, 0x0504, 1)
+    bus.sync_read_state([2])
+    frame, _ = state_frame(bus.groupSyncReadState, [2])
+
+    units = UnitConverter.from_bus(bus, [2])
+    assert "status" not in units.decode_state_frame_raw(frame)
+    state = units.decode_state_frame(frame)
+    assert "status" not in state
+    assert state["load"].tolist() == [-0.03]